@@ -12,9 +12,13 @@ from pydantic import BaseModel
 
 from app.dependencies import verify_api_key, get_db
 from app.utils.file_handler import validate_file, get_file_hash
+from app.core.config import settings
 from app.core.processor import extractor
+from app.core.llm_scheduler import llm_priority, PRIORITY_BATCH
 from app.db.models import ProcessedInvoice, FieldCorrection
 from app.db.operations import db_ops
+from app.utils.metrics import metrics
+from app.utils.deadline import Deadline
 
 logger = logging.getLogger(__name__)
 
@@ -125,6 +129,7 @@ async def extract_invoice(
                 
                 result["invoice_id"] = saved_invoice.id
                 logger.info(f"Saved invoice to database with ID: {saved_invoice.id}")
+                extractor.remember_layout_vendor(processing_info, result.get("analysis") or {})
                 
             except Exception as e:
                 logger.error(f"Failed to save invoice to database: {e}")
@@ -194,13 +199,16 @@ async def extract_invoice_async(
 
 async def process_document_async(task_id: str, file: UploadFile):
     """Background task for processing documents"""
+    # Queued jobs yield AI capacity to interactive uploads
+    priority_token = llm_priority.set(PRIORITY_BATCH)
     try:
         processing_tasks[task_id]["status"] = "processing"
         processing_tasks[task_id]["updated_at"] = datetime.now().isoformat()
         
         logger.info(f"Background processing started for task {task_id}")
         
-        result = await extractor.process_document(file)
+        # The deadline stops OCR inside its worker threads rather than abandoning them mid-run
+        result = await extractor.process_document(file, deadline=Deadline(settings.job_timeout))
         
         processing_tasks[task_id].update({
             "status": "completed",
@@ -210,6 +218,17 @@ async def process_document_async(task_id: str, file: UploadFile):
         
         logger.info(f"Background processing completed for task {task_id}")
         
+    except HTTPException as e:
+        if e.status_code == 504:
+            metrics.increment("job_timeouts")
+        processing_tasks[task_id].update({
+            "status": "failed",
+            "error": e.detail,
+            "failed_at": datetime.now().isoformat()
+        })
+        
+        logger.error(f"Background processing failed for task {task_id}: {e.detail}")
+        
     except Exception as e:
         processing_tasks[task_id].update({
             "status": "failed",
@@ -218,6 +237,109 @@ async def process_document_async(task_id: str, file: UploadFile):
         })
         
         logger.error(f"Background processing failed for task {task_id}: {e}")
+    
+    finally:
+        llm_priority.reset(priority_token)
+
+@router.post("/extract-invoices-bulk/")
+async def extract_invoices_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    verified: bool = Depends(verify_api_key)
+):
+    """Bulk invoice processing: several documents are extracted per AI request"""
+    
+    if not extractor:
+        raise HTTPException(
+            status_code=503, 
+            detail="Invoice extractor service unavailable"
+        )
+    
+    if len(files) > settings.bulk_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum is {settings.bulk_max_files} per request."
+        )
+    
+    try:
+        # Read now: uploads are closed before background tasks run
+        documents = []
+        for file in files:
+            validate_file(file)
+            documents.append((file.filename, file.content_type, await extractor.read_upload(file)))
+        
+        task_id = str(uuid.uuid4())
+        
+        processing_tasks[task_id] = {
+            "status": "queued",
+            "filename": [file.filename for file in files],
+            "created_at": datetime.now().isoformat(),
+            "result": None,
+            "error": None
+        }
+        
+        background_tasks.add_task(process_documents_bulk_async, task_id, documents)
+        
+        return {
+            "success": True,
+            "task_id": task_id,
+            "status": "queued",
+            "documents": len(documents),
+            "message": "Processing started. Use /status/{task_id} to check progress."
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to queue bulk processing: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue processing: {str(e)}")
+
+async def process_documents_bulk_async(task_id: str, documents: List[tuple]):
+    """Background task for bulk processing
+    
+    Results are published per document as they complete; timeouts apply per
+    document and per AI batch, so one slow file never discards the others.
+    """
+    priority_token = llm_priority.set(PRIORITY_BATCH)
+    try:
+        results = [None] * len(documents)
+        summary = {"processed": 0, "failed": 0, "pending": len(documents), "documents": results}
+        
+        def record(index: int, result: dict):
+            results[index] = result
+            summary["processed" if result.get("success") else "failed"] += 1
+            summary["pending"] -= 1
+            processing_tasks[task_id]["updated_at"] = datetime.now().isoformat()
+        
+        processing_tasks[task_id].update({
+            "status": "processing",
+            "result": summary,
+            "updated_at": datetime.now().isoformat()
+        })
+        
+        logger.info(f"Bulk processing started for task {task_id} ({len(documents)} documents)")
+        
+        await extractor.process_documents_bulk(documents, on_result=record)
+        
+        processing_tasks[task_id].update({
+            "status": "completed",
+            "completed_at": datetime.now().isoformat()
+        })
+        
+        logger.info(f"Bulk processing completed for task {task_id}: {summary['processed']} processed, {summary['failed']} failed")
+        
+    except Exception as e:
+        # Documents already recorded stay available in the task result
+        processing_tasks[task_id].update({
+            "status": "failed",
+            "error": str(e),
+            "failed_at": datetime.now().isoformat()
+        })
+        
+        logger.error(f"Bulk processing failed for task {task_id}: {e}")
+    
+    finally:
+        llm_priority.reset(priority_token)
 
 @router.get("/status/{task_id}")
 async def get_processing_status(task_id: str):
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, WebSocket, UploadFile, File, HTTPException, Query, Depends
 from typing import Dict, Any
+import asyncio
 import logging
 import time
 from datetime import datetime
@@ -8,6 +9,7 @@ from app.dependencies import verify_api_key
 from app.utils.file_handler import validate_file, get_file_hash
 from app.utils.websocket_manager import manager
 from app.core.processor import extractor, WebSocketProcessingStatus
+from app.core.config import settings
 from app.db.operations import db_ops
 
 logger = logging.getLogger(__name__)
@@ -121,6 +123,7 @@ async def extract_invoice_websocket(
 
 async def process_document_with_websocket(file: UploadFile, status: WebSocketProcessingStatus, save_to_db: bool, file_hash: str, start_time: float):
     """Process document with WebSocket status updates and database storage"""
+    ocr_deadline = extractor.ocr_deadline()
     
     try:
         await status.update_async("file_validation", 1)
@@ -148,39 +151,55 @@ async def process_document_with_websocket(file: UploadFile, status: WebSocketPro
         extracted_text = ""
         text_source = ""
         ocr_confidence = 1.0
+        ocr_details = {}
+        ocr_words = None
         warnings = []
         
         if file.content_type == "application/pdf":
             try:
-                extracted_text = extractor.extract_text_from_pdf(file_content)
-                text_source = "pdf_extraction"
-                ocr_confidence = 1.0
+                # OCR runs off the event loop so per-page progress reaches the client as it happens
+                pdf_result = await asyncio.to_thread(extractor.process_pdf, file_content, status, ocr_deadline)
+                extracted_text = pdf_result["text"]
+                text_source = pdf_result["text_source"]
+                ocr_confidence = pdf_result["ocr_confidence"]
+                warnings.extend(pdf_result.get("warnings", []))
+                ocr_details["pages"] = pdf_result.get("pages")
+                ocr_details["layout_fingerprint"] = pdf_result.get("layout_fingerprint")
+                ocr_details["language"] = pdf_result.get("language")
             except Exception as e:
                 raise HTTPException(status_code=400, detail=f"PDF processing failed: {str(e)}")
                 
         elif file.content_type and file.content_type.startswith("image/"):
             try:
-                # Create a temporary status for OCR
-                from app.core.processor import ProcessingStatus
-                temp_status = ProcessingStatus()
-                ocr_result = extractor.extract_text_from_image(file_content, temp_status)
+                ocr_result = await asyncio.to_thread(extractor.extract_text_from_image, file_content, status, ocr_deadline)
                 extracted_text = ocr_result["text"]
                 text_source = "ocr"
                 ocr_confidence = ocr_result["ocr_confidence"]
                 warnings.extend(ocr_result.get("warnings", []))
+                ocr_details["preprocessing"] = ocr_result.get("preprocessing")
+                ocr_details["cache"] = ocr_result.get("cache")
+                ocr_details["layout_fingerprint"] = ocr_result.get("layout_fingerprint")
+                ocr_details["language"] = ocr_result.get("language")
+                ocr_details["pages"] = ocr_result.get("pages")
+                ocr_words = ocr_result.get("words")
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Image processing failed: {str(e)}")
         
+        # Whitespace, noise and boilerplate cost tokens without helping the AI
+        ai_text, prompt_compaction = extractor.compact_for_ai(extracted_text, ocr_words)
+        
         await status.update_async("language_detection", 3)
         
-        # Detect language and date format
-        language, date_format = extractor.detect_language_and_locale(extracted_text)
+        on_field = None
+        if settings.ai_stream_partial_results:
+            async def on_field(field: str, value: Any):
+                await manager.send_partial_result(status.client_id, field, value)
         
         await status.update_async("ai_analysis", 4)
         
-        # AI Analysis
-        logger.info(f"Starting AI analysis with {language}/{date_format}...")
-        analysis = extractor.analyze_with_ai(extracted_text, language, date_format, status)
+        # Rules first; the AI only when they miss required fields
+        document = {"text": extracted_text, "words": ocr_words, "ocr_confidence": ocr_confidence, "ocr_details": ocr_details}
+        language, date_format, analysis = await extractor.analyze_document(document, ai_text, status, on_field)
         
         await status.update_async("validation", 6)
         await status.update_async("confidence_scoring", 7)
@@ -207,6 +226,8 @@ async def process_document_with_websocket(file: UploadFile, status: WebSocketPro
                 "detected_language": language,
                 "date_format": date_format,
                 "processing_confidence": processing_confidence,
+                "ocr_details": ocr_details,
+                "prompt_compaction": prompt_compaction,
                 "status": status.get_status(),
                 "processing_time": processing_time
             },
@@ -233,6 +254,7 @@ async def process_document_with_websocket(file: UploadFile, status: WebSocketPro
                 
                 response["invoice_id"] = saved_invoice.id
                 logger.info(f"Saved invoice to database with ID: {saved_invoice.id}")
+                extractor.remember_layout_vendor(processing_info, analysis)
                 
             except Exception as e:
                 logger.error(f"Failed to save invoice to database: {e}")
@@ -1,92 +1,368 @@
-import requests
+import asyncio
+import httpx
+import itertools
 import json
+import threading
+import time
 from fastapi import HTTPException
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 import logging
 from app.config import AINBOX_API_KEY
+from app.core.config import settings
+from app.core.llm_cache import LLMResponseCache
+from app.core.locale_detector import detect_locale
+from app.core.prompt_compaction import AMOUNT_PATTERN, TokenCounter
+from app.core.llm_scheduler import LLMScheduler, backoff_delay, parse_retry_after
+from app.utils.metrics import metrics
+from app.utils.json_stream import IncrementalJSONParser
+from app.utils.exceptions import LLMRateLimitError
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:  # Optional: without it connections stay on HTTP/1.1 keep-alive
+    h2 = None
 
 logger = logging.getLogger(__name__)
 
+# Receives each extracted field as soon as it is parsed: ("vendor_info.vendor_name", "Acme"), ("line_items.0", {...})
+FieldCallback = Callable[[str, Any], Awaitable[None]]
+
+# Locale rules shared by the single-call and batch prompts
+LOCALE_RULES = """
+        LOCALE DETECTION:
+        1. Language (en/fr/de/es/it/nl/pt)
+        2. Likely country/region based on address, currency, language
+        3. Expected date format (MM/DD/YYYY for US, DD/MM/YYYY for most others)
+        
+        CRITICAL DATE PARSING RULES:
+        - Interpret every date in the detected date format
+        - MM/DD/YYYY: 11/02/2019 means November 2nd, 2019 -> 2019-11-02
+        - DD/MM/YYYY: 11/02/2019 means 11th February, 2019 -> 2019-02-11
+        - ALWAYS convert dates to YYYY-MM-DD format
+        - For ambiguous dates like "1102/2019", interpret them in the detected date format
+"""
+
+# Field rules shared by the extraction, single-call and batch prompts
+EXTRACTION_RULES = """
+        QUANTITY vs DESCRIPTION RULES:
+        - "Labor 3hrs" = description: "Labor (3 hours)", quantity: 1 (NOT quantity: 3)
+        - Time units (hours, days, minutes) are descriptions, not quantities
+        - Quantity = number of items/services, not time duration
+        
+        LINE ITEMS ACCURACY:
+        - Extract EXACT amounts from the text
+        - Don't confuse unit prices with total amounts
+        - Validate quantity × unit_price = amount when possible
+        
+        OCR ERROR CORRECTION:
+        - Fix obvious character mistakes: "1l02" -> "1102", "0" vs "O"
+        - Correct misread currency symbols and decimal points
+"""
+
 class AIAnalyzer:
     def __init__(self):
         if not AINBOX_API_KEY:
             raise RuntimeError("AINBOX_API_KEY not set in environment variables")
+        
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._client_lock = threading.Lock()
+        self.scheduler = LLMScheduler(
+            settings.ai_requests_per_minute,
+            burst=settings.ai_burst,
+            max_in_flight=settings.ai_max_in_flight,
+            processes=settings.ai_scheduler_processes
+        )
+        self.tokens = TokenCounter(settings.ai_model)
+        self.response_cache = LLMResponseCache(
+            settings.llm_cache_ttl_hours * 3600,
+            max_entries=settings.llm_cache_max_entries
+        ) if settings.llm_cache_enabled else None
 
-    def ask_ainbox_gpt(self, system_prompt: str, user_prompt: str) -> str:
-        """Call AInbox GPT-4 API with enhanced error handling"""
-        url = "https://workspace.ainbox.ai/api/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {AINBOX_API_KEY}",
-            "Content-Type": "application/json"
+    def _client_options(self) -> Dict[str, Any]:
+        """Connection pool, timeout and protocol settings shared by the sync and async clients"""
+        return {
+            "headers": {
+                "Authorization": f"Bearer {AINBOX_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            "timeout": httpx.Timeout(settings.ai_timeout, connect=settings.ai_connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=settings.ai_max_connections,
+                max_keepalive_connections=settings.ai_max_keepalive_connections,
+                keepalive_expiry=settings.ai_keepalive_expiry
+            ),
+            "http2": settings.ai_http2 and h2 is not None
         }
+
+    def get_client(self) -> httpx.Client:
+        """Shared keep-alive client for callers running outside the event loop"""
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(**self._client_options())
+            return self._client
+
+    def get_async_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client for async callers, created on first use inside the event loop"""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(**self._client_options())
+        return self._async_client
+
+    async def aclose(self):
+        """Close both connection pools"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def _build_payload(self, system_prompt: str, user_prompt: str, stream: bool = False,
+                       max_tokens: int = 3000) -> Dict[str, Any]:
         payload = {
-            "model": "gpt-4",
+            "model": settings.ai_model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            "max_tokens": 3000,
+            "max_tokens": max_tokens,
             "temperature": 0.05
         }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _raise_for_status(res: httpx.Response):
+        if res.status_code == 429:
+            raise LLMRateLimitError(
+                "AI provider rate limit exceeded",
+                retry_after=parse_retry_after(res.headers.get("Retry-After"))
+            )
+        res.raise_for_status()
+
+    def _read_completion(self, res: httpx.Response) -> str:
+        """Message content of a chat completion response, raising HTTPException for API errors"""
+        self._raise_for_status(res)
         
-        try:
-            res = requests.post(url, headers=headers, json=payload, timeout=60)
-            res.raise_for_status()
-            
-            response_data = res.json()
-            
-            if 'choices' not in response_data or not response_data['choices']:
-                raise HTTPException(
-                    status_code=500, 
-                    detail="Invalid AI API response: missing choices"
-                )
-            
-            return response_data["choices"][0]["message"]["content"]
-            
-        except requests.exceptions.Timeout:
-            logger.error("AI API timeout")
+        response_data = res.json()
+        
+        if 'choices' not in response_data or not response_data['choices']:
             raise HTTPException(
+                status_code=500, 
+                detail="Invalid AI API response: missing choices"
+            )
+        
+        return response_data["choices"][0]["message"]["content"]
+
+    def _retry_delay(self, e: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a failed request, or None when it should not be retried
+        
+        Rate limits also pause the scheduler, so queued requests wait out the
+        same Retry-After instead of each hitting the limit again.
+        """
+        if attempt >= settings.ai_max_retries:
+            return None
+        
+        if isinstance(e, LLMRateLimitError):
+            metrics.increment("ai_rate_limited")
+            delay = backoff_delay(attempt, settings.ai_backoff_base, settings.ai_backoff_max, e.retry_after)
+            self.scheduler.pause(delay)
+        elif isinstance(e, httpx.HTTPStatusError) and e.response.status_code in (502, 503, 504):
+            delay = backoff_delay(attempt, settings.ai_backoff_base, settings.ai_backoff_max)
+        elif isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)):
+            delay = backoff_delay(attempt, settings.ai_backoff_base, settings.ai_backoff_max)
+        else:
+            return None
+        
+        metrics.increment("ai_retries")
+        logger.warning(f"AI request failed ({e}), retry {attempt + 1}/{settings.ai_max_retries} in {delay:.1f}s")
+        return delay
+
+    def _translate_error(self, e: Exception) -> HTTPException:
+        """Map a transport or API failure to the HTTPException returned to clients"""
+        if isinstance(e, HTTPException):
+            return e
+        if isinstance(e, LLMRateLimitError):
+            logger.error(f"AI API rate limit persisted after {settings.ai_max_retries} retries")
+            return HTTPException(
+                status_code=429,
+                detail="AI service rate limit exceeded. Please wait and try again.",
+                headers={"Retry-After": str(int(e.retry_after or settings.ai_backoff_max))}
+            )
+        if isinstance(e, httpx.TimeoutException):
+            logger.error("AI API timeout")
+            return HTTPException(
                 status_code=504, 
                 detail="AI processing timeout. Please try again with a smaller file."
             )
-        except requests.exceptions.ConnectionError:
-            logger.error("AI API connection error")
-            raise HTTPException(
+        if isinstance(e, httpx.TransportError):
+            logger.error(f"AI API connection error: {e}")
+            return HTTPException(
                 status_code=503, 
                 detail="AI service unavailable. Please try again later."
             )
-        except requests.exceptions.HTTPError as e:
+        if isinstance(e, httpx.HTTPStatusError):
             logger.error(f"AI API HTTP error: {e}")
             if e.response.status_code == 429:
-                raise HTTPException(
+                return HTTPException(
                     status_code=429,
                     detail="AI service rate limit exceeded. Please wait and try again."
                 )
             elif e.response.status_code == 401:
-                raise HTTPException(
+                return HTTPException(
                     status_code=500,
                     detail="AI service authentication failed. Please contact support."
                 )
             else:
-                raise HTTPException(
+                return HTTPException(
                     status_code=500,
                     detail=f"AI service error: {e.response.status_code}"
                 )
-        except Exception as e:
-            logger.error(f"Unexpected AI API error: {e}")
-            raise HTTPException(
-                status_code=500, 
-                detail="AI processing failed. Please try again."
-            )
+        logger.error(f"Unexpected AI API error: {e}")
+        return HTTPException(
+            status_code=500, 
+            detail="AI processing failed. Please try again."
+        )
 
-    def detect_language_and_locale(self, text: str) -> Tuple[str, str]:
-        """Detect document language and likely date format with error handling"""
-        try:
-            if len(text.strip()) < 10:
-                logger.warning("Insufficient text for language detection")
-                return 'en', 'MM/DD/YYYY'
-            
-            detection_prompt = """
+    def _cache_lookup(self, prompt_kind: str, text: str, language: Optional[str] = None,
+                      date_format: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """(cache key, cached response) for a prompt over `text`; both None when caching is off"""
+        if self.response_cache is None:
+            return None, None
+        key = self.response_cache.make_key(text, prompt_kind, settings.ai_model, language, date_format)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for {prompt_kind} prompt, skipping the AI call")
+        return key, cached
+
+    def _cache_store(self, key: Optional[str], response: str, prompt_kind: str,
+                     language: Optional[str] = None, date_format: Optional[str] = None):
+        if key is not None:
+            self.response_cache.put(key, response, prompt_kind, settings.ai_model, language, date_format)
+
+    async def _cache_lookup_async(self, prompt_kind: str, text: str, language: Optional[str] = None,
+                                  date_format: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """_cache_lookup with the database query off the event loop"""
+        return await asyncio.to_thread(self._cache_lookup, prompt_kind, text, language, date_format)
+
+    async def _cache_store_async(self, key: Optional[str], response: str, prompt_kind: str,
+                                 language: Optional[str] = None, date_format: Optional[str] = None):
+        if key is not None:
+            await asyncio.to_thread(self._cache_store, key, response, prompt_kind, language, date_format)
+
+    def ask_ainbox_gpt(self, system_prompt: str, user_prompt: str) -> str:
+        """Call AInbox GPT-4 API with enhanced error handling (blocking; not for use on the event loop)"""
+        payload = self._build_payload(system_prompt, user_prompt)
+        for attempt in itertools.count():
+            try:
+                with self.scheduler.slot():
+                    res = self.get_client().post(settings.ai_api_url, json=payload)
+                    return self._read_completion(res)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._translate_error(e)
+            time.sleep(delay)
+
+    async def ask_ainbox_gpt_async(self, system_prompt: str, user_prompt: str, max_tokens: int = 3000) -> str:
+        """Call AInbox GPT-4 API over the pooled async client without blocking the event loop"""
+        payload = self._build_payload(system_prompt, user_prompt, max_tokens=max_tokens)
+        for attempt in itertools.count():
+            try:
+                async with self.scheduler.slot_async():
+                    res = await self.get_async_client().post(settings.ai_api_url, json=payload)
+                    return self._read_completion(res)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._translate_error(e)
+            await asyncio.sleep(delay)
+
+    async def ask_ainbox_gpt_stream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Stream the completion text as the API produces it (server-sent events)
+        
+        Falls back to yielding the whole message at once if the API answers
+        with a regular JSON completion.
+        """
+        payload = self._build_payload(system_prompt, user_prompt, stream=True)
+        for attempt in itertools.count():
+            started = False
+            try:
+                async with self.scheduler.slot_async():
+                    async with self.get_async_client().stream("POST", settings.ai_api_url, json=payload) as res:
+                        self._raise_for_status(res)
+                        
+                        if res.headers.get("content-type", "").startswith("application/json"):
+                            await res.aread()
+                            started = True
+                            yield self._read_completion(res)
+                            return
+                        
+                        async for line in res.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[len("data:"):].strip()
+                            if data == "[DONE]":
+                                break
+                            choices = json.loads(data).get("choices") or []
+                            delta = choices[0].get("delta", {}).get("content") if choices else None
+                            if delta:
+                                started = True
+                                yield delta
+                return
+            except Exception as e:
+                # Once text has been handed out a retry would duplicate it
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise self._translate_error(e)
+            await asyncio.sleep(delay)
+
+    async def _complete_async(self, system_prompt: str, user_prompt: str,
+                              on_field: Optional[FieldCallback] = None, root: Optional[str] = None) -> str:
+        """Completion text; with `on_field`, streamed and reported field by field as it arrives
+        
+        `root` is a top-level key (such as "analysis") left out of reported field paths.
+        """
+        if on_field is None:
+            return await self.ask_ainbox_gpt_async(system_prompt, user_prompt)
+        
+        parser = IncrementalJSONParser()
+        parts = []
+        async for delta in self.ask_ainbox_gpt_stream(system_prompt, user_prompt):
+            parts.append(delta)
+            await self._report_fields(parser.feed(delta), on_field, root)
+        return "".join(parts)
+
+    @staticmethod
+    async def _report_fields(events, on_field: FieldCallback, root: Optional[str] = None):
+        for path, value in events:
+            if root is not None and path and path[0] == root:
+                path = path[1:]
+            await on_field(".".join(str(part) for part in path), value)
+
+    @staticmethod
+    def _locale_fallback(language_hint: Optional[str]) -> Tuple[str, str]:
+        """Language and date format used when detection is impossible or fails"""
+        language = language_hint or 'en'
+        return language, 'MM/DD/YYYY' if language == 'en' else 'DD/MM/YYYY'
+
+    @staticmethod
+    def _local_locale(text: str) -> Optional[Tuple[str, str]]:
+        """Language and date format from the local detector, or None when the AI should decide"""
+        language, date_format, confidence = detect_locale(text)
+        if confidence >= settings.local_locale_min_confidence:
+            metrics.increment("locale_local_hits")
+            logger.info(f"Detected locally: {language} language, {date_format} format (confidence {confidence:.2f})")
+            return language, date_format
+        metrics.increment("locale_ai_fallbacks")
+        logger.info(f"Local locale guess too weak ({language}/{date_format}: {confidence:.2f}), asking the AI")
+        return None
+
+    @staticmethod
+    def _detection_prompt(language_hint: Optional[str]) -> str:
+        detection_prompt = """
             Analyze this invoice text and determine:
             1. Language (en/fr/de/es/it/nl/pt)
             2. Likely country/region based on address, currency, language
@@ -94,72 +370,85 @@ class AIAnalyzer:
             
             Return JSON: {"language": "en", "country": "US", "date_format": "MM/DD/YYYY"}
             """
-            
-            result = self.ask_ainbox_gpt(detection_prompt, text[:800])
+        if language_hint:
+            detection_prompt += f"""
+            Local text analysis suggests the language is "{language_hint}".
+            """
+        return detection_prompt
+
+    @staticmethod
+    def _parse_detection(result: str, fallback: Tuple[str, str]) -> Tuple[str, str]:
+        fallback_language, fallback_date_format = fallback
+        try:
             detection = json.loads(result)
             
-            language = detection.get('language', 'en')
+            language = detection.get('language', fallback_language)
             country = detection.get('country', 'US')
             date_format = detection.get('date_format', 'MM/DD/YYYY')
             
             # Validate detected values
             valid_languages = ['en', 'fr', 'de', 'es', 'it', 'nl', 'pt']
             if language not in valid_languages:
-                logger.warning(f"Invalid language detected: {language}, defaulting to English")
-                language = 'en'
+                logger.warning(f"Invalid language detected: {language}, defaulting to {fallback_language}")
+                language = fallback_language
             
             logger.info(f"Detected: {language} language, {country} country, {date_format} format")
             return language, date_format
             
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.warning(f"Language detection parsing failed: {e}, defaulting to English/US")
-            return 'en', 'MM/DD/YYYY'
-        except Exception as e:
-            logger.warning(f"Language detection failed: {e}, defaulting to English/US")
-            return 'en', 'MM/DD/YYYY'
+        except (json.JSONDecodeError, KeyError, AttributeError) as e:
+            logger.warning(f"Language detection parsing failed: {e}, defaulting to {fallback_language}/{fallback_date_format}")
+            return fallback
 
-    def analyze_with_ai(self, extracted_text: str, language: str, date_format: str, status) -> Dict[str, Any]:
-        """Enhanced AI analysis with locale-specific instructions"""
-        
-        status.update("ai_analysis", 4)
-        
-        # Create locale-aware system prompt
-        date_format_example = {
-            "MM/DD/YYYY": "11/02/2019 means November 2nd, 2019 -> 2019-11-02",
-            "DD/MM/YYYY": "11/02/2019 means 11th February, 2019 -> 2019-02-11"
-        }
+    def detect_language_and_locale(self, text: str, language_hint: Optional[str] = None) -> Tuple[str, str]:
+        """Detect document language and likely date format with error handling
         
-        example = date_format_example.get(date_format, date_format_example["MM/DD/YYYY"])
+        `language_hint` is the language OCR already detected locally; it is passed to
+        the model and used instead of English when detection fails.
+        """
+        fallback = self._locale_fallback(language_hint)
+        if len(text.strip()) < 10:
+            logger.warning("Insufficient text for language detection")
+            return fallback
         
-        system_prompt = f"""
-        You are extracting data from an invoice in {language} language with {date_format} date format.
+        local = self._local_locale(text)
+        if local:
+            return local
         
-        CRITICAL DATE PARSING RULES FOR {date_format}:
-        - {example}
-        - ALWAYS convert dates to YYYY-MM-DD format
-        - For ambiguous dates like "1102/2019", interpret as {date_format}
-        
-        QUANTITY vs DESCRIPTION RULES:
-        - "Labor 3hrs" = description: "Labor (3 hours)", quantity: 1 (NOT quantity: 3)
-        - Time units (hours, days, minutes) are descriptions, not quantities
-        - Quantity = number of items/services, not time duration
+        try:
+            result = self.ask_ainbox_gpt(self._detection_prompt(language_hint), text[:800])
+        except Exception as e:
+            logger.warning(f"Language detection failed: {e}, defaulting to {fallback[0]}/{fallback[1]}")
+            return fallback
+        return self._parse_detection(result, fallback)
+
+    async def detect_language_and_locale_async(self, text: str, language_hint: Optional[str] = None) -> Tuple[str, str]:
+        """Awaitable detect_language_and_locale"""
+        fallback = self._locale_fallback(language_hint)
+        if len(text.strip()) < 10:
+            logger.warning("Insufficient text for language detection")
+            return fallback
         
-        LINE ITEMS ACCURACY:
-        - Extract EXACT amounts from the text
-        - Don't confuse unit prices with total amounts
-        - Validate quantity × unit_price = amount when possible
+        local = self._local_locale(text)
+        if local:
+            return local
         
-        OCR ERROR CORRECTION:
-        - Fix obvious character mistakes: "1l02" -> "1102", "0" vs "O"
-        - Correct misread currency symbols and decimal points
+        try:
+            result = await self.ask_ainbox_gpt_async(self._detection_prompt(language_hint), text[:800])
+        except Exception as e:
+            logger.warning(f"Language detection failed: {e}, defaulting to {fallback[0]}/{fallback[1]}")
+            return fallback
+        return self._parse_detection(result, fallback)
+
+    @staticmethod
+    def _analysis_schema(detected_language: str) -> str:
+        """JSON layout the model fills in, shared by the extraction and single-call prompts
         
-        Return analysis as valid JSON:
-        {{
-            "document_analysis": {{
-                "document_type": "invoice/receipt/bill/other",
-                "detected_language": "{language}",
-                "text_quality": "excellent/good/fair/poor", 
-                "overall_confidence": 0.0-1.0
+        Vendor, amounts and dates come first so streamed responses deliver them first.
+        """
+        return f"""{{
+            "vendor_info": {{
+                "vendor_name": "string_or_null",
+                "contact_info": "string_or_null"
             }},
             "financial_data": {{
                 "total_amount": number_or_null,
@@ -167,10 +456,6 @@ class AIAnalyzer:
                 "tax_amount": number_or_null,
                 "subtotal": number_or_null
             }},
-            "vendor_info": {{
-                "vendor_name": "string_or_null",
-                "contact_info": "string_or_null"
-            }},
             "document_details": {{
                 "invoice_number": "string_or_null",
                 "invoice_date": "YYYY-MM-DD_or_null",
@@ -179,22 +464,50 @@ class AIAnalyzer:
             "line_items": [
                 {{"description": "string", "amount": number_or_null, "quantity": number_or_null}}
             ],
+            "document_analysis": {{
+                "document_type": "invoice/receipt/bill/other",
+                "detected_language": "{detected_language}",
+                "text_quality": "excellent/good/fair/poor", 
+                "overall_confidence": 0.0-1.0
+            }},
             "business_insights": {{
                 "spending_category": "software/services/supplies/utilities/other",
                 "payment_urgency": "immediate/standard/flexible",
                 "data_completeness": "complete/partial/minimal"
             }}
-        }}
+        }}"""
+
+    @staticmethod
+    def _analysis_prompts(extracted_text: str, language: str, date_format: str) -> Tuple[str, str]:
+        """System and user prompts for the locale-aware extraction call"""
+        # Create locale-aware system prompt
+        date_format_example = {
+            "MM/DD/YYYY": "11/02/2019 means November 2nd, 2019 -> 2019-11-02",
+            "DD/MM/YYYY": "11/02/2019 means 11th February, 2019 -> 2019-02-11"
+        }
+        
+        example = date_format_example.get(date_format, date_format_example["MM/DD/YYYY"])
+        
+        system_prompt = f"""
+        You are extracting data from an invoice in {language} language with {date_format} date format.
+        
+        CRITICAL DATE PARSING RULES FOR {date_format}:
+        - {example}
+        - ALWAYS convert dates to YYYY-MM-DD format
+        - For ambiguous dates like "1102/2019", interpret as {date_format}
+{EXTRACTION_RULES}
+        Return analysis as valid JSON:
+        {AIAnalyzer._analysis_schema(language)}
         
         Return only valid JSON, no explanation.
         """
         
         user_prompt = f"Extract and analyze data from this document text:\n\n{extracted_text}"
-        
+        return system_prompt, user_prompt
+
+    @staticmethod
+    def _parse_analysis(ai_result: str, language: str) -> Dict[str, Any]:
         try:
-            ai_result = self.ask_ainbox_gpt(system_prompt, user_prompt)
-            status.update("field_parsing", 5)
-            
             # Parse AI response
             analysis = json.loads(ai_result)
             
@@ -213,4 +526,326 @@ class AIAnalyzer:
                     "overall_confidence": 0.0
                 },
                 "validation_warnings": [f"Failed to parse AI response: {str(e)}"]
-            }
\ No newline at end of file
+            }
+
+    def analyze_with_ai(self, extracted_text: str, language: str, date_format: str, status) -> Dict[str, Any]:
+        """Enhanced AI analysis with locale-specific instructions"""
+        
+        status.update("ai_analysis", 4)
+        
+        key, ai_result = self._cache_lookup("analysis", extracted_text, language, date_format)
+        cached = ai_result is not None
+        if not cached:
+            ai_result = self.ask_ainbox_gpt(*self._analysis_prompts(extracted_text, language, date_format))
+        status.update("field_parsing", 5)
+        
+        analysis = self._parse_analysis(ai_result, language)
+        if not cached and "error" not in analysis:
+            self._cache_store(key, ai_result, "analysis", language, date_format)
+        return analysis
+
+    async def analyze_with_ai_async(self, extracted_text: str, language: str, date_format: str, status,
+                                    on_field: Optional[FieldCallback] = None) -> Dict[str, Any]:
+        """Awaitable analyze_with_ai; the event loop keeps serving other requests during the call
+        
+        With `on_field`, the response is streamed and each field is reported as soon as it parses.
+        """
+        
+        status.update("ai_analysis", 4)
+        
+        key, ai_result = await self._cache_lookup_async("analysis", extracted_text, language, date_format)
+        cached = ai_result is not None
+        if not cached:
+            ai_result = await self._complete_async(
+                *self._analysis_prompts(extracted_text, language, date_format), on_field=on_field
+            )
+        elif on_field is not None:
+            await self._report_fields(IncrementalJSONParser().feed(ai_result), on_field)
+        status.update("field_parsing", 5)
+        
+        analysis = self._parse_analysis(ai_result, language)
+        if not cached and "error" not in analysis:
+            await self._cache_store_async(key, ai_result, "analysis", language, date_format)
+        return analysis
+
+    @staticmethod
+    def _combined_prompts(extracted_text: str, language_hint: Optional[str]) -> Tuple[str, str]:
+        """System and user prompts for detecting the locale and extracting fields in one call"""
+        hint = ""
+        if language_hint:
+            hint = f'Local text analysis suggests the language is "{language_hint}".'
+        
+        system_prompt = f"""
+        You are extracting data from an invoice. First determine its locale, then extract its fields.
+{LOCALE_RULES}        {hint}
+{EXTRACTION_RULES}
+        Return the locale and the analysis as one valid JSON object:
+        {{
+            "locale": {{"language": "en", "country": "US", "date_format": "MM/DD/YYYY"}},
+            "analysis": {AIAnalyzer._analysis_schema("same as locale.language")}
+        }}
+        
+        Return only valid JSON, no explanation.
+        """
+        
+        user_prompt = f"Detect the locale of this document text, then extract and analyze its data:\n\n{extracted_text}"
+        return system_prompt, user_prompt
+
+    @staticmethod
+    def _parse_combined(ai_result: str, fallback: Tuple[str, str]) -> Tuple[str, str, Dict[str, Any]]:
+        """Split a single-call response into (language, date format, analysis)"""
+        try:
+            combined = json.loads(ai_result)
+        except json.JSONDecodeError:
+            return (*fallback, AIAnalyzer._parse_analysis(ai_result, fallback[0]))
+        
+        if not isinstance(combined, dict):
+            return (*fallback, AIAnalyzer._parse_analysis("", fallback[0]))
+        
+        # Tolerate a flat analysis with the locale left out or inlined
+        locale = combined.get('locale') if isinstance(combined.get('locale'), dict) else {}
+        analysis = combined.get('analysis') if isinstance(combined.get('analysis'), dict) else combined
+        analysis.pop('locale', None)
+        
+        if locale:
+            language, date_format = AIAnalyzer._parse_detection(json.dumps(locale), fallback)
+        else:
+            logger.warning(f"AI response has no locale, defaulting to {fallback[0]}/{fallback[1]}")
+            language, date_format = fallback
+        if date_format not in ('MM/DD/YYYY', 'DD/MM/YYYY'):
+            logger.warning(f"Invalid date format detected: {date_format}, defaulting to {fallback[1]}")
+            date_format = fallback[1]
+        
+        analysis.setdefault('document_analysis', {})['detected_language'] = language
+        return language, date_format, analysis
+
+    def extract_with_locale(self, extracted_text: str, status, language_hint: Optional[str] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Detect language and date format and extract all fields in a single AI call
+        
+        Returns (language, date_format, analysis), the same values the separate
+        detect_language_and_locale and analyze_with_ai calls produce. When the
+        local detector is confident, only the extraction prompt is sent.
+        """
+        local = self._local_locale(extracted_text)
+        if local:
+            # Locale is settled; the plain extraction prompt gets exact date rules for it
+            return (*local, self.analyze_with_ai(extracted_text, *local, status))
+        
+        status.update("ai_analysis", 4)
+        
+        key, ai_result = self._cache_lookup("combined", extracted_text, language_hint)
+        cached = ai_result is not None
+        if not cached:
+            ai_result = self.ask_ainbox_gpt(*self._combined_prompts(extracted_text, language_hint))
+        status.update("field_parsing", 5)
+        
+        language, date_format, analysis = self._parse_combined(ai_result, self._locale_fallback(language_hint))
+        if not cached and "error" not in analysis:
+            self._cache_store(key, ai_result, "combined", language_hint)
+        return language, date_format, analysis
+
+    async def extract_with_locale_async(self, extracted_text: str, status, language_hint: Optional[str] = None,
+                                        on_field: Optional[FieldCallback] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Awaitable extract_with_locale; `on_field` streams fields as in analyze_with_ai_async"""
+        local = self._local_locale(extracted_text)
+        if local:
+            return (*local, await self.analyze_with_ai_async(extracted_text, *local, status, on_field))
+        
+        status.update("ai_analysis", 4)
+        
+        key, ai_result = await self._cache_lookup_async("combined", extracted_text, language_hint)
+        cached = ai_result is not None
+        if not cached:
+            ai_result = await self._complete_async(
+                *self._combined_prompts(extracted_text, language_hint), on_field=on_field, root="analysis"
+            )
+        elif on_field is not None:
+            await self._report_fields(IncrementalJSONParser().feed(ai_result), on_field, root="analysis")
+        status.update("field_parsing", 5)
+        
+        language, date_format, analysis = self._parse_combined(ai_result, self._locale_fallback(language_hint))
+        if not cached and "error" not in analysis:
+            await self._cache_store_async(key, ai_result, "combined", language_hint)
+        return language, date_format, analysis
+
+    @staticmethod
+    def _batch_prompts(documents: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """System and user prompts for extracting several documents in one call, keyed by document ID"""
+        system_prompt = f"""
+        You are extracting data from several invoices at once. Each document is marked with
+        "=== DOCUMENT <id> ===". Treat every document on its own: never mix data between them.
+        For each document, first determine its locale, then extract its fields.
+{LOCALE_RULES}{EXTRACTION_RULES}
+        Return one valid JSON object with an entry for every document ID:
+        {{
+            "<document id>": {{
+                "locale": {{"language": "en", "country": "US", "date_format": "MM/DD/YYYY"}},
+                "analysis": {AIAnalyzer._analysis_schema("same as locale.language")}
+            }}
+        }}
+        
+        Return only valid JSON, no explanation.
+        """
+        
+        sections = []
+        for document in documents:
+            header = f"=== DOCUMENT {document['id']} ==="
+            if document.get("language_hint"):
+                header += f" (local text analysis suggests the language is \"{document['language_hint']}\")"
+            sections.append(f"{header}\n{document['text']}")
+        user_prompt = "Detect the locale of each document, then extract and analyze its data:\n\n" + "\n\n".join(sections)
+        return system_prompt, user_prompt
+
+    @staticmethod
+    def _split_batch_response(ai_result: str, ids: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """Per-document responses (in the single-call format) and the IDs missing or malformed in a batch response"""
+        try:
+            combined = json.loads(ai_result)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Batch response is not valid JSON: {e}")
+            return {}, list(ids)
+        if not isinstance(combined, dict):
+            return {}, list(ids)
+        
+        # Tolerate the entries being wrapped in a "documents" object
+        if isinstance(combined.get("documents"), dict):
+            combined = combined["documents"]
+        
+        responses, failed = {}, []
+        for document_id in ids:
+            entry = combined.get(document_id)
+            if isinstance(entry, dict) and isinstance(entry.get("analysis"), dict):
+                responses[document_id] = json.dumps(entry)
+            else:
+                failed.append(document_id)
+        return responses, failed
+
+    @staticmethod
+    def estimate_output_tokens(text: str) -> int:
+        """Output tokens to reserve for one document's JSON, growing with its numeric (item, total) lines"""
+        numeric_lines = sum(1 for line in text.splitlines() if AMOUNT_PATTERN.search(line))
+        return settings.ai_batch_output_tokens_per_document + settings.ai_batch_output_tokens_per_line * numeric_lines
+
+    def plan_batches(self, documents: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group documents, in order, into batches that fit the input and output token budgets
+        
+        A document larger than either budget on its own gets a batch of its own.
+        """
+        batches, current, current_tokens, current_output = [], [], 0, 0
+        for document in documents:
+            tokens = self.tokens.count(document["text"])
+            output = self.estimate_output_tokens(document["text"])
+            if current and (
+                len(current) >= settings.ai_batch_max_documents
+                or current_tokens + tokens > settings.ai_batch_token_budget
+                or current_output + output > settings.ai_batch_max_output_tokens
+            ):
+                batches.append(current)
+                current, current_tokens, current_output = [], 0, 0
+            current.append(document)
+            current_tokens += tokens
+            current_output += output
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _extract_single_async(self, document: Dict[str, Any], key: Optional[str]) -> Tuple[str, str, Dict[str, Any]]:
+        """Single-call extraction for a document a batch could not handle"""
+        language_hint = document.get("language_hint")
+        ai_result = await self.ask_ainbox_gpt_async(
+            *self._combined_prompts(document["text"], language_hint),
+            max_tokens=max(3000, self.estimate_output_tokens(document["text"]))
+        )
+        language, date_format, analysis = self._parse_combined(ai_result, self._locale_fallback(language_hint))
+        if "error" not in analysis:
+            await self._cache_store_async(key, ai_result, "combined", language_hint)
+        return language, date_format, analysis
+
+    async def _run_batch(self, batch: List[Dict[str, Any]], keys: Dict[str, Optional[str]], results: Dict[str, Any]):
+        """Extract one batch into `results`, halving it for the documents whose output came back malformed"""
+        if len(batch) == 1:
+            document = batch[0]
+            try:
+                results[document["id"]] = await self._extract_single_async(document, keys[document["id"]])
+            except HTTPException as e:
+                results[document["id"]] = e
+            return
+        
+        ids = [document["id"] for document in batch]
+        try:
+            ai_result = await self.ask_ainbox_gpt_async(
+                *self._batch_prompts(batch),
+                max_tokens=min(
+                    settings.ai_batch_max_output_tokens,
+                    sum(self.estimate_output_tokens(document["text"]) for document in batch)
+                )
+            )
+            responses, failed = self._split_batch_response(ai_result, ids)
+        except HTTPException as e:
+            logger.warning(f"Batch of {len(batch)} documents failed ({e.detail}), splitting it")
+            responses, failed = {}, ids
+        
+        for document in batch:
+            response = responses.get(document["id"])
+            if response is None:
+                continue
+            language_hint = document.get("language_hint")
+            results[document["id"]] = self._parse_combined(response, self._locale_fallback(language_hint))
+            await self._cache_store_async(keys[document["id"]], response, "combined", language_hint)
+        
+        if failed:
+            metrics.increment("ai_batch_splits")
+            retry = [document for document in batch if document["id"] in failed]
+            middle = (len(retry) + 1) // 2
+            halves = [half for half in (retry[:middle], retry[middle:]) if half]
+            await asyncio.gather(*(self._run_batch(half, keys, results) for half in halves))
+
+    async def analyze_batch_async(self, documents: List[Dict[str, Any]], timeout: Optional[float] = None,
+                                  on_result: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Locale and fields for many documents, packing several into each AI request
+        
+        `documents` are dicts with "id", "text" and an optional "language_hint".
+        Returns {id: (language, date_format, analysis)}, or {id: HTTPException}
+        for documents that could not be extracted. For bulk imports, where
+        throughput matters more than the latency of any one document.
+        
+        Each request batch gets `timeout` seconds; documents of a batch that runs
+        out of time fail with a 504 while the other batches carry on. `on_result`
+        is called with (id, outcome) as soon as each document is settled.
+        """
+        results: Dict[str, Any] = {}
+        keys: Dict[str, Optional[str]] = {}
+        pending = []
+        
+        def settle(document_id: str, outcome: Any):
+            results[document_id] = outcome
+            if on_result is not None:
+                on_result(document_id, outcome)
+        
+        for document in documents:
+            document = {**document, "id": str(document["id"])}
+            language_hint = document.get("language_hint")
+            key, cached = await self._cache_lookup_async("combined", document["text"], language_hint)
+            keys[document["id"]] = key
+            if cached is not None:
+                settle(document["id"], self._parse_combined(cached, self._locale_fallback(language_hint)))
+            else:
+                pending.append(document)
+        
+        async def run(batch: List[Dict[str, Any]]):
+            batch_results: Dict[str, Any] = {}
+            try:
+                await asyncio.wait_for(self._run_batch(batch, keys, batch_results), timeout=timeout)
+            except asyncio.TimeoutError:
+                metrics.increment("ai_batch_timeouts")
+                logger.warning(f"Batch of {len(batch)} documents exceeded {timeout}s, failing its unfinished documents")
+            for document in batch:
+                outcome = batch_results.get(document["id"])
+                if outcome is None:
+                    outcome = HTTPException(status_code=504, detail=f"AI extraction exceeded the {timeout}s batch timeout")
+                settle(document["id"], outcome)
+        
+        batches = self.plan_batches(pending)
+        logger.info(f"Batch extraction: {len(documents)} documents, {len(results)} cached, {len(batches)} requests")
+        await asyncio.gather(*(run(batch) for batch in batches))
+        return results
@@ -21,6 +21,31 @@ class Settings(BaseSettings):
     ai_api_url: str = "https://workspace.ainbox.ai/api/chat/completions"
     ai_model: str = "gpt-4"
     ai_timeout: int = 60
+    ai_connect_timeout: float = 10.0
+    ai_max_connections: int = 20
+    ai_max_keepalive_connections: int = 10
+    ai_keepalive_expiry: float = 30.0
+    ai_http2: bool = True
+    ai_requests_per_minute: float = 60.0  # provider rate limit shared by all AI calls
+    ai_burst: int = 10
+    ai_max_in_flight: int = 8
+    ai_scheduler_processes: int = 1  # server processes sharing the provider limit
+    ai_max_retries: int = 4
+    ai_backoff_base: float = 1.0
+    ai_backoff_max: float = 60.0
+    ai_single_call: bool = True  # Detect the locale and extract fields in one AI call
+    ai_stream_partial_results: bool = True  # Stream AI responses and push fields over WebSocket as they parse
+    ai_prompt_compaction: bool = True
+    ai_prompt_token_budget: int = 3000  # tokens of document text sent to the AI
+    ai_boilerplate_min_documents: int = 3  # earlier documents a long line must appear in to be dropped as boilerplate
+    ai_batch_token_budget: int = 6000  # document text tokens packed into one bulk extraction request
+    ai_batch_max_documents: int = 10
+    ai_batch_output_tokens_per_document: int = 700  # output reserved per document, before its line items
+    ai_batch_output_tokens_per_line: int = 45  # extra output reserved per text line holding a number
+    ai_batch_max_output_tokens: int = 4000
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_hours: float = 720.0
+    llm_cache_max_entries: int = 5000
     
     # File Processing
     allowed_file_types: str = '["application/pdf","image/png","image/jpeg","image/jpg","image/tiff","image/gif"]'
@@ -35,17 +60,68 @@ class Settings(BaseSettings):
     # Processing Settings
     processing_timeout: int = 300
     max_concurrent_jobs: int = 5
+    ocr_engine_pool_size: int = 4
+    ocr_engine_max_handles: int = 8  # tesserocr handles kept across all language specs
     job_timeout: int = 300
+    bulk_max_files: int = 100
+    
+    # OCR Settings
+    ocr_backend: str = "pytesseract"  # pytesseract, tesserocr
+    ocr_language: str = "eng"
+    ocr_auto_language: bool = False  # pick traineddata packs per page from a quick low-resolution pass (one extra OCR pass)
+    ocr_language_min_confidence: float = 0.5
+    ocr_language_probe_text_height: float = 14.0
+    ocr_adaptive_preprocessing: bool = True
+    ocr_target_text_height: float = 24.0  # glyph height in pixels, roughly 300 DPI body text
+    ocr_min_scale: float = 0.25
+    ocr_max_scale: float = 3.0
+    ocr_max_pixels: int = 12000000
+    ocr_deskew_min_confidence: float = 0.2
+    tessdata_path: Optional[str] = None
+    ocr_racing_enabled: bool = True
+    ocr_race_workers: int = 3
+    ocr_threads_per_worker: int = 1
+    ocr_early_stop_confidence: float = 85.0
+    ocr_early_stop_min_words: int = 20
+    ocr_layout_analysis: bool = True
+    ocr_layout_min_blocks: int = 2
+    ocr_layout_min_confidence: float = 70.0
+    ocr_adaptive_config_order: bool = True  # try the config that won before on the same layout first
+    ocr_fingerprint_max_distance: int = 24  # differing grid cells (of 288) for two pages to share a layout
+    ocr_tiling_enabled: bool = True
+    ocr_tile_min_pixels: int = 20000000
+    ocr_tile_size: int = 2048
+    ocr_tile_overlap: int = 64
+    ocr_tile_workers: int = 2
+    ocr_frame_workers: int = 2
+    ocr_cache_enabled: bool = True  # re-saved or re-exported copies of a page hit; edited pages never do
+    ocr_cache_dir: str = "./ocr_cache"
+    ocr_cache_max_mb: int = 512
+    ocr_config_timeout: float = 30.0  # seconds one Tesseract run may take before it is killed
+    ocr_document_timeout: float = 120.0  # seconds of OCR per document before partial results are returned
+    
+    # PDF Settings
+    pdf_text_backend: str = "pdfium"  # pdfium, pypdf2, pdfminer
+    pdf_min_text_chars: int = 50
+    pdf_ocr_dpi: int = 300
+    pdf_ocr_page_workers: int = 2
     
     # Localization
     default_language: str = "en"
     default_date_format: str = "MM/DD/YYYY"
+    local_locale_min_confidence: float = 0.7  # Below this the AI detects language and date format
     
     # Validation Thresholds
     min_confidence_threshold: float = 0.5
     max_amount_threshold: float = 1000000.0
     tax_rate_warning_threshold: float = 25.0
     
+    # Rule-based extraction
+    rule_extraction_enabled: bool = True  # Skip the AI when regexes and layout find every required field
+    rule_extraction_min_confidence: float = 0.8
+    rule_extraction_required_fields: List[str] = ["vendor_name", "total_amount", "invoice_number", "invoice_date"]
+    rule_extraction_fallback: bool = True  # Serve rule-based results when the AI service is unavailable
+    
     # Rate Limiting
     rate_limit_per_minute: int = 60
     
@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.layout import hamming_distance
+
+logger = logging.getLogger(__name__)
+
+# Buffered wins are written once this many are pending or the oldest is this many seconds old
+FLUSH_PENDING_WINS = 50
+FLUSH_INTERVAL = 60.0
+
+class ConfigHistory:
+    """Which OCR config has won for each page layout, kept in memory and persisted in the database
+
+    Fingerprints come from app.core.layout.layout_fingerprint. A new page is
+    matched to the nearest recorded layout with the same aspect ratio, and its
+    wins are counted against that layout, so scans of one template share a
+    single profile. Wins count in memory at once and reach the database in
+    batches, so OCR'ing a page does not cost a write.
+
+    Once a saved invoice names a layout's vendor, the layout's preferred config
+    is picked from the wins of all that vendor's layouts, so a template variant
+    seen only a few times still benefits from the vendor's history.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._wins: Optional[Dict[str, Dict[str, int]]] = None
+        self._vendors: Dict[str, str] = {}
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._pending_vendors: Dict[str, str] = {}
+        self._pending_since = 0.0
+        self._flush_lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        """Read all profiles from the database once, on first use"""
+        if self._wins is None:
+            wins: Dict[str, Dict[str, int]] = {}
+            try:
+                from app.db.operations import db_ops
+                for profile in db_ops.get_layout_profiles():
+                    configs = wins.setdefault(profile.fingerprint, {})
+                    configs[profile.config] = configs.get(profile.config, 0) + (profile.wins or 0)
+                    if profile.vendor_name:
+                        self._vendors[profile.fingerprint] = profile.vendor_name
+                logger.info(f"Loaded OCR config history for {len(wins)} layouts")
+            except Exception as e:
+                logger.warning(f"Could not load OCR config history: {e}")
+            self._wins = wins
+        return self._wins
+
+    def _nearest(self, fingerprint: str) -> Optional[str]:
+        best, best_distance = None, self.max_distance + 1
+        for known in self._load():
+            if known[:2] != fingerprint[:2] or len(known) != len(fingerprint):
+                continue
+            distance = 0 if known == fingerprint else hamming_distance(known[2:], fingerprint[2:])
+            if distance < best_distance:
+                best, best_distance = known, distance
+        return best
+
+    def lookup(self, fingerprint: str) -> Tuple[str, Optional[str]]:
+        """(profile fingerprint, config that has won most often) for a page's layout
+
+        Unknown layouts get their own fingerprint back and no preferred config;
+        pass the returned fingerprint to record_win.
+        """
+        with self._lock:
+            known = self._nearest(fingerprint)
+            if known is None:
+                return fingerprint, None
+            configs = dict(self._wins[known])
+            vendor = self._vendors.get(known)
+            if vendor is not None:
+                for other, other_configs in self._wins.items():
+                    if other != known and self._vendors.get(other) == vendor:
+                        for config, wins in other_configs.items():
+                            configs[config] = configs.get(config, 0) + wins
+            return known, max(configs.items(), key=lambda item: item[1])[0] if configs else None
+
+    def tag_vendor(self, fingerprint: str, vendor_name: str):
+        """Name the vendor of a layout profile, written together with any buffered wins"""
+        with self._lock:
+            self._load()
+            if self._vendors.get(fingerprint) == vendor_name:
+                return
+            self._vendors[fingerprint] = vendor_name
+            self._pending_vendors[fingerprint] = vendor_name
+
+        # Invoices are saved far less often than pages are OCR'd; write now so the tag lands with its profile
+        self.flush()
+
+    def record_win(self, fingerprint: str, config: str):
+        """Count a win for `config` on the layout profile returned by lookup()"""
+        with self._lock:
+            configs = self._load().setdefault(fingerprint, {})
+            configs[config] = configs.get(config, 0) + 1
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending[(fingerprint, config)] = self._pending.get((fingerprint, config), 0) + 1
+            due = (
+                sum(self._pending.values()) >= FLUSH_PENDING_WINS
+                or time.monotonic() - self._pending_since >= FLUSH_INTERVAL
+            )
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered wins and vendor tags to the database; they stay buffered if the write fails"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                vendors, self._pending_vendors = self._pending_vendors, {}
+            if not pending and not vendors:
+                return
+
+            try:
+                from app.db.operations import db_ops
+                db_ops.record_layout_config_wins(pending, vendors)
+            except Exception as e:
+                logger.warning(f"Could not persist OCR config wins: {e}")
+                with self._lock:
+                    for key, count in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + count
+                    self._pending_vendors = {**vendors, **self._pending_vendors}
+                    self._pending_since = time.monotonic()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            wins = self._load()
+            return {"layouts": len(wins), "wins": sum(sum(configs.values()) for configs in wins.values())}
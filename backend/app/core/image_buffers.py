@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import io
+import logging
+from typing import Any, Iterator, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ImageInput = Union[Image.Image, np.ndarray]
+
+# Only these containers can hold several pages; everything else is decoded as a single frame
+MULTI_FRAME_SIGNATURES = (b"II*\x00", b"MM\x00*", b"GIF87a", b"GIF89a")
+
+def decode_grayscale(content: bytes) -> np.ndarray:
+    """Decode encoded image bytes straight into one 8-bit grayscale buffer
+
+    OpenCV decodes JPEG/PNG/TIFF directly to grayscale (honouring EXIF
+    orientation) without materializing the colour image. Formats it cannot
+    read fall back to PIL, converting to grayscale before the single copy
+    into numpy. Raises ValueError for undecodable bytes.
+    """
+    encoded = np.frombuffer(content, dtype=np.uint8)
+    gray = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+    if gray is not None and gray.size:
+        return gray
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        if image.mode != "L":
+            image = image.convert("L")
+        # A copy: views over PIL memory are read-only, and callers preprocess this buffer in place
+        return np.array(image)
+    except Exception as e:
+        raise ValueError(f"Invalid image format: {e}")
+
+def open_multi_frame(content: bytes) -> Optional[Image.Image]:
+    """Open a multi-page TIFF or animated GIF lazily, or return None for single-frame images
+
+    Only the header and frame index are read here; pixel data is decoded frame
+    by frame by iter_frames.
+    """
+    if not content.startswith(MULTI_FRAME_SIGNATURES):
+        return None
+    try:
+        image = Image.open(io.BytesIO(content))
+        if getattr(image, "n_frames", 1) > 1:
+            return image
+    except Exception as e:
+        logger.warning(f"Could not read frame index: {e}")
+    return None
+
+def iter_frames(image: Image.Image) -> Iterator[np.ndarray]:
+    """Decode the frames of a multi-frame image one at a time as grayscale arrays"""
+    for index in range(image.n_frames):
+        image.seek(index)
+        frame = image if image.mode == "L" else image.convert("L")
+        # Copy out of PIL: seeking to the next frame reuses its buffer
+        yield np.array(frame)
+
+def to_grayscale(image: ImageInput) -> np.ndarray:
+    """8-bit grayscale array for any decoded image, copying only when a conversion is needed"""
+    if isinstance(image, Image.Image):
+        if image.mode != "L":
+            image = image.convert("L")
+        return np.asarray(image)
+
+    if image.ndim == 3:
+        code = cv2.COLOR_RGBA2GRAY if image.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        return cv2.cvtColor(image, code)
+    return image
+
+def image_size(image: ImageInput) -> Tuple[int, int]:
+    """(width, height) of a PIL image or array without touching its pixels"""
+    if isinstance(image, Image.Image):
+        return image.size
+    return image.shape[1], image.shape[0]
+
+def allocated_bytes(result: Any, source: Optional[np.ndarray] = None) -> int:
+    """Bytes of new pixel data a stage produced (0 when it returned or wrote into its input)"""
+    if isinstance(result, tuple):
+        result = next((item for item in reversed(result) if isinstance(item, np.ndarray)), None)
+    if not isinstance(result, np.ndarray):
+        return 0
+    if source is not None and np.may_share_memory(result, source):
+        return 0
+    return int(result.nbytes)
@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+import logging
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Preprocessing tiers, cheapest first
+TIER_CLEAN = "clean"        # digital exports/screenshots: deskew + threshold only
+TIER_STANDARD = "standard"  # decent scans: light median denoise, upscale small text
+TIER_FULL = "full"          # phone photos, noisy or blurry scans: full treatment
+
+# Estimates run on a copy no larger than this on its longest side
+ANALYSIS_MAX_SIDE = 1000
+# Noise is measured on a full-resolution centre crop of this size
+NOISE_CROP_SIZE = 512
+
+# Quality gate thresholds
+CLEAN_MAX_NOISE = 2.0
+CLEAN_MIN_BACKGROUND = 0.6
+STANDARD_MAX_NOISE = 6.0
+MIN_SHARPNESS = 100.0
+# Glyphs shorter than this (full-resolution pixels) need a large upscale, which
+# global Otsu thresholding handles poorly
+CLEAN_MIN_TEXT_HEIGHT = 10.0
+
+def _downsample(gray: np.ndarray, max_side: int = ANALYSIS_MAX_SIDE) -> np.ndarray:
+    """Shrink an image so its longest side is at most max_side"""
+    height, width = gray.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return gray
+    return cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+def estimate_noise(gray: np.ndarray) -> float:
+    """Estimate Gaussian noise sigma with Immerkaer's operator on a centre crop
+    
+    The median absolute response is used instead of the mean so that text edges,
+    which cover a minority of the crop, do not read as noise.
+    """
+    height, width = gray.shape[:2]
+    top = max(0, (height - NOISE_CROP_SIZE) // 2)
+    left = max(0, (width - NOISE_CROP_SIZE) // 2)
+    crop = gray[top:top + NOISE_CROP_SIZE, left:left + NOISE_CROP_SIZE]
+
+    if crop.shape[0] < 3 or crop.shape[1] < 3:
+        return 0.0
+
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = cv2.filter2D(crop.astype(np.float32), -1, kernel)[1:-1, 1:-1]
+    # The kernel's L2 norm is 6; 1.4826 turns a median absolute deviation into sigma
+    return float(1.4826 * np.median(np.abs(response)) / 6)
+
+def estimate_text_height(binary_inv: np.ndarray) -> float:
+    """Median height of character-sized connected components (white text on black)"""
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary_inv, connectivity=8)
+    if count <= 1:
+        return 0.0
+
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    image_height = binary_inv.shape[0]
+
+    # Ignore specks, rules, table borders and large graphics
+    plausible = (heights >= 3) & (heights <= image_height * 0.1) & (widths <= heights * 4)
+    if not plausible.any():
+        return 0.0
+
+    return float(np.median(heights[plausible]))
+
+def measure_text_height(gray: np.ndarray) -> float:
+    """Dominant glyph height in full-resolution pixels, measured on a downsampled copy"""
+    small = _downsample(gray)
+    _, binary_inv = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return estimate_text_height(binary_inv) * gray.shape[0] / small.shape[0]
+
+def estimate_image_quality(gray: np.ndarray) -> Dict[str, Any]:
+    """Cheap quality estimates used to decide how much preprocessing an image needs"""
+    small = _downsample(gray)
+    scale = gray.shape[0] / small.shape[0]
+
+    _, binary_inv = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    return {
+        "width": int(gray.shape[1]),
+        "height": int(gray.shape[0]),
+        "sharpness": float(cv2.Laplacian(small, cv2.CV_64F).var()),
+        "noise": estimate_noise(gray),
+        "background_ratio": float(np.count_nonzero(small > 200) / small.size),
+        "text_height": estimate_text_height(binary_inv) * scale,
+    }
+
+def select_preprocessing_tier(quality: Dict[str, Any]) -> str:
+    """Pick the cheapest preprocessing tier that suits the measured image quality
+    
+    Skew is not considered: deskewing runs on every tier with its own estimate.
+    """
+    small_text = 0 < quality["text_height"] < CLEAN_MIN_TEXT_HEIGHT
+    if (
+        quality["noise"] <= CLEAN_MAX_NOISE
+        and quality["background_ratio"] >= CLEAN_MIN_BACKGROUND
+        and quality["sharpness"] >= MIN_SHARPNESS
+        and not small_text
+    ):
+        return TIER_CLEAN
+
+    if quality["noise"] <= STANDARD_MAX_NOISE and quality["sharpness"] >= MIN_SHARPNESS:
+        return TIER_STANDARD
+
+    return TIER_FULL
+
+def compute_resample_scale(text_height: float, width: int, height: int, target_text_height: float,
+                           min_scale: float, max_scale: float, max_pixels: int) -> float:
+    """Scale factor that brings the dominant glyph height to the OCR target size
+    
+    Oversized images are scaled down as well as small ones up, and the result is
+    capped so the resampled image stays under max_pixels. Returns 1.0 when the
+    text height is unknown or already close enough to the target.
+    """
+    if text_height <= 0:
+        scale = 1.0
+    else:
+        scale = min(max(target_text_height / text_height, min_scale), max_scale)
+
+    if width * height * scale * scale > max_pixels:
+        scale = (max_pixels / (width * height)) ** 0.5
+
+    # Resampling costs more than it gains for small corrections
+    if 0.85 <= scale <= 1.15:
+        return 1.0
+    return scale
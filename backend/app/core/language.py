@@ -0,0 +1,122 @@
+import re
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Languages we extract invoices in (same codes the AI analyzer accepts) and their Tesseract packs
+TESSERACT_LANGUAGES = {
+    "en": "eng",
+    "fr": "fra",
+    "de": "deu",
+    "es": "spa",
+    "it": "ita",
+    "nl": "nld",
+    "pt": "por",
+}
+
+# Frequent function words and invoice vocabulary; all lowercase, accents included
+LANGUAGE_WORDS = {
+    "en": {
+        "the", "and", "of", "to", "for", "invoice", "total", "amount", "due", "date", "tax",
+        "subtotal", "qty", "quantity", "description", "price", "payment", "bill", "ship", "terms",
+    },
+    "fr": {
+        "le", "la", "les", "de", "du", "des", "et", "facture", "montant", "tva", "ttc", "ht",
+        "date", "échéance", "quantité", "prix", "désignation", "règlement", "total", "à",
+    },
+    "de": {
+        "der", "die", "das", "und", "für", "rechnung", "betrag", "mwst", "ust", "summe", "datum",
+        "menge", "preis", "gesamt", "netto", "brutto", "zahlbar", "bis", "rechnungsnummer", "mit",
+    },
+    "es": {
+        "el", "la", "los", "de", "del", "y", "factura", "importe", "iva", "fecha", "cantidad",
+        "precio", "descripción", "total", "vencimiento", "pago", "por", "número", "base", "con",
+    },
+    "it": {
+        "il", "la", "di", "del", "della", "e", "fattura", "importo", "iva", "data", "quantità",
+        "prezzo", "descrizione", "totale", "scadenza", "pagamento", "imponibile", "per", "numero", "con",
+    },
+    "nl": {
+        "de", "het", "een", "en", "van", "factuur", "bedrag", "btw", "datum", "aantal", "prijs",
+        "omschrijving", "totaal", "vervaldatum", "betaling", "voor", "met", "factuurnummer", "te", "excl",
+    },
+    "pt": {
+        "o", "a", "os", "de", "do", "da", "e", "fatura", "nota", "valor", "iva", "data",
+        "quantidade", "preço", "descrição", "total", "vencimento", "pagamento", "número", "não",
+    },
+}
+
+# Letters that (almost) only one of our languages uses
+LANGUAGE_LETTERS = {
+    "de": "ßäöü",
+    "fr": "èêëçœ",
+    "es": "ñ¿¡",
+    "pt": "ãõ",
+    "it": "ìò",
+}
+
+# A second language scoring at least this fraction of the first is loaded alongside it
+SECONDARY_LANGUAGE_RATIO = 0.5
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+def score_languages(text: str) -> Dict[str, float]:
+    """Evidence per language from function words, invoice vocabulary and distinctive letters"""
+    words = Counter(word.lower() for word in WORD_PATTERN.findall(text))
+    scores = {language: 0.0 for language in LANGUAGE_WORDS}
+
+    for language, vocabulary in LANGUAGE_WORDS.items():
+        scores[language] += sum(count for word, count in words.items() if word in vocabulary)
+
+    lowered = text.lower()
+    for language, letters in LANGUAGE_LETTERS.items():
+        scores[language] += 0.5 * sum(lowered.count(letter) for letter in letters)
+
+    return scores
+
+def detect_language(text: str) -> Tuple[Optional[str], float]:
+    """Most likely language of a text and a 0-1 confidence (share of the evidence)
+
+    Returns (None, 0.0) when the text holds no evidence at all.
+    """
+    scores = score_languages(text)
+    total = sum(scores.values())
+    if total <= 0:
+        return None, 0.0
+
+    language = max(scores, key=scores.get)
+    return language, scores[language] / total
+
+def select_tesseract_languages(text: str, min_confidence: float, default: str,
+                               available: Optional[List[str]] = None) -> Tuple[str, Optional[str]]:
+    """Smallest set of traineddata packs for a text, as a Tesseract language spec
+
+    Returns (spec such as "fra" or "deu+eng", detected language code or None).
+    Falls back to `default` when the guess is weak or the pack is not installed.
+    """
+    scores = score_languages(text)
+    total = sum(scores.values())
+    if total <= 0:
+        return default, None
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    language = ranked[0]
+    if scores[language] / total < min_confidence:
+        logger.info(f"Language guess too weak ({language}: {scores[language] / total:.2f}), using '{default}'")
+        return default, None
+
+    packs = [TESSERACT_LANGUAGES[language]]
+    runner_up = ranked[1]
+    if scores[runner_up] >= scores[language] * SECONDARY_LANGUAGE_RATIO:
+        packs.append(TESSERACT_LANGUAGES[runner_up])
+
+    if available is not None:
+        packs = [pack for pack in packs if pack in available]
+        if not packs:
+            logger.warning(f"No traineddata installed for '{language}', using '{default}'")
+            return default, language
+
+    # Sorted, so the same pair always maps to the same engine pool
+    return "+".join(sorted(packs)), language
@@ -0,0 +1,252 @@
+import cv2
+import numpy as np
+import logging
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from app.core.image_quality import estimate_text_height
+
+logger = logging.getLogger(__name__)
+
+# Segmentation runs on a copy no larger than this on its longest side
+LAYOUT_MAX_SIDE = 1600
+
+# Block kinds and the Tesseract config used for each
+BLOCK_LINE = "line"
+BLOCK_COLUMN = "column"
+BLOCK_TABLE = "table"
+BLOCK_PARAGRAPH = "paragraph"
+
+BLOCK_CONFIGS = {
+    BLOCK_LINE: '--psm 7',
+    BLOCK_COLUMN: '--psm 4',
+    BLOCK_TABLE: '--psm 6 -c preserve_interword_spaces=1',
+    BLOCK_PARAGRAPH: '--psm 6',
+}
+
+# Blocks denser than this are solid graphics (logos, stamps, filled boxes), not text
+MAX_TEXT_INK_DENSITY = 0.45
+# Horizontal gaps wider than this many glyph heights inside a block separate table columns
+TABLE_GAP_HEIGHTS = 2.0
+# Side-by-side multi-line blocks merge into one table when one is narrower than this many glyph heights
+NARROW_COLUMN_HEIGHTS = 8.0
+
+# Layout fingerprints sample ink on a coarse grid over the page header, which repeats across a vendor's invoices
+FINGERPRINT_REGION = 0.35
+FINGERPRINT_GRID = (24, 12)  # columns, rows
+FINGERPRINT_MIN_INK = 0.01
+
+class TextBlock(NamedTuple):
+    left: int
+    top: int
+    width: int
+    height: int
+    kind: str
+    lines: int
+
+def _runs(mask: np.ndarray) -> List[int]:
+    """Lengths of consecutive True runs in a 1-D mask"""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return list(edges[1::2] - edges[::2])
+
+def classify_block(ink: np.ndarray, text_height: float) -> Tuple[str, int]:
+    """Pick a block kind from the projection profiles of its ink (white on black)"""
+    row_profile = ink.any(axis=1)
+    lines = len([run for run in _runs(row_profile) if run >= text_height * 0.4])
+
+    if lines <= 1:
+        return BLOCK_LINE, max(lines, 1)
+
+    # Ruled lines would bridge every column gap; leave them out of the column profile
+    text_rows = ink[ink.mean(axis=1) < 0.8]
+    column_gaps = [run for run in _runs(~text_rows.any(axis=0)) if run >= text_height * TABLE_GAP_HEIGHTS]
+    height, width = ink.shape
+    if len(column_gaps) >= 2:
+        return BLOCK_TABLE, lines
+    if width < height * 0.5:
+        return BLOCK_COLUMN, lines
+    return BLOCK_PARAGRAPH, lines
+
+def find_text_blocks(binary: np.ndarray) -> List[TextBlock]:
+    """Find text blocks on a binarized page (dark text on white) with morphology
+
+    Works on a downsampled copy: glyphs are smeared into blobs with a wide,
+    short closing kernel sized from the dominant glyph height, so words on a
+    line and the cells of a table row merge while columns separated by a
+    gutter stay apart. Specks, thin rules and solid graphics are dropped.
+    Coordinates are returned in the full-resolution image.
+    """
+    height, width = binary.shape[:2]
+    scale = min(1.0, LAYOUT_MAX_SIDE / max(height, width))
+    small = binary
+    if scale < 1.0:
+        small = cv2.resize(binary, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    text_height = estimate_text_height(ink)
+    if text_height <= 0:
+        return []
+
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (max(3, int(text_height * 3)), max(3, int(text_height * 2)))
+    )
+    smeared = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, kernel)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(smeared, connectivity=8)
+
+    boxes = []
+    for left, top, block_width, block_height, _ in stats[1:count]:
+        if block_height < text_height * 0.5 or block_width < text_height:
+            continue  # specks and stray marks
+
+        region = ink[top:top + block_height, left:left + block_width] > 0
+        if region.mean() > MAX_TEXT_INK_DENSITY:
+            continue  # logos, stamps, filled boxes
+
+        _, lines = classify_block(region, text_height)
+        boxes.append((int(left), int(top), int(left + block_width), int(top + block_height), lines))
+
+    blocks = []
+    for left, top, right, bottom in _merge_rows(boxes, text_height):
+        kind, lines = classify_block(ink[top:bottom, left:right] > 0, text_height)
+        blocks.append(TextBlock(
+            int(left / scale), int(top / scale),
+            int(np.ceil((right - left) / scale)), int(np.ceil((bottom - top) / scale)),
+            kind, lines
+        ))
+
+    return blocks
+
+def _merge_rows(boxes: List[Tuple[int, int, int, int, int]], text_height: float) -> List[Tuple[int, int, int, int]]:
+    """Merge side-by-side boxes that belong to the same row
+
+    Single lines on the same row (a label and its value) become one line, and
+    multi-line blocks next to a narrow column of the same extent (quantities,
+    amounts) become one table, so Tesseract reads them row by row instead of
+    column by column. Wide text columns stay separate.
+    """
+    parent = list(range(len(boxes)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, (left_a, top_a, right_a, bottom_a, lines_a) in enumerate(boxes):
+        for j in range(i + 1, len(boxes)):
+            left_b, top_b, right_b, bottom_b, lines_b = boxes[j]
+            overlap = min(bottom_a, bottom_b) - max(top_a, top_b)
+            if overlap <= 0:
+                continue
+            overlap /= min(bottom_a - top_a, bottom_b - top_b)
+
+            same_line = lines_a == 1 and lines_b == 1 and overlap >= 0.6
+            table = (
+                lines_a > 1 and lines_b > 1 and overlap >= 0.8
+                and min(right_a - left_a, right_b - left_b) < text_height * NARROW_COLUMN_HEIGHTS
+            )
+            if same_line or table:
+                parent[find(j)] = find(i)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(boxes)):
+        groups.setdefault(find(i), []).append(i)
+
+    return [
+        (
+            min(boxes[i][0] for i in members), min(boxes[i][1] for i in members),
+            max(boxes[i][2] for i in members), max(boxes[i][3] for i in members)
+        )
+        for members in groups.values()
+    ]
+
+def _split(blocks: List[TextBlock], indices: List[int], vertical: bool) -> List[List[int]]:
+    """Group blocks separated by empty gaps along one axis, in top-to-bottom or left-to-right order"""
+    if vertical:
+        spans = sorted((blocks[i].top, blocks[i].top + blocks[i].height, i) for i in indices)
+    else:
+        spans = sorted((blocks[i].left, blocks[i].left + blocks[i].width, i) for i in indices)
+
+    groups = []
+    current = []
+    reach = None
+    for start, end, index in spans:
+        if current and start >= reach:
+            groups.append(current)
+            current = []
+            reach = None
+        current.append(index)
+        reach = end if reach is None else max(reach, end)
+    if current:
+        groups.append(current)
+    return groups
+
+def reading_order(blocks: List[TextBlock]) -> List[int]:
+    """Order blocks with a recursive XY-cut: horizontal bands first, then columns within a band"""
+    def order(indices: List[int]) -> List[int]:
+        if len(indices) <= 1:
+            return indices
+
+        groups = _split(blocks, indices, vertical=True)
+        if len(groups) == 1:
+            groups = _split(blocks, indices, vertical=False)
+            if len(groups) == 1:
+                return sorted(indices, key=lambda i: (blocks[i].top, blocks[i].left))
+
+        return [i for group in groups for i in order(group)]
+
+    return order(list(range(len(blocks))))
+
+def layout_fingerprint(binary: np.ndarray) -> str:
+    """Coarse fingerprint of a binarized page's header layout as a hex string
+    
+    The first two characters are the aspect ratio (width/height x 10) and must
+    match exactly; the rest is one bit per grid cell that holds ink, compared
+    by Hamming distance. Amounts, dates and line items change a few cells at
+    most, while a different template moves whole blocks.
+    """
+    height, width = binary.shape[:2]
+    header = binary[:max(1, int(height * FINGERPRINT_REGION))]
+    ink = (header < 128).astype(np.float32)
+    cells = cv2.resize(ink, FINGERPRINT_GRID, interpolation=cv2.INTER_AREA)
+    bits = (cells > FINGERPRINT_MIN_INK).flatten()
+    aspect = min(99, int(round(width / max(1, height) * 10)))
+    return f"{aspect:02d}{np.packbits(bits).tobytes().hex()}"
+
+def hamming_distance(a: str, b: str) -> int:
+    """Number of differing bits between two equal-length hex strings"""
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def merge_block_results(results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Join per-block OCR results (already in reading order) into one page result
+
+    Each result carries the page `offset` of its crop; word boxes are shifted
+    back into page coordinates and renumbered so the block number is the
+    block's position in reading order.
+    """
+    texts = []
+    words = []
+    weighted_confidence = 0.0
+    word_count = 0
+
+    for order, result in enumerate(results, start=1):
+        if not result or not result["text"].strip():
+            continue
+        texts.append(result["text"].strip())
+        for word in result["words"]:
+            words.append({
+                **word,
+                "left": word["left"] + result["offset"][0],
+                "top": word["top"] + result["offset"][1],
+                "block": order,
+            })
+        weighted_confidence += result["confidence"] * result["word_count"]
+        word_count += result["word_count"]
+
+    return {
+        "config": "layout",
+        "text": "\n\n".join(texts),
+        "confidence": weighted_confidence / word_count if word_count else 0.0,
+        "word_count": word_count,
+        "words": words,
+    }
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever a prompt or the response schema changes; it invalidates cached responses
+PROMPT_VERSION = "3"
+
+# Evict at most once per this many stores; between runs the table may overshoot its bound slightly
+EVICTION_INTERVAL = 50
+
+# Seconds between refreshes of the entry count reported by stats()
+ENTRY_COUNT_INTERVAL = 60.0
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Document text with whitespace runs collapsed, so re-OCR'd layouts of the same text share a key"""
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+class LLMResponseCache:
+    """Database-backed cache of raw AI responses keyed by document text
+
+    Keys hash the normalized text together with the prompt kind, PROMPT_VERSION,
+    model and locale, so any change to what is asked misses the cache. Entries
+    expire after `ttl_seconds`; past `max_entries` the least recently used go
+    first.
+
+    Every method queries the database synchronously: call them from a worker
+    thread (asyncio.to_thread) when on the event loop.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stores_since_eviction = EVICTION_INTERVAL
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self._entries: Optional[int] = None
+        self._entries_counted_at = 0.0
+
+    @staticmethod
+    def make_key(text: str, prompt_kind: str, model: str,
+                 language: Optional[str] = None, date_format: Optional[str] = None) -> str:
+        digest = hashlib.sha256()
+        for part in (PROMPT_VERSION, prompt_kind, model, language or "", date_format or "", normalize_text(text)):
+            digest.update(str(part).encode("utf-8") + b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for a key, or None"""
+        try:
+            from app.db.operations import db_ops
+            response = db_ops.get_llm_cache_response(key, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            with self._lock:
+                self.errors += 1
+            return None
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def put(self, key: str, response: str, prompt_kind: str, model: str,
+            language: Optional[str] = None, date_format: Optional[str] = None):
+        """Store a response, evicting expired and least recently used entries now and then"""
+        try:
+            from app.db.operations import db_ops
+            db_ops.save_llm_cache_response(key, response, prompt_kind, PROMPT_VERSION, model, language, date_format)
+        except Exception as e:
+            logger.warning(f"Failed to store LLM cache entry: {e}")
+            with self._lock:
+                self.errors += 1
+            return
+
+        with self._lock:
+            self.stores += 1
+            self._stores_since_eviction += 1
+            due = self._stores_since_eviction >= EVICTION_INTERVAL
+            if due:
+                self._stores_since_eviction = 0
+
+        if due:
+            self.evict()
+
+    def evict(self):
+        try:
+            from app.db.operations import db_ops
+            removed = db_ops.evict_llm_cache(self.max_entries, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"LLM cache eviction failed: {e}")
+            with self._lock:
+                self.errors += 1
+            return
+
+        with self._lock:
+            self.evictions += removed
+        if removed:
+            logger.info(f"LLM cache evicted {removed} entries")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, with the entry count refreshed at most every ENTRY_COUNT_INTERVAL seconds"""
+        if time.monotonic() - self._entries_counted_at >= ENTRY_COUNT_INTERVAL:
+            try:
+                from app.db.operations import db_ops
+                self._entries = db_ops.count_llm_cache_entries()
+            except Exception:
+                self._entries = None
+            self._entries_counted_at = time.monotonic()
+        entries = self._entries
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -0,0 +1,214 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: interactive uploads before background jobs
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Priority of AI calls made from the current request or job; background jobs set PRIORITY_BATCH
+llm_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+# Longest a waiter sleeps before re-checking, in case a wake-up was missed
+MAX_WAIT_STEP = 1.0
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta seconds or an HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Delay before retry `attempt` (0-based): the provider's Retry-After if given, else full-jitter exponential"""
+    if retry_after is not None:
+        # A little jitter so queued callers do not all return in the same instant
+        return min(cap, retry_after) + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class _Waiter:
+    __slots__ = ("granted", "event", "future", "loop")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+class LLMScheduler:
+    """Process-wide gate for AI requests: token bucket, in-flight cap, priority queue and global cooldown
+
+    Requests are admitted in priority order (then arrival order) when a
+    bucket token is available, fewer than `max_in_flight` are running and no
+    rate-limit cooldown is active. A 429 from the provider calls pause(),
+    which holds back every queued request rather than letting each one
+    discover the limit on its own.
+
+    With several server processes, `processes` splits the rate and the
+    in-flight cap between them so together they stay under the provider's limit.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int, max_in_flight: int, processes: int = 1):
+        processes = max(1, processes)
+        self.rate = requests_per_minute / 60.0 / processes
+        self.capacity = max(1.0, burst / processes)
+        self.max_in_flight = max(1, max_in_flight // processes)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cooldown_until = 0.0
+        self._in_flight = 0
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.pauses = 0
+        self.peak_queue = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _next_ready_in(self, now: float) -> float:
+        """Seconds until the bucket or the cooldown could admit the head of the queue"""
+        wait = max(0.0, self._cooldown_until - now)
+        if self._tokens < 1 and self.rate > 0:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        return min(MAX_WAIT_STEP, wait) if wait else MAX_WAIT_STEP
+
+    def _dispatch(self):
+        """Admit waiters from the head of the queue while capacity allows (caller holds the lock)"""
+        now = time.monotonic()
+        self._refill(now)
+        while self._queue and self._in_flight < self.max_in_flight and now >= self._cooldown_until and self._tokens >= 1:
+            _, _, waiter = heapq.heappop(self._queue)
+            self._tokens -= 1
+            self._in_flight += 1
+            self.admitted += 1
+            waiter.granted = True
+            waiter.wake()
+
+    def _enqueue(self, waiter: _Waiter, priority: int):
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            self.peak_queue = max(self.peak_queue, len(self._queue))
+            self._dispatch()
+
+    def _abandon(self, waiter: _Waiter):
+        """Take a cancelled waiter out of the queue, or give back the slot it was just granted"""
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+            else:
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+            self._dispatch()
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def pause(self, seconds: float):
+        """Hold back all requests for `seconds`, e.g. after the provider answered 429"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._cooldown_until:
+                self._cooldown_until = until
+                self.pauses += 1
+                metrics.increment("ai_rate_limit_pauses")
+                logger.warning(f"AI requests paused for {seconds:.1f}s after a rate limit response")
+
+    async def acquire_async(self, priority: Optional[int] = None):
+        waiter = _Waiter(asyncio.get_running_loop())
+        self._enqueue(waiter, llm_priority.get() if priority is None else priority)
+        try:
+            while not waiter.granted:
+                with self._lock:
+                    self._dispatch()
+                    delay = self._next_ready_in(time.monotonic())
+                if waiter.granted:
+                    break
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def acquire(self, priority: Optional[int] = None):
+        """Blocking acquire for callers running in worker threads"""
+        waiter = _Waiter()
+        self._enqueue(waiter, llm_priority.get() if priority is None else priority)
+        try:
+            while not waiter.granted:
+                with self._lock:
+                    self._dispatch()
+                    delay = self._next_ready_in(time.monotonic())
+                if waiter.granted:
+                    break
+                waiter.event.wait(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot_async(self, priority: Optional[int] = None):
+        """`async with scheduler.slot_async():` around one AI request"""
+        await self.acquire_async(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "in_flight": self._in_flight,
+                "queued": len(self._queue),
+                "peak_queue": self.peak_queue,
+                "admitted": self.admitted,
+                "tokens": round(self._tokens, 2),
+                "rate_per_second": self.rate,
+                "max_in_flight": self.max_in_flight,
+                "pauses": self.pauses,
+                "cooldown_seconds": round(max(0.0, self._cooldown_until - now), 2),
+            }
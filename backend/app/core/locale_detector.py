@@ -0,0 +1,135 @@
+import re
+from typing import Dict, Tuple
+
+from app.core.language import score_languages
+from app.core.validator import DATE_PATTERN
+
+# Country -> (language, date format) for the locales we extract
+COUNTRY_LOCALES = {
+    "US": ("en", "MM/DD/YYYY"),
+    "GB": ("en", "DD/MM/YYYY"),
+    "IE": ("en", "DD/MM/YYYY"),
+    "FR": ("fr", "DD/MM/YYYY"),
+    "BE": ("fr", "DD/MM/YYYY"),
+    "CH": ("de", "DD/MM/YYYY"),
+    "DE": ("de", "DD/MM/YYYY"),
+    "AT": ("de", "DD/MM/YYYY"),
+    "ES": ("es", "DD/MM/YYYY"),
+    "IT": ("it", "DD/MM/YYYY"),
+    "NL": ("nl", "DD/MM/YYYY"),
+    "PT": ("pt", "DD/MM/YYYY"),
+    "BR": ("pt", "DD/MM/YYYY"),
+}
+
+# (pattern, countries it points to, weight); matched against the raw text
+COUNTRY_CLUES = [
+    # Currencies
+    (re.compile(r"\bUSD\b|US\$|\$\s?\d"), ("US",), 1.0),
+    (re.compile(r"£|\bGBP\b"), ("GB",), 2.0),
+    (re.compile(r"\bCHF\b"), ("CH",), 2.0),
+    (re.compile(r"R\$|\bBRL\b"), ("BR",), 2.0),
+    (re.compile(r"€|\bEUR\b"), ("FR", "BE", "DE", "AT", "ES", "IT", "NL", "PT", "IE"), 1.0),
+    # Tax vocabulary
+    (re.compile(r"\bsales tax\b", re.IGNORECASE), ("US",), 2.0),
+    (re.compile(r"\bVAT\b"), ("GB", "IE"), 2.0),
+    (re.compile(r"\bTVA\b|\bTTC\b|\bSIRE[NT]\b"), ("FR", "BE"), 2.0),
+    (re.compile(r"\bMwSt\b|\bUSt-?Id", re.IGNORECASE), ("DE", "AT", "CH"), 2.0),
+    (re.compile(r"\bBTW\b|\bKvK\b"), ("NL", "BE"), 2.0),
+    (re.compile(r"\bIVA\b|\bNIF\b"), ("ES", "IT", "PT"), 1.0),
+    (re.compile(r"\bCIF\b"), ("ES",), 1.0),
+    (re.compile(r"\bP\.?\s?IVA\b|\bpartita iva\b", re.IGNORECASE), ("IT",), 2.0),
+    # Postal codes
+    (re.compile(r"\b[A-Z]{2}\s\d{5}(?:-\d{4})?\b"), ("US",), 2.0),
+    (re.compile(r"\b[A-Z]{1,2}\d[A-Z\d]?\s\d[A-Z]{2}\b"), ("GB",), 2.0),
+    (re.compile(r"\b\d{4}\s?[A-Z]{2}\b"), ("NL",), 1.0),
+    (re.compile(r"\b\d{4}-\d{3}\b"), ("PT",), 1.0),
+    # International dialling codes
+    (re.compile(r"\+1[\s.(-]"), ("US",), 2.0),
+    (re.compile(r"\+44[\s(]"), ("GB",), 2.0),
+    (re.compile(r"\+353\s"), ("IE",), 2.0),
+    (re.compile(r"\+33\s"), ("FR",), 2.0),
+    (re.compile(r"\+32\s"), ("BE",), 2.0),
+    (re.compile(r"\+41\s"), ("CH",), 2.0),
+    (re.compile(r"\+49\s"), ("DE",), 2.0),
+    (re.compile(r"\+43\s"), ("AT",), 2.0),
+    (re.compile(r"\+34\s"), ("ES",), 2.0),
+    (re.compile(r"\+39\s"), ("IT",), 2.0),
+    (re.compile(r"\+31\s"), ("NL",), 2.0),
+    (re.compile(r"\+351\s"), ("PT",), 2.0),
+    (re.compile(r"\+55\s"), ("BR",), 2.0),
+    # US-style phone numbers: (555) 123-4567
+    (re.compile(r"\(\d{3}\)\s?\d{3}-\d{4}"), ("US",), 1.0),
+]
+
+# Evidence for the leading language (see score_languages) that counts as a sure guess
+LANGUAGE_EVIDENCE_SATURATION = 6.0
+
+def score_countries(text: str) -> Dict[str, float]:
+    """Evidence per country from currencies, tax vocabulary, postal codes and phone formats"""
+    scores = {country: 0.0 for country in COUNTRY_LOCALES}
+    for pattern, countries, weight in COUNTRY_CLUES:
+        hits = len(pattern.findall(text))
+        if hits:
+            # A clue shared by several countries is split between them
+            share = weight * min(hits, 3) / len(countries)
+            for country in countries:
+                scores[country] += share
+    return scores
+
+def date_order_votes(text: str) -> Tuple[int, int]:
+    """(day-first, month-first) votes from numeric dates whose first two parts can only be read one way"""
+    day_first = month_first = 0
+    for date in DATE_PATTERN.findall(text):
+        parts = re.split(r"[/\-\.]", date)
+        if len(parts[0]) == 4:
+            # ISO-style year first says nothing about day/month order
+            continue
+        first, second = int(parts[0]), int(parts[1])
+        if first > 12 and 1 <= second <= 12:
+            day_first += 1
+        elif second > 12 and 1 <= first <= 12:
+            month_first += 1
+    return day_first, month_first
+
+def detect_locale(text: str) -> Tuple[str, str, float]:
+    """Language, date format and a 0-1 confidence for an invoice, without any network call
+
+    Words decide the language; unambiguous dates decide the date format, and
+    otherwise the country suggested by currencies, tax terms, postal codes and
+    phone numbers does. The confidence is the weaker of the two decisions.
+    """
+    language_scores = score_languages(text)
+    country_scores = score_countries(text)
+
+    # Country clues also count towards their language, at half weight
+    for country, score in country_scores.items():
+        language_scores[COUNTRY_LOCALES[country][0]] += score / 2
+
+    ranked = sorted(language_scores.values(), reverse=True)
+    if ranked[0] <= 0:
+        return "en", "MM/DD/YYYY", 0.0
+    language = max(language_scores, key=language_scores.get)
+    # Margin over the runner-up (shared words like "total" score for several languages), scaled down for short texts
+    language_confidence = (1 - ranked[1] / ranked[0]) * min(1.0, ranked[0] / LANGUAGE_EVIDENCE_SATURATION)
+
+    day_first, month_first = date_order_votes(text)
+    country_total = sum(country_scores.values())
+    country = max(country_scores, key=country_scores.get)
+    if day_first or month_first:
+        date_format = "DD/MM/YYYY" if day_first >= month_first else "MM/DD/YYYY"
+        date_confidence = max(day_first, month_first) / (day_first + month_first)
+    elif country_total > 0 and COUNTRY_LOCALES[country][0] == language:
+        date_format = COUNTRY_LOCALES[country][1]
+        # Share of the country evidence that agrees with this date format
+        agreeing = sum(score for c, score in country_scores.items() if COUNTRY_LOCALES[c][1] == date_format)
+        date_confidence = agreeing / country_total
+    elif language != "en":
+        # All other languages we extract write day first
+        date_format = "DD/MM/YYYY"
+        date_confidence = 0.9
+    else:
+        # English without any US/UK clue: the default guess, not a detection
+        date_format = "MM/DD/YYYY"
+        date_confidence = 0.3
+
+    return language, date_format, min(language_confidence, date_confidence)
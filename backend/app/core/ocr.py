@@ -1,132 +1,400 @@
 import cv2
 import numpy as np
-import io
-import PyPDF2
+import threading
+import time
 import pytesseract
+from collections import Counter
+from concurrent.futures import Executor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image, ImageEnhance
 from fastapi import HTTPException
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import logging
 import traceback
+from app.core.config import settings
+from app.core.deskew import deskew
+from app.core.image_buffers import (
+    ImageInput, allocated_bytes, decode_grayscale, image_size, iter_frames, open_multi_frame, to_grayscale
+)
+from app.core.image_quality import (
+    TIER_CLEAN, TIER_FULL, TIER_STANDARD,
+    compute_resample_scale, estimate_image_quality, measure_text_height, select_preprocessing_tier
+)
+from app.core.config_history import ConfigHistory
+from app.core.language import detect_language, select_tesseract_languages
+from app.core.layout import BLOCK_CONFIGS, find_text_blocks, layout_fingerprint, merge_block_results, reading_order
+from app.core.ocr_backends import OCRBackend, create_ocr_backend
+from app.core.ocr_cache import OCRResultCache
+from app.core.pdf_backends import PDFIUM_LOCK, PDFTextBackend, create_pdf_backend
+from app.core.tiling import Tile, owned_words, plan_tiles, words_to_text
+from app.utils.deadline import Deadline
+from app.utils.exceptions import OCRTimeoutError
+from app.utils.metrics import metrics
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional: only needed to rasterize scanned PDFs
+    pdfium = None
 
 # Set Tesseract path for Windows
 pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever enhance_image_quality changes in a way that alters OCR output; it invalidates cached results
+PREPROCESSING_VERSION = "5"
+
+# Page segmentation configs tried for every image, in order of preference
+OCR_CONFIGS = [
+    '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz$.,/:- ',
+    '--psm 4 -c preserve_interword_spaces=1',
+    '--psm 3',
+    '--psm 6',
+    '--psm 1',
+]
+
+# Single pass on a shrunken page whose words only serve to guess the language
+LANGUAGE_PROBE_CONFIG = '--psm 3'
+
+# Warning attached to results cut short by the OCR deadline
+OCR_TIME_LIMIT_WARNING = "OCR time limit reached; text may be incomplete"
+
+def ocr_data_to_text(data: Dict[str, List]) -> str:
+    """Rebuild page text from pytesseract image_to_data output, one line per OCR line"""
+    lines = []
+    current_line = None
+    words = []
+    
+    for i, word in enumerate(data.get('text', [])):
+        if not word or not str(word).strip():
+            continue
+        
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if line_key != current_line:
+            if words:
+                lines.append(" ".join(words))
+            # Keep paragraph boundaries visible as blank lines
+            if current_line is not None and line_key[:2] != current_line[:2]:
+                lines.append("")
+            current_line = line_key
+            words = []
+        words.append(str(word).strip())
+    
+    if words:
+        lines.append(" ".join(words))
+    
+    return "\n".join(lines)
+
+def ocr_data_to_words(data: Dict[str, List]) -> List[Dict[str, Any]]:
+    """Recognized words with their boxes, in the coordinates of the image that was OCR'd"""
+    words = []
+    for i, word in enumerate(data.get('text', [])):
+        if not word or not str(word).strip():
+            continue
+        try:
+            conf = float(data['conf'][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        words.append({
+            "text": str(word),
+            "left": int(data['left'][i]),
+            "top": int(data['top'][i]),
+            "width": int(data['width'][i]),
+            "height": int(data['height'][i]),
+            "conf": conf,
+            "block": int(data['block_num'][i]),
+            "par": int(data['par_num'][i]),
+            "line": int(data['line_num'][i]),
+        })
+    return words
+
+def summarize_ocr_data(data: Dict[str, List], config: str) -> Dict[str, Any]:
+    """Turn a single image_to_data pass into text, average confidence and word count"""
+    confidences = []
+    for conf in data.get('conf', []):
+        try:
+            value = float(conf)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            confidences.append(value)
+    
+    text = ocr_data_to_text(data)
+    word_count = len([w for w in text.split() if w.strip()])
+    
+    return {
+        "config": config,
+        "text": text,
+        "confidence": sum(confidences) / len(confidences) if confidences else 0.0,
+        "word_count": word_count,
+        "words": ocr_data_to_words(data)
+    }
+
+def ocr_score(result: Dict[str, Any]) -> float:
+    """Ranking used to pick between OCR results: mostly confidence, partly word count"""
+    return result["confidence"] * 0.7 + result["word_count"] * 0.3
+
+def run_ocr_config(backend: OCRBackend, image: ImageInput, config: str,
+                   deadline: Optional[Deadline] = None, lang: Optional[str] = None) -> Dict[str, Any]:
+    """Run one Tesseract config; a single image_to_data pass yields both text and confidence
+    
+    The engine timeout is worked out when the run actually starts (it may have
+    queued behind other configs): the per-config limit, cut short by the deadline.
+    """
+    deadline = deadline or Deadline()
+    if deadline.expired():
+        raise OCRTimeoutError("OCR deadline reached before the config started")
+    timeout = deadline.timeout_for(settings.ocr_config_timeout)
+    data = backend.image_to_data(image, config, timeout=timeout, lang=lang)
+    return summarize_ocr_data(data, config)
+
+def run_block_ocr(backend: OCRBackend, image: ImageInput, config: str, offset: Tuple[int, int],
+                  deadline: Optional[Deadline] = None, lang: Optional[str] = None) -> Dict[str, Any]:
+    """OCR one layout block crop, remembering where it sits on the page"""
+    result = run_ocr_config(backend, image, config, deadline, lang)
+    result["offset"] = offset
+    return result
+
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, backend: Optional[OCRBackend] = None, pdf_backend: Optional[PDFTextBackend] = None):
+        self.backend = backend or create_ocr_backend(
+            settings.ocr_backend,
+            pool_size=settings.ocr_engine_pool_size,
+            lang=settings.ocr_language,
+            tessdata_path=settings.tessdata_path,
+            threads_per_worker=settings.ocr_threads_per_worker,
+            max_handles=settings.ocr_engine_max_handles
+        )
+        self.pdf_backend = pdf_backend or create_pdf_backend(settings.pdf_text_backend)
+        self._ocr_executor: Optional[Executor] = None
+        self._ocr_executor_lock = threading.Lock()
+        self.cache = OCRResultCache(
+            settings.ocr_cache_dir,
+            max_bytes=settings.ocr_cache_max_mb * 1024 * 1024
+        ) if settings.ocr_cache_enabled else None
+        self.config_history = ConfigHistory(
+            settings.ocr_fingerprint_max_distance
+        ) if settings.ocr_adaptive_config_order else None
         self.test_tesseract()
     
+    def cache_key_parts(self) -> List[Any]:
+        """Everything besides the image itself that changes OCR output"""
+        return [
+            PREPROCESSING_VERSION,
+            self.backend.name,
+            settings.ocr_language,
+            settings.ocr_auto_language,
+            settings.ocr_language_min_confidence,
+            settings.ocr_adaptive_preprocessing,
+            settings.ocr_target_text_height,
+            settings.ocr_min_scale,
+            settings.ocr_max_scale,
+            settings.ocr_max_pixels,
+            settings.ocr_deskew_min_confidence,
+            settings.ocr_layout_analysis,
+            settings.ocr_layout_min_blocks,
+            settings.ocr_layout_min_confidence,
+            settings.ocr_tiling_enabled,
+            settings.ocr_tile_min_pixels,
+            settings.ocr_tile_size,
+            *OCR_CONFIGS
+        ]
+    
     def test_tesseract(self):
         """Test Tesseract installation"""
         try:
-            pytesseract.get_tesseract_version()
-            logger.info("Tesseract OCR is available")
+            version = self.backend.get_version()
+            logger.info(f"Tesseract OCR is available ({self.backend.name} backend, version {version})")
         except Exception as e:
             logger.error(f"Tesseract not found: {e}")
             logger.error("Please install Tesseract: sudo apt install tesseract-ocr (Linux) or brew install tesseract (Mac)")
 
-    def deskew_image(self, image: np.ndarray) -> np.ndarray:
-        """Deskew image by detecting text lines with enhanced error handling"""
+    def deskew_image(self, image: np.ndarray, report: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """Deskew image using a downsampled projection-profile estimate with enhanced error handling"""
         try:
             if image is None or image.size == 0:
                 raise ValueError("Empty image provided for deskewing")
-                
-            # Convert to grayscale if needed
-            if len(image.shape) == 3:
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = image
-                
-            if gray.size == 0:
-                raise ValueError("Grayscale conversion failed")
-                
-            # Find edges
-            edges = cv2.Canny(gray, 50, 150, apertureSize=3)
-            
-            # Find lines using Hough transform
-            lines = cv2.HoughLines(edges, 1, np.pi/180, threshold=100)
-            
-            if lines is not None and len(lines) > 0:
-                angles = []
-                for rho, theta in lines[:10]:  # Use first 10 lines
-                    angle = theta * 180 / np.pi
-                    if angle > 90:
-                        angle = angle - 180
-                    angles.append(angle)
-                
-                if angles:  # Check if we have angles
-                    # Get median angle
-                    median_angle = np.median(angles)
-                    
-                    # Rotate image if skew is significant
-                    if abs(median_angle) > 0.5 and abs(median_angle) < 45:  # Reasonable angle range
-                        logger.info(f"Deskewing image by {median_angle:.1f} degrees")
-                        rows, cols = gray.shape
-                        M = cv2.getRotationMatrix2D((cols/2, rows/2), median_angle, 1)
-                        return cv2.warpAffine(image, M, (cols, rows), borderValue=(255,255,255))
             
-            return image
+            deskewed, angle, confidence, rotated = deskew(image, settings.ocr_deskew_min_confidence)
+            
+            if report is not None:
+                report["skew"] = {
+                    "angle": round(angle, 2),
+                    "confidence": round(confidence, 3),
+                    "rotated": rotated
+                }
+            
+            return deskewed
             
         except Exception as e:
             logger.warning(f"Deskewing failed: {e}, returning original image")
             return image
 
-    def enhance_image_quality(self, image: Image.Image) -> Image.Image:
-        """Advanced image preprocessing for better OCR with comprehensive error handling"""
+    def enhance_image_quality(self, image: ImageInput, report: Optional[Dict[str, Any]] = None,
+                              in_place: bool = False, apply_deskew: bool = True) -> np.ndarray:
+        """Advanced image preprocessing for better OCR with comprehensive error handling
+        
+        When adaptive preprocessing is enabled, a cheap quality estimate picks a tier so
+        clean digital images skip the expensive denoise step. Every image is resampled
+        towards a target glyph height rather than blindly upscaled. Works on a single
+        8-bit grayscale buffer and returns it ready for the OCR engine; with `in_place`
+        a grayscale array input may be overwritten instead of copied. Tiles of an already
+        deskewed page pass `apply_deskew=False`. If `report` is
+        given it is filled with the chosen tier, quality estimates, step timings (ms)
+        and the bytes of pixel data each step allocated.
+        """
+        report = report if report is not None else {}
+        timings = report.setdefault("timings", {})
+        allocations = report.setdefault("allocations", {})
+        
+        def timed(step: str, func, *args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            timings[step] = round((time.perf_counter() - start) * 1000, 2)
+            source = args[0] if args and isinstance(args[0], np.ndarray) else None
+            allocations[step] = allocations.get(step, 0) + allocated_bytes(result, source)
+            return result
+        
         try:
             if image is None:
                 raise ValueError("None image provided for enhancement")
             
-            # Validate image
-            if image.size[0] == 0 or image.size[1] == 0:
+            # Get an OpenCV grayscale buffer; grayscale arrays pass through untouched
+            gray = timed("grayscale", to_grayscale, image)
+            
+            if gray is None or gray.size == 0 or gray.shape[0] == 0 or gray.shape[1] == 0:
                 raise ValueError("Invalid image dimensions")
             
-            # Convert PIL image to OpenCV format
-            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            # Buffers this method allocated (or was handed) can be overwritten by later steps
+            # Read-only views (e.g. over a PIL image) are never owned, whatever the caller says
+            owned = (in_place or allocations["grayscale"] > 0) and gray.flags.writeable
             
-            if cv_image is None or cv_image.size == 0:
-                raise ValueError("OpenCV conversion failed")
+            # Decide how much work this image needs
+            if settings.ocr_adaptive_preprocessing:
+                quality = timed("quality_estimate", estimate_image_quality, gray)
+                tier = select_preprocessing_tier(quality)
+                report["quality"] = {key: round(value, 2) for key, value in quality.items()}
+            else:
+                tier = TIER_FULL
+            report["tier"] = tier
             
             # Deskew the image
-            cv_image = self.deskew_image(cv_image)
-            
-            # Upscale image for better OCR (2x resolution)
-            height, width = cv_image.shape[:2]
+            if apply_deskew:
+                rotated = timed("deskew", self.deskew_image, gray, report)
+                owned = owned or rotated is not gray
+                gray = rotated
             
-            # Limit upscaling for very large images
-            if width * height > 4000000:  # 4MP limit
-                logger.warning("Large image detected, skipping upscaling")
+            # Resample so the dominant glyph height matches the OCR target (~300 DPI)
+            height, width = gray.shape[:2]
+            if settings.ocr_adaptive_preprocessing:
+                text_height = quality["text_height"]
             else:
-                cv_image = cv2.resize(cv_image, (width * 2, height * 2), interpolation=cv2.INTER_CUBIC)
+                text_height = timed("text_height", measure_text_height, gray)
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-            
-            # Advanced denoising
-            denoised = cv2.fastNlMeansDenoising(gray, h=10, templateWindowSize=7, searchWindowSize=21)
-            
-            # Adaptive thresholding for better text contrast
-            binary = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+            scale = compute_resample_scale(
+                text_height, width, height,
+                settings.ocr_target_text_height,
+                settings.ocr_min_scale,
+                settings.ocr_max_scale,
+                settings.ocr_max_pixels
             )
+            report["scale"] = round(scale, 3)
             
-            # Morphological operations to clean up text
-            kernel = np.ones((1,1), np.uint8)
-            cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+            if scale != 1.0:
+                interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+                gray = timed(
+                    "resample", cv2.resize, gray,
+                    (max(1, int(width * scale)), max(1, int(height * scale))),
+                    interpolation=interpolation
+                )
+                owned = True
             
-            # Convert back to PIL Image
-            result = Image.fromarray(cleaned)
+            # Denoising: expensive non-local means only for noisy photos/scans
+            if tier == TIER_FULL:
+                gray = timed(
+                    "denoise", cv2.fastNlMeansDenoising, gray, h=10, templateWindowSize=7, searchWindowSize=21
+                )
+                owned = True
+            elif tier == TIER_STANDARD and owned:
+                gray = timed("denoise", cv2.medianBlur, gray, 3, dst=gray)
+            elif tier == TIER_STANDARD:
+                gray = timed("denoise", cv2.medianBlur, gray, 3)
+                owned = True
             
-            if result.size[0] == 0 or result.size[1] == 0:
-                raise ValueError("Enhanced image has invalid dimensions")
+            # Thresholding for better text contrast, into the working buffer when we own it
+            target = {"dst": gray} if owned else {}
+            if tier == TIER_CLEAN:
+                _, binary = timed(
+                    "threshold", cv2.threshold, gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, **target
+                )
+            else:
+                binary = timed(
+                    "threshold", cv2.adaptiveThreshold,
+                    gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, **target
+                )
             
-            return result
+            report["allocated_bytes"] = sum(allocations.values())
+            logger.info(
+                f"Preprocessed image with '{tier}' tier: {timings}, "
+                f"{report['allocated_bytes'] / (1024 * 1024):.1f} MB of pixel buffers allocated"
+            )
+            return binary
             
         except Exception as e:
             logger.warning(f"Advanced image enhancement failed: {e}. Using basic enhancement.")
-            return self.basic_enhance_image(image)
+            report["tier"] = "basic"
+            if isinstance(image, np.ndarray):
+                image = Image.fromarray(image)
+            return np.asarray(self.basic_enhance_image(image))
+
+    def select_language(self, gray: np.ndarray, report: Optional[Dict[str, Any]] = None,
+                        deadline: Optional[Deadline] = None) -> Tuple[str, Optional[str]]:
+        """Pick the Tesseract language packs for a page from a quick low-resolution pass
+        
+        The page is shrunk until glyphs are about `ocr_language_probe_text_height` pixels
+        tall and read once with the default language; function words and invoice terms
+        in that text decide the language. Returns (Tesseract language spec, detected
+        language code or None).
+        """
+        default = settings.ocr_language
+        deadline = deadline or Deadline()
+        if not settings.ocr_auto_language or deadline.expired():
+            return default, None
+        
+        # With a single pack installed the probe could only ever pick it
+        available = self.backend.available_languages()
+        if available is not None and len([pack for pack in available if pack != "osd"]) <= 1:
+            return default, None
+        
+        report = report if report is not None else {}
+        start = time.perf_counter()
+        try:
+            text_height = measure_text_height(gray)
+            scale = min(1.0, settings.ocr_language_probe_text_height / text_height) if text_height > 0 else 0.5
+            height, width = gray.shape[:2]
+            probe = gray
+            if scale < 1.0:
+                probe = cv2.resize(
+                    gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA
+                )
+            data = self.backend.image_to_data(
+                probe, LANGUAGE_PROBE_CONFIG, timeout=deadline.timeout_for(settings.ocr_config_timeout)
+            )
+            text = ocr_data_to_text(data)
+        except Exception as e:
+            logger.warning(f"Language probe failed: {e}, using '{default}'")
+            return default, None
+        
+        lang, language = select_tesseract_languages(
+            text, settings.ocr_language_min_confidence, default, available
+        )
+        report["language"] = {
+            "detected": language,
+            "tesseract": lang,
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+        logger.info(f"Language probe: {language or 'unknown'}, OCR with '{lang}'")
+        return lang, language
 
     def basic_enhance_image(self, image: Image.Image) -> Image.Image:
         """Basic image enhancement fallback with error handling"""
@@ -153,33 +421,14 @@ class OCRProcessor:
             return image if image else Image.new('L', (100, 100), 255)
 
     def extract_text_from_pdf(self, file_content: bytes) -> str:
-        """Extract text from PDF using PyPDF2 with enhanced error handling"""
+        """Extract the embedded text layer from a PDF with the configured backend"""
         try:
             if not file_content or len(file_content) == 0:
                 raise ValueError("Empty PDF content")
             
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            
-            if len(pdf_reader.pages) == 0:
-                raise ValueError("PDF contains no pages")
-            
-            text = ""
-            for i, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {i+1}: {e}")
-                    continue
-            
-            text = text.strip()
+            pages = self.pdf_backend.extract_pages(file_content)
             
-            if len(text) > 50:
-                return text
-            
-            logger.info("PDF text extraction yielded minimal content, may need OCR")
-            return "OCR extraction needed for scanned PDF"
+            return "\n".join(page for page in pages if page).strip()
             
         except Exception as e:
             logger.error(f"PDF processing error: {e}")
@@ -188,138 +437,788 @@ class OCRProcessor:
                 detail=f"PDF processing failed: {str(e)}. File may be corrupted or password-protected."
             )
 
-    def extract_text_with_multiple_configs(self, image: Image.Image) -> Tuple[str, float]:
-        """Try multiple OCR configurations and return the best result with error handling"""
+    def rasterize_pdf_pages(self, file_content: bytes, dpi: int) -> Iterator[np.ndarray]:
+        """Render PDF pages one at a time as grayscale arrays at the given DPI"""
+        if pdfium is None:
+            raise HTTPException(
+                status_code=500,
+                detail="Scanned PDF support requires pypdfium2 to be installed"
+            )
         
-        if image is None:
-            raise ValueError("None image provided for OCR")
+        # The lock is taken per PDFium call, never across a yield, so other requests render while this page is OCR'd
+        with PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(file_content)
+            page_count = len(pdf)
+        try:
+            for index in range(page_count):
+                with PDFIUM_LOCK:
+                    page = pdf[index]
+                    try:
+                        bitmap = page.render(scale=dpi / 72, grayscale=True)
+                        # One copy out of PDFium's buffer, which is freed with the bitmap
+                        pixels = np.array(bitmap.to_numpy())
+                        bitmap.close()
+                    finally:
+                        page.close()
+                yield pixels
+        finally:
+            with PDFIUM_LOCK:
+                pdf.close()
+
+    def count_pdf_pages(self, file_content: bytes) -> Optional[int]:
+        """Page count for progress reporting, without rendering anything"""
+        if pdfium is None:
+            return None
+        with PDFIUM_LOCK:
+            try:
+                pdf = pdfium.PdfDocument(file_content)
+            except Exception:
+                return None
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+
+    def _ocr_page(self, page_number: int, image: ImageInput, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """OCR a single rasterized page, turning failures into page warnings"""
+        try:
+            # Page buffers are not used again, so preprocessing may overwrite them
+            result = self.ocr_image(image, in_place=True, deadline=deadline)
+        except HTTPException as e:
+            logger.warning(f"OCR failed for page {page_number}: {e.detail}")
+            result = {
+                "text": "",
+                "ocr_confidence": 0.0,
+                "word_count": 0,
+                "warnings": [f"Page {page_number}: {e.detail}"]
+            }
         
-        configs = [
-            '--psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz$.,/:- ',
-            '--psm 4 -c preserve_interword_spaces=1',
-            '--psm 3',
-            '--psm 6',
-            '--psm 1',
-        ]
+        if result["word_count"] == 0:
+            result["text"] = ""
         
-        best_result = ""
-        best_confidence = 0
-        errors = []
+        result["page"] = page_number
+        return result
+
+    def ocr_pages(self, pages: Iterable[ImageInput], max_workers: int, status=None,
+                  total: Optional[int] = None, unit: str = "page",
+                  deadline: Optional[Deadline] = None) -> List[Dict[str, Any]]:
+        """OCR page images in parallel, keeping only a bounded number of pages in memory
         
-        for config in configs:
-            try:
-                text = pytesseract.image_to_string(image, config=config)
-                
-                if not text or len(text.strip()) == 0:
-                    continue
-                
-                # Get confidence data
-                try:
-                    data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
-                    confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-                except Exception as conf_e:
-                    logger.warning(f"Confidence calculation failed: {conf_e}")
-                    avg_confidence = 50  # Default confidence
+        `pages` is consumed lazily, so a generator decodes at most twice `max_workers`
+        pages ahead of OCR. If `status` is given, it gets update_pages() as pages finish.
+        All pages share `deadline`; once it passes no further pages are started, and
+        the last result gets a warning saying how many pages were processed.
+        """
+        deadline = deadline or Deadline(settings.ocr_document_timeout)
+        results = []
+        in_flight = set()
+        max_in_flight = max(1, max_workers) * 2
+        submitted = 0
+        stopped = False
+        
+        def collect(futures):
+            for future in futures:
+                results.append(future.result())
+                if status is not None:
+                    status.update_pages(len(results), total, unit)
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ocr-page") as executor:
+            for page_number, image in enumerate(pages, start=1):
+                if deadline.expired():
+                    stopped = True
+                    break
+                in_flight.add(executor.submit(self._ocr_page, page_number, image, deadline))
+                submitted += 1
                 
-                # Prefer results with more words and higher confidence
-                word_count = len([w for w in text.split() if w.strip()])
-                score = avg_confidence * 0.7 + word_count * 0.3
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        
+        results.sort(key=lambda result: result["page"])
+        if stopped:
+            if deadline.report():
+                metrics.increment("ocr_document_deadlines")
+            of_total = f" of {total}" if total else ""
+            message = f"OCR time limit reached; {submitted}{of_total} {unit}s processed"
+            logger.warning(message)
+            if results:
+                results[-1]["warnings"].append(message)
+        
+        return results
+
+    def merge_page_results(self, page_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge per-page OCR results in page order with a word-weighted confidence"""
+        texts = [result["text"] for result in page_results if result["text"]]
+        word_count = sum(result["word_count"] for result in page_results)
+        warnings = [warning for result in page_results for warning in result["warnings"]]
+        languages = Counter(result["language"] for result in page_results if result.get("language"))
+        
+        if word_count:
+            confidence = sum(r["ocr_confidence"] * r["word_count"] for r in page_results) / word_count
+        else:
+            confidence = 0.0
+        
+        return {
+            "text": "\n\n".join(texts),
+            "ocr_confidence": confidence,
+            "word_count": word_count,
+            "warnings": warnings,
+            "language": languages.most_common(1)[0][0] if languages else None,
+            # The first page carries the vendor's letterhead
+            "layout_fingerprint": next(
+                (result.get("layout_fingerprint") for result in page_results if result.get("layout_fingerprint")), None
+            ),
+            "pages": [
+                {
+                    "page": result["page"],
+                    "ocr_confidence": result["ocr_confidence"],
+                    "word_count": result["word_count"],
+                    "preprocessing_tier": result.get("preprocessing", {}).get("tier"),
+                    "cache": result.get("cache")
+                }
+                for result in page_results
+            ]
+        }
+
+    def process_pdf(self, file_content: bytes, status, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Extract text from a PDF, falling back to page-by-page OCR for scanned documents"""
+        status.update("text_extraction", 2)
+        
+        text = self.extract_text_from_pdf(file_content)
+        
+        if len(text) > settings.pdf_min_text_chars:
+            language, confidence = detect_language(text)
+            return {
+                "text": text,
+                "text_source": "pdf_extraction",
+                "ocr_confidence": 1.0,
+                "word_count": len(text.split()),
+                "language": language if confidence >= settings.ocr_language_min_confidence else None,
+                "warnings": []
+            }
+        
+        logger.info(f"PDF text layer too thin ({len(text)} chars), running OCR on rasterized pages")
+        
+        try:
+            page_results = self.ocr_pages(
+                self.rasterize_pdf_pages(file_content, settings.pdf_ocr_dpi),
+                settings.pdf_ocr_page_workers,
+                status=status,
+                total=self.count_pdf_pages(file_content),
+                deadline=deadline
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Scanned PDF OCR failed: {e}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Scanned PDF processing failed: {str(e)}"
+            )
+        
+        result = self.merge_page_results(page_results)
+        result["text_source"] = "pdf_ocr"
+        logger.info(
+            f"Scanned PDF OCR extracted {result['word_count']} words from {len(page_results)} pages "
+            f"with confidence: {result['ocr_confidence']:.2f}"
+        )
+        
+        return result
+
+    def get_ocr_executor(self) -> Executor:
+        """Lazily create the shared, bounded executor used for config racing"""
+        with self._ocr_executor_lock:
+            if self._ocr_executor is None:
+                self._ocr_executor = self.backend.create_executor(
+                    max(1, settings.ocr_race_workers),
+                    max(1, settings.ocr_threads_per_worker)
+                )
+                logger.info(f"Started OCR executor for the {self.backend.name} backend")
+            return self._ocr_executor
+
+    def reset_ocr_executor(self):
+        """Stop OCR workers; a new executor is created on next use"""
+        with self._ocr_executor_lock:
+            if self._ocr_executor is not None:
+                self._ocr_executor.shutdown(wait=False, cancel_futures=True)
+                self._ocr_executor = None
+
+    def shutdown(self):
+        """Stop OCR workers and release engine handles"""
+        self.reset_ocr_executor()
+        self.backend.shutdown()
+        if self.config_history is not None:
+            self.config_history.flush()
+
+    @staticmethod
+    def is_good_enough(result: Dict[str, Any]) -> bool:
+        """Whether a config result clears the early-stop threshold"""
+        return (
+            result["confidence"] >= settings.ocr_early_stop_confidence
+            and result["word_count"] >= settings.ocr_early_stop_min_words
+        )
+
+    @staticmethod
+    def _record_config_error(config: str, error: Exception, errors: List[str]) -> bool:
+        """Log a failed config; returns whether it was a timeout"""
+        error_msg = f"OCR config '{config[:15]}...' failed: {error}"
+        errors.append(error_msg)
+        logger.warning(error_msg)
+        if isinstance(error, OCRTimeoutError):
+            metrics.increment("ocr_config_timeouts")
+            return True
+        return False
+
+    def _race_configs(self, image: ImageInput, configs: List[str], deadline: Deadline,
+                      lang: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[str], int]:
+        """Run all configs concurrently and stop as soon as one clears the threshold or time runs out
+        
+        Stopping only cancels configs still queued for a worker. A config already
+        running cannot be interrupted: it finishes in the background, bounded by its
+        own engine timeout (`ocr_config_timeout`, cut short by the deadline), and
+        keeps its worker busy until then. Its result is discarded.
+        
+        Returns (results, errors, timeouts).
+        """
+        executor = self.get_ocr_executor()
+        futures = {executor.submit(run_ocr_config, self.backend, image, config, deadline, lang): config for config in configs}
+        results = []
+        errors = []
+        timeouts = 0
+        pending = set(futures)
+        
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+                if not done:
+                    # Running engines stop on their own timeouts, which never outlive the deadline
+                    logger.warning(f"OCR deadline reached with {len(pending)} configs unfinished")
+                    break
                 
-                if score > best_confidence and word_count > 5:
-                    best_confidence = avg_confidence
-                    best_result = text
-                    logger.info(f"Config '{config[:15]}...': {avg_confidence:.1f}% confidence, {word_count} words")
+                for future in done:
+                    config = futures[future]
+                    try:
+                        results.append(future.result())
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        timeouts += self._record_config_error(config, e, errors)
                 
+                if any(self.is_good_enough(r) for r in results):
+                    break
+        finally:
+            cancelled = sum(1 for future in pending if future.cancel())
+            if pending:
+                logger.info(
+                    f"OCR race stopped: {cancelled} queued configs cancelled, "
+                    f"{len(pending) - cancelled} running configs left to finish within their timeout"
+                )
+        
+        return results, errors, timeouts
+
+    def _run_configs_sequentially(self, image: ImageInput, configs: List[str], deadline: Deadline,
+                                  lang: Optional[str] = None) -> Tuple[List[Dict[str, Any]], List[str], int]:
+        """Run configs one after another, stopping early once one clears the threshold or time runs out"""
+        results = []
+        errors = []
+        timeouts = 0
+        
+        for config in configs:
+            if deadline.expired():
+                logger.warning("OCR deadline reached, skipping remaining configs")
+                break
+            try:
+                result = run_ocr_config(self.backend, image, config, deadline, lang)
             except Exception as e:
-                error_msg = f"OCR config '{config[:15]}...' failed: {e}"
-                errors.append(error_msg)
-                logger.warning(error_msg)
+                timeouts += self._record_config_error(config, e, errors)
+                continue
+            
+            results.append(result)
+            if self.is_good_enough(result):
+                break
+        
+        return results, errors, timeouts
+
+    def run_layout_ocr(self, image: ImageInput, report: Optional[Dict[str, Any]] = None,
+                       deadline: Optional[Deadline] = None, lang: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """OCR the text blocks found by a layout pass in parallel, each with a PSM suited to its shape
+        
+        Logos, stamps and blank margins never reach Tesseract. Returns None when the
+        page does not split into enough blocks to be worth it. Blocks not finished by
+        the deadline are left out and the merged result is flagged `deadline_reached`.
+        """
+        report = report if report is not None else {}
+        deadline = deadline or Deadline()
+        start = time.perf_counter()
+        
+        page = to_grayscale(image)
+        blocks = find_text_blocks(page)
+        report["blocks"] = len(blocks)
+        report["segmentation_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        
+        if len(blocks) < settings.ocr_layout_min_blocks:
+            return None
+        
+        height, width = page.shape
+        padding = max(4, int(settings.ocr_target_text_height / 2))
+        executor = self.get_ocr_executor()
+        futures = []
+        for index in reading_order(blocks):
+            block = blocks[index]
+            left, top = max(0, block.left - padding), max(0, block.top - padding)
+            right = min(width, block.left + block.width + padding)
+            bottom = min(height, block.top + block.height + padding)
+            futures.append(executor.submit(
+                run_block_ocr, self.backend, page[top:bottom, left:right],
+                BLOCK_CONFIGS[block.kind], (left, top), deadline, lang
+            ))
+        
+        wait(futures, timeout=deadline.remaining())
+        results = []
+        timeouts = 0
+        for future in futures:
+            if not future.done():
+                future.cancel()
+                results.append(None)
+                timeouts += 1
                 continue
+            try:
+                results.append(future.result())
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                logger.warning(f"Layout block OCR failed: {e}")
+                timeouts += isinstance(e, OCRTimeoutError)
+                results.append(None)
+        
+        merged = merge_block_results(results)
+        if timeouts:
+            metrics.increment("ocr_config_timeouts", timeouts)
+            merged["deadline_reached"] = deadline.expired()
+            merged["timeouts"] = timeouts
+        report["kinds"] = {kind: sum(1 for b in blocks if b.kind == kind) for kind in BLOCK_CONFIGS}
+        report["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(
+            f"Layout OCR: {len(blocks)} blocks, {merged['word_count']} words, "
+            f"{merged['confidence']:.1f}% confidence in {report['ms']} ms"
+        )
+        return merged
+
+    def run_best_ocr_config(self, image: ImageInput, min_words: int = 6,
+                            deadline: Optional[Deadline] = None,
+                            preferred: Optional[str] = None,
+                            lang: Optional[str] = None) -> Dict[str, Any]:
+        """Try multiple OCR configurations and return the best config's full result
+        
+        A `preferred` config (the historical winner for this layout) runs alone
+        first; the others only run if it does not clear the early-stop threshold.
+        When configs time out or the deadline passes, the best result so far is
+        returned (even below `min_words`) with `timeouts` and `deadline_reached` set.
+        """
+        
+        if image is None:
+            raise ValueError("None image provided for OCR")
+        
+        deadline = deadline or Deadline()
+        configs = OCR_CONFIGS
+        results, errors, timeouts = [], [], 0
+        if preferred in OCR_CONFIGS:
+            results, errors, timeouts = self._run_configs_sequentially(image, [preferred], deadline, lang)
+            if any(self.is_good_enough(r) for r in results):
+                metrics.increment("ocr_preferred_config_hits")
+                configs = []
+            else:
+                metrics.increment("ocr_preferred_config_misses")
+                configs = [config for config in OCR_CONFIGS if config != preferred]
+        
+        if not configs or deadline.expired():
+            more = ([], [], 0)
+        elif settings.ocr_racing_enabled:
+            try:
+                more = self._race_configs(image, configs, deadline, lang)
+            except BrokenProcessPool as e:
+                logger.warning(f"OCR process pool broke ({e}), retrying configs sequentially")
+                self.reset_ocr_executor()
+                more = self._run_configs_sequentially(image, configs, deadline, lang)
+        else:
+            more = self._run_configs_sequentially(image, configs, deadline, lang)
+        results, errors, timeouts = results + more[0], errors + more[1], timeouts + more[2]
+        
+        deadline_reached = deadline.expired()
+        if timeouts or deadline_reached:
+            min_words = 1
+        
+        best_result = None
+        best_score = 0
+        
+        for result in results:
+            if not result["text"].strip():
+                continue
+            
+            # Prefer results with more words and higher confidence
+            score = ocr_score(result)
+            
+            if score > best_score and result["word_count"] >= min_words:
+                best_score = score
+                best_result = result
+                logger.info(
+                    f"Config '{result['config'][:15]}...': {result['confidence']:.1f}% confidence, "
+                    f"{result['word_count']} words"
+                )
         
         if not best_result:
             error_summary = "; ".join(errors[-3:])  # Show last 3 errors
+            if deadline_reached or timeouts:
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"OCR timed out before any configuration finished. Recent errors: {error_summary}"
+                )
             raise HTTPException(
                 status_code=400,
                 detail=f"All OCR configurations failed. Recent errors: {error_summary}"
             )
         
-        return best_result, best_confidence / 100
+        if timeouts or deadline_reached:
+            best_result = {**best_result, "timeouts": timeouts, "deadline_reached": deadline_reached}
+        
+        return best_result
 
-    def extract_text_from_image(self, image_content: bytes, status) -> Dict[str, Any]:
-        """Extract text from image using enhanced Tesseract OCR with comprehensive error handling"""
+    def extract_text_with_multiple_configs(self, image: ImageInput) -> Tuple[str, float]:
+        """Best OCR text and its 0-1 confidence across all configurations"""
+        best_result = self.run_best_ocr_config(image)
+        return best_result["text"], best_result["confidence"] / 100
+
+    def _ocr_tile(self, page: np.ndarray, tile: Tile, deadline: Optional[Deadline] = None,
+                  lang: Optional[str] = None) -> Dict[str, Any]:
+        """Preprocess and OCR one tile, returning the words it owns in page coordinates"""
+        report = {}
+        crop = page[tile.top:tile.bottom, tile.left:tile.right]
+        enhanced = self.enhance_image_quality(crop, report, apply_deskew=False)
+        
         try:
-            if not image_content or len(image_content) == 0:
-                raise HTTPException(status_code=400, detail="Empty image content")
-                
-            logger.info(f"Processing image of size: {len(image_content)} bytes")
-            status.update("text_extraction", 2)
-            
-            # Convert bytes to PIL Image
+            result = self.run_best_ocr_config(enhanced, min_words=1, deadline=deadline, lang=lang)
+        except HTTPException as e:
+            # Tiles with no recognizable text (rules, drawings) are expected on large sheets
+            logger.info(f"No text in tile at ({tile.left}, {tile.top}): {e.detail}")
+            return {
+                "words": [],
+                "tier": report.get("tier"),
+                "allocated_bytes": report.get("allocated_bytes", 0),
+                "timed_out": e.status_code == 504
+            }
+        
+        return {
+            "words": owned_words(tile, result["words"], report.get("scale") or 1.0),
+            "tier": report.get("tier"),
+            "allocated_bytes": report.get("allocated_bytes", 0),
+            "timed_out": bool(result.get("timeouts") or result.get("deadline_reached"))
+        }
+
+    def ocr_tiled(self, image: ImageInput, report: Optional[Dict[str, Any]] = None,
+                  deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """OCR an oversized image as overlapping tiles cut along whitespace gutters
+        
+        The page is deskewed once as a whole; each tile is then preprocessed and OCR'd
+        on its own, with at most `ocr_tile_workers` tiles in memory at a time. Words in
+        the overlaps are kept only by the tile owning their centre, and the page text
+        is rebuilt from the stitched word boxes (page coordinates after deskewing).
+        Tiles not started before the deadline are skipped and the result flagged.
+        """
+        report = report if report is not None else {}
+        deadline = deadline or Deadline()
+        start = time.perf_counter()
+        
+        page = to_grayscale(image)
+        page = self.deskew_image(page, report)
+        lang, language = self.select_language(page, report, deadline)
+        
+        tile_size = settings.ocr_tile_size
+        overlap = max(settings.ocr_tile_overlap, int(measure_text_height(page) * 3))
+        tiles = plan_tiles(page, tile_size, overlap)
+        logger.info(f"Tiling {page.shape[1]}x{page.shape[0]} image into {len(tiles)} tiles (overlap {overlap}px)")
+        
+        words = []
+        tiers = {}
+        peak_tile_bytes = 0
+        timed_out = 0
+        skipped = 0
+        
+        def collect(futures):
+            nonlocal peak_tile_bytes, timed_out
+            for future in futures:
+                tile_result = future.result()
+                words.extend(tile_result["words"])
+                tiers[tile_result["tier"]] = tiers.get(tile_result["tier"], 0) + 1
+                peak_tile_bytes = max(peak_tile_bytes, tile_result["allocated_bytes"])
+                timed_out += tile_result["timed_out"]
+        
+        workers = max(1, settings.ocr_tile_workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr-tile") as executor:
+            # Submitting lazily keeps at most `workers` tiles' preprocessing buffers alive
+            in_flight = set()
+            for index, tile in enumerate(tiles):
+                if deadline.expired():
+                    skipped = len(tiles) - index
+                    break
+                in_flight.add(executor.submit(self._ocr_tile, page, tile, deadline, lang))
+                if len(in_flight) >= workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(in_flight)
+        
+        confidences = [word["conf"] for word in words if word["conf"] > 0]
+        text = words_to_text(words)
+        report["tier"] = "tiled"
+        report["tiling"] = {
+            "tiles": len(tiles),
+            "tile_size": tile_size,
+            "overlap": overlap,
+            "tiers": tiers,
+            "max_tile_allocated_bytes": peak_tile_bytes,
+            "timed_out": timed_out,
+            "skipped": skipped,
+            "ms": round((time.perf_counter() - start) * 1000, 2)
+        }
+        partial = bool(timed_out or skipped)
+        
+        if not words:
+            return {
+                "text": "No text detected in image",
+                "ocr_confidence": 0.0,
+                "word_count": 0,
+                "warnings": ["No readable text found in image"],
+                "preprocessing": report
+            }
+        
+        return {
+            "text": text,
+            "ocr_confidence": (sum(confidences) / len(confidences) / 100) if confidences else 0.0,
+            "word_count": len(words),
+            "words": words,
+            "config": "tiled",
+            "language": language,
+            "warnings": [],
+            "preprocessing": report,
+            "deadline_reached": partial
+        }
+
+    def ocr_image(self, image: ImageInput, preprocessing: Optional[Dict[str, Any]] = None,
+                  in_place: bool = False, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Enhance a decoded image and run multi-config OCR on it, via the result cache
+        
+        `preprocessing` may carry timings/allocations from decoding; `in_place` hands
+        ownership of a grayscale array to the pipeline so it is not copied again.
+        OCR stops at `deadline` (by default `ocr_document_timeout` from now) and
+        returns the best text found so far with a warning; such results are not cached.
+        """
+        deadline = deadline or Deadline(settings.ocr_document_timeout)
+        cache_key = None
+        if self.cache is not None:
             try:
-                image = Image.open(io.BytesIO(image_content))
+                cache_key = self.cache.make_key(np.asarray(image), *self.cache_key_parts())
+                cached = self.cache.get(cache_key)
             except Exception as e:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Invalid image format: {str(e)}"
-                )
-            
-            if image.size[0] == 0 or image.size[1] == 0:
-                raise HTTPException(status_code=400, detail="Invalid image dimensions")
-            
-            logger.info(f"Image opened successfully. Size: {image.size}, Mode: {image.mode}")
-            
-            # Convert to RGB if needed
+                logger.warning(f"OCR cache lookup failed: {e}")
+                cache_key = cached = None
+            if cached is not None:
+                logger.info(f"OCR cache hit: {cached['word_count']} words, skipping preprocessing and OCR")
+                return {**cached, "warnings": [], "cache": "hit"}
+        
+        preprocessing = preprocessing if preprocessing is not None else {}
+        
+        # Oversized scans are preprocessed and OCR'd tile by tile to bound memory and time
+        width, height = image_size(image)
+        if settings.ocr_tiling_enabled and width * height > settings.ocr_tile_min_pixels:
+            result = self.ocr_tiled(image, preprocessing, deadline)
+            if result.pop("deadline_reached", False):
+                if deadline.report():
+                    metrics.increment("ocr_document_deadlines")
+                result["warnings"].append(OCR_TIME_LIMIT_WARNING)
+            elif cache_key is not None and result["word_count"]:
+                self.cache.put(cache_key, {key: value for key, value in result.items() if key != "warnings"})
+            return {**result, "cache": "miss" if cache_key is not None else "disabled"}
+        
+        # Enhance image quality with advanced preprocessing
+        try:
+            enhanced_image = self.enhance_image_quality(image, preprocessing, in_place=in_place)
+        except Exception as e:
+            logger.warning(f"Image enhancement failed: {e}, using original")
+            enhanced_image = image
+        
+        lang, language = self.select_language(to_grayscale(enhanced_image), preprocessing, deadline)
+        
+        # Layouts seen before start with whatever won for them last time
+        fingerprint = preferred = None
+        if self.config_history is not None:
             try:
-                if image.mode not in ['RGB', 'L']:
-                    image = image.convert('RGB')
-                    logger.info(f"Converted image to RGB mode")
+                fingerprint, preferred = self.config_history.lookup(layout_fingerprint(to_grayscale(enhanced_image)))
             except Exception as e:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Image conversion failed: {str(e)}"
-                )
-            
-            # Enhance image quality with advanced preprocessing
+                logger.warning(f"Layout fingerprinting failed: {e}")
+            preprocessing["config_order"] = {"fingerprint": fingerprint, "preferred": preferred}
+        
+        # Segmented OCR first when enabled; full-page configs when it is not worth it or not good enough.
+        # Pages with too few blocks only cost the segmentation pass before falling through.
+        best_result = None
+        layout_result = None
+        if settings.ocr_layout_analysis and preferred in (None, "layout"):
+            layout_report = preprocessing.setdefault("layout", {})
             try:
-                enhanced_image = self.enhance_image_quality(image)
+                layout_result = self.run_layout_ocr(enhanced_image, layout_report, deadline, lang)
+            except BrokenProcessPool as e:
+                logger.warning(f"OCR process pool broke during layout OCR ({e})")
+                self.reset_ocr_executor()
+                layout_result = None
             except Exception as e:
-                logger.warning(f"Image enhancement failed: {e}, using original")
-                enhanced_image = image
+                logger.warning(f"Layout OCR failed: {e}")
+                layout_result = None
             
-            # Extract text using multiple OCR configurations
-            logger.info("Starting enhanced Tesseract OCR...")
-            try:
-                extracted_text, avg_confidence = self.extract_text_with_multiple_configs(enhanced_image)
-            except HTTPException:
-                raise
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"OCR processing failed: {str(e)}"
+            if (
+                layout_result
+                and layout_result["word_count"] > 5
+                and layout_result["confidence"] >= settings.ocr_layout_min_confidence
+            ):
+                best_result = layout_result
+            layout_report["used"] = best_result is not None
+        
+        # Extract text using multiple OCR configurations
+        logger.info("Starting enhanced Tesseract OCR...")
+        try:
+            if best_result is None and not deadline.expired():
+                best_result = self.run_best_ocr_config(
+                    enhanced_image, deadline=deadline, preferred=preferred, lang=lang
                 )
+                # A weak layout result is still a candidate: keep it if it beat every full-page config
+                if layout_result and layout_result["word_count"] and ocr_score(layout_result) > ocr_score(best_result):
+                    best_result = layout_result
+            elif best_result is None:
+                # Layout OCR used up the time; keep whatever blocks it read
+                best_result = layout_result if layout_result and layout_result["word_count"] else None
+                if best_result is None:
+                    raise HTTPException(status_code=504, detail="OCR timed out before any text was read")
+        except HTTPException:
+            if not (layout_result and layout_result["word_count"]):
+                raise
+            # Every full-page config failed; the layout blocks are all there is
+            best_result = layout_result
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"OCR processing failed: {str(e)}"
+            )
+        if layout_result is not None:
+            preprocessing["layout"]["used"] = best_result is layout_result
+        
+        logger.info("Enhanced Tesseract OCR completed")
+        
+        extracted_text = best_result["text"]
+        avg_confidence = best_result["confidence"] / 100
+        word_count = len([word for word in extracted_text.split() if word.strip()])
+        
+        logger.info(f"Enhanced OCR extracted {word_count} words with confidence: {avg_confidence:.2f}")
+        
+        warnings = []
+        timed_out = bool(best_result.get("timeouts") or best_result.get("deadline_reached"))
+        if timed_out:
+            # Pages of one document share its deadline; count the document, not each page
+            if deadline.report():
+                metrics.increment("ocr_document_deadlines")
+            warnings.append(OCR_TIME_LIMIT_WARNING)
+        
+        if word_count == 0:
+            logger.warning("No text detected by enhanced OCR")
+            return {
+                "text": "No text detected in image",
+                "ocr_confidence": 0.0,
+                "word_count": 0,
+                "warnings": warnings + ["No readable text found in image"],
+                "preprocessing": preprocessing
+            }
+        
+        result = {
+            "text": extracted_text.strip(),
+            "ocr_confidence": avg_confidence,
+            "word_count": word_count,
+            "words": best_result["words"],
+            "config": best_result["config"],
+            "language": language,
+            "layout_fingerprint": fingerprint,
+            "preprocessing": preprocessing
+        }
+        if fingerprint is not None and not timed_out:
+            self.config_history.record_win(fingerprint, best_result["config"])
+        # The cache key cannot hold the preferred config (it is only known after
+        # preprocessing), so only results of the full config search are stored
+        if cache_key is not None and not timed_out and preferred is None:
+            self.cache.put(cache_key, result)
+        
+        return {**result, "warnings": warnings, "cache": "miss" if cache_key is not None else "disabled"}
+
+    def ocr_frames(self, image: Image.Image, status, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """OCR every frame of a multi-page TIFF/GIF in parallel, merged in page order
+        
+        Frames are decoded lazily as workers free up, so memory stays bounded by
+        the number of frames in flight rather than the length of the document.
+        """
+        frame_count = image.n_frames
+        logger.info(f"Multi-frame image detected: {frame_count} frames")
+        
+        page_results = self.ocr_pages(
+            iter_frames(image),
+            settings.ocr_frame_workers,
+            status=status,
+            total=frame_count,
+            unit="frame",
+            deadline=deadline
+        )
+        result = self.merge_page_results(page_results)
+        
+        if not result["word_count"]:
+            result["text"] = "No text detected in image"
+            result["warnings"].append("No readable text found in image")
+        
+        logger.info(
+            f"Multi-frame OCR extracted {result['word_count']} words from {frame_count} frames "
+            f"with confidence: {result['ocr_confidence']:.2f}"
+        )
+        return result
+
+    def extract_text_from_image(self, image_content: bytes, status, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Extract text from image using enhanced Tesseract OCR with comprehensive error handling
+        
+        The image is decoded once, straight into the grayscale buffer that preprocessing
+        works on in place and hands to the OCR engine.
+        """
+        try:
+            if not image_content or len(image_content) == 0:
+                raise HTTPException(status_code=400, detail="Empty image content")
+                
+            logger.info(f"Processing image of size: {len(image_content)} bytes")
+            status.update("text_extraction", 2)
             
-            logger.info("Enhanced Tesseract OCR completed")
+            frames = open_multi_frame(image_content)
+            if frames is not None:
+                return self.ocr_frames(frames, status, deadline)
             
-            word_count = len([word for word in extracted_text.split() if word.strip()])
+            start = time.perf_counter()
+            try:
+                gray = decode_grayscale(image_content)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             
-            logger.info(f"Enhanced OCR extracted {word_count} words with confidence: {avg_confidence:.2f}")
+            if gray.shape[0] == 0 or gray.shape[1] == 0:
+                raise HTTPException(status_code=400, detail="Invalid image dimensions")
             
-            if word_count == 0:
-                logger.warning("No text detected by enhanced OCR")
-                return {
-                    "text": "No text detected in image",
-                    "ocr_confidence": 0.0,
-                    "word_count": 0,
-                    "warnings": ["No readable text found in image"]
-                }
+            logger.info(f"Image decoded to grayscale. Size: {gray.shape[1]}x{gray.shape[0]}")
             
-            return {
-                "text": extracted_text.strip(),
-                "ocr_confidence": avg_confidence,
-                "word_count": word_count,
-                "warnings": []
+            preprocessing = {
+                "timings": {"decode": round((time.perf_counter() - start) * 1000, 2)},
+                "allocations": {"decode": int(gray.nbytes)}
             }
+            return self.ocr_image(gray, preprocessing, in_place=True, deadline=deadline)
             
         except HTTPException:
             raise
@@ -0,0 +1,336 @@
+import os
+import shlex
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from app.utils.exceptions import OCRTimeoutError
+
+try:
+    import tesserocr
+except ImportError:  # Optional: only needed for the in-process engine pool
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+OCRImage = Union[Image.Image, np.ndarray]
+
+# Columns produced by Tesseract's TSV renderer (same keys as pytesseract.Output.DICT)
+TSV_COLUMNS = [
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text"
+]
+
+def _limit_tesseract_threads(thread_limit: int):
+    """Process pool initializer: cap the OpenMP threads each Tesseract run may use"""
+    os.environ["OMP_THREAD_LIMIT"] = str(thread_limit)
+
+def normalize_language_spec(lang: str) -> str:
+    """One spelling per set of packs ("eng+deu" and "deu+eng" are both "deu+eng")"""
+    return "+".join(sorted({pack for pack in lang.split("+") if pack}))
+
+def parse_tesseract_config(config: str) -> Tuple[Optional[int], Dict[str, str]]:
+    """Split a pytesseract-style config string into a PSM and '-c' variables"""
+    psm = None
+    variables = {}
+    tokens = shlex.split(config)
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token == "--psm" and i + 1 < len(tokens):
+            psm = int(tokens[i + 1])
+            i += 2
+        elif token == "-c" and i + 1 < len(tokens):
+            name, _, value = tokens[i + 1].partition("=")
+            variables[name] = value
+            i += 2
+        else:
+            logger.debug(f"Ignoring unsupported Tesseract option: {token}")
+            i += 1
+
+    return psm, variables
+
+def parse_tsv(tsv: str) -> Dict[str, List]:
+    """Parse Tesseract TSV output into the pytesseract image_to_data dict layout"""
+    data = {column: [] for column in TSV_COLUMNS}
+
+    for line in tsv.splitlines():
+        parts = line.split("\t")
+        if len(parts) < len(TSV_COLUMNS) - 1 or parts[0] == "level":
+            continue
+        # Empty text cells may be stripped from the end of the row
+        if len(parts) == len(TSV_COLUMNS) - 1:
+            parts.append("")
+
+        for column, value in zip(TSV_COLUMNS, parts):
+            if column == "text":
+                data[column].append(value)
+            elif column == "conf":
+                data[column].append(float(value))
+            else:
+                data[column].append(int(value))
+
+    return data
+
+class OCRBackend(ABC):
+    """Interface for the Tesseract engine used by OCRProcessor"""
+
+    name = "base"
+
+    @abstractmethod
+    def get_version(self) -> str:
+        """Return the engine version, raising if the engine is unavailable"""
+
+    @abstractmethod
+    def image_to_data(self, image: OCRImage, config: str, timeout: Optional[float] = None,
+                      lang: Optional[str] = None) -> Dict[str, List]:
+        """Run OCR and return word-level results in pytesseract's Output.DICT layout
+        
+        Recognition running longer than `timeout` seconds is stopped and raises OCRTimeoutError.
+        `lang` is a Tesseract language spec such as "fra" or "deu+eng"; None uses the backend default.
+        """
+
+    def available_languages(self) -> Optional[List[str]]:
+        """Installed traineddata packs, or None if the engine cannot tell"""
+        return None
+
+    @abstractmethod
+    def create_executor(self, max_workers: int, threads_per_worker: int) -> Executor:
+        """Create the executor used to run several configs concurrently"""
+
+    def shutdown(self):
+        """Release engine resources"""
+        pass
+
+class PytesseractBackend(OCRBackend):
+    """Runs the tesseract binary once per call through pytesseract"""
+
+    name = "pytesseract"
+
+    def __init__(self, lang: str = "eng"):
+        self.lang = lang
+        self._languages: Optional[List[str]] = None
+
+    def get_version(self) -> str:
+        return str(pytesseract.get_tesseract_version())
+
+    def available_languages(self) -> Optional[List[str]]:
+        if self._languages is None:
+            try:
+                self._languages = pytesseract.get_languages(config="")
+            except Exception as e:
+                logger.warning(f"Could not list Tesseract languages: {e}")
+                return None
+        return self._languages
+
+    def image_to_data(self, image: OCRImage, config: str, timeout: Optional[float] = None,
+                      lang: Optional[str] = None) -> Dict[str, List]:
+        try:
+            # pytesseract kills the tesseract process once the timeout expires
+            return pytesseract.image_to_data(
+                image, lang=lang or self.lang, config=config, output_type=pytesseract.Output.DICT,
+                timeout=timeout or 0
+            )
+        except RuntimeError as e:
+            if "timeout" in str(e).lower():
+                raise OCRTimeoutError(f"Tesseract stopped after {timeout:.1f}s")
+            raise
+
+    def create_executor(self, max_workers: int, threads_per_worker: int) -> Executor:
+        # Every call spawns its own tesseract process; workers only bound how many run at once
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_limit_tesseract_threads,
+            initargs=(threads_per_worker,)
+        )
+
+class TesserocrBackend(OCRBackend):
+    """Keeps pools of long-lived libtesseract handles with language data already loaded
+    
+    The default language's pool is filled up front; pools for other language
+    specs are created on first use and grow one handle at a time up to
+    `pool_size`. At most `max_handles` exist across all specs: past that, an
+    idle handle of the least recently used spec is closed to make room.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, pool_size: int, lang: str = "eng", tessdata_path: Optional[str] = None,
+                 threads_per_worker: int = 1, max_handles: Optional[int] = None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+
+        # Handles are used from several threads at once; keep each one single-threaded
+        _limit_tesseract_threads(threads_per_worker)
+
+        self.pool_size = max(1, pool_size)
+        self.max_handles = max(self.pool_size, max_handles or self.pool_size)
+        self.lang = normalize_language_spec(lang)
+        self.tessdata_path = tessdata_path
+        self._idle: Dict[str, list] = {}
+        self._counts: Dict[str, int] = {}
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._all_handles = set()
+        self._condition = threading.Condition()
+        self.handles_closed = 0
+
+        self._idle[self.lang] = [self._create_handle(self.lang) for _ in range(self.pool_size)]
+        self._counts[self.lang] = self.pool_size
+        self._recent[self.lang] = None
+
+        logger.info(f"Loaded {self.pool_size} Tesseract engine handles ({self.lang})")
+
+    def _create_handle(self, lang: str):
+        if self.tessdata_path:
+            api = tesserocr.PyTessBaseAPI(path=self.tessdata_path, lang=lang)
+        else:
+            api = tesserocr.PyTessBaseAPI(lang=lang)
+        with self._condition:
+            self._all_handles.add(api)
+        return api
+
+    def _take_idle_victim(self, exclude: str):
+        """Remove and return an idle handle of the least recently used other spec (caller holds the lock)"""
+        for spec in self._recent:
+            if spec != exclude and self._idle.get(spec):
+                api = self._idle[spec].pop()
+                self._counts[spec] -= 1
+                if not self._counts[spec]:
+                    del self._counts[spec], self._idle[spec], self._recent[spec]
+                self._all_handles.discard(api)
+                return api
+        return None
+
+    def _acquire(self, lang: str):
+        """An idle handle for `lang`, or None when the caller should create one (its slot is reserved)"""
+        victim = None
+        with self._condition:
+            while True:
+                self._recent[lang] = None
+                self._recent.move_to_end(lang)
+                idle = self._idle.setdefault(lang, [])
+                if idle:
+                    return idle.pop()
+                if self._counts.get(lang, 0) < self.pool_size:
+                    if sum(self._counts.values()) < self.max_handles:
+                        break
+                    victim = self._take_idle_victim(exclude=lang)
+                    if victim is not None:
+                        break
+                # Every handle is busy; wait for one to come back
+                self._condition.wait()
+            self._counts[lang] = self._counts.get(lang, 0) + 1
+
+        if victim is not None:
+            victim.End()
+            self.handles_closed += 1
+        return None
+
+    @contextmanager
+    def lend(self, lang: Optional[str] = None):
+        """Borrow an engine handle for `lang` for the duration of one recognition"""
+        lang = normalize_language_spec(lang or self.lang)
+        api = self._acquire(lang)
+        if api is None:
+            try:
+                api = self._create_handle(lang)
+            except Exception:
+                with self._condition:
+                    self._counts[lang] -= 1
+                    self._condition.notify_all()
+                raise
+            logger.info(f"Loaded a Tesseract engine handle for '{lang}'")
+        try:
+            yield api
+        finally:
+            api.Clear()
+            with self._condition:
+                self._idle.setdefault(lang, []).append(api)
+                self._condition.notify_all()
+
+    def get_version(self) -> str:
+        return tesserocr.tesseract_version()
+
+    def available_languages(self) -> Optional[List[str]]:
+        try:
+            _, languages = tesserocr.get_languages(self.tessdata_path or "")
+            return languages
+        except Exception as e:
+            logger.warning(f"Could not list Tesseract languages: {e}")
+            return None
+
+    @staticmethod
+    def _to_pixels(image: OCRImage) -> np.ndarray:
+        """Get a contiguous 8-bit grayscale or RGB buffer without going through a file"""
+        if isinstance(image, Image.Image):
+            if image.mode not in ("L", "RGB"):
+                image = image.convert("RGB")
+            image = np.asarray(image)
+        return np.ascontiguousarray(image)
+
+    def image_to_data(self, image: OCRImage, config: str, timeout: Optional[float] = None,
+                      lang: Optional[str] = None) -> Dict[str, List]:
+        pixels = self._to_pixels(image)
+        height, width = pixels.shape[:2]
+        bytes_per_pixel = 1 if pixels.ndim == 2 else pixels.shape[2]
+        psm, variables = parse_tesseract_config(config)
+
+        with self.lend(lang) as api:
+            previous = {name: api.GetVariableAsString(name) for name in variables}
+            try:
+                if psm is not None:
+                    api.SetPageSegMode(psm)
+                for name, value in variables.items():
+                    api.SetVariable(name, value)
+
+                # Hand over the array's own buffer; tobytes() would copy the whole page
+                api.SetImageBytes(pixels.data, width, height, bytes_per_pixel, pixels.strides[0])
+                # Recognize() cancels itself once the timeout (ms) passes and returns False
+                if not api.Recognize(int(timeout * 1000) if timeout else 0):
+                    if timeout:
+                        raise OCRTimeoutError(f"Tesseract stopped after {timeout:.1f}s")
+                    raise RuntimeError("Tesseract recognition failed")
+                return parse_tsv(api.GetTSVText(0))
+            finally:
+                for name, value in previous.items():
+                    if value is not None:
+                        api.SetVariable(name, value)
+                api.SetPageSegMode(tesserocr.PSM.AUTO)
+
+    def create_executor(self, max_workers: int, threads_per_worker: int) -> Executor:
+        # libtesseract releases the GIL while recognizing, so threads give real parallelism;
+        # more threads than pooled handles would only wait for a handle
+        return ThreadPoolExecutor(max_workers=max(1, min(max_workers, self.pool_size)), thread_name_prefix="tesserocr")
+
+    def shutdown(self):
+        with self._condition:
+            for api in self._all_handles:
+                api.End()
+            self._all_handles = set()
+            self._idle = {}
+            self._counts = {}
+
+def create_ocr_backend(name: str, pool_size: int, lang: str = "eng", tessdata_path: Optional[str] = None,
+                       threads_per_worker: int = 1, max_handles: Optional[int] = None) -> OCRBackend:
+    """Build the configured OCR backend, falling back to pytesseract if unavailable"""
+    if name == TesserocrBackend.name:
+        try:
+            return TesserocrBackend(
+                pool_size, lang=lang, tessdata_path=tessdata_path,
+                threads_per_worker=threads_per_worker, max_handles=max_handles
+            )
+        except Exception as e:
+            logger.warning(f"Tesserocr engine pool unavailable ({e}), falling back to pytesseract")
+    elif name != PytesseractBackend.name:
+        logger.warning(f"Unknown OCR backend '{name}', using pytesseract")
+
+    return PytesseractBackend(lang=lang)
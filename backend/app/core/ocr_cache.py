@@ -0,0 +1,242 @@
+import base64
+import numpy as np
+import cv2
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Perceptual hash: horizontal gradient signs on a HASH_SIZE x HASH_SIZE grid
+HASH_SIZE = 16
+# Cached images whose hash differs in more bits than this are not even compared
+MAX_HASH_DISTANCE = 24
+# Confirmation compares mean brightness of MATCH_BLOCK_SIZE-pixel blocks at full resolution.
+# Re-saving or re-rendering moves block means by a few levels; a changed digit moves
+# the blocks under its strokes by far more than MATCH_MAX_BLOCK_DIFF.
+MATCH_BLOCK_SIZE = 8
+MATCH_MAX_BLOCK_DIFF = 16
+
+class CacheKey(NamedTuple):
+    """Lookup key for one decoded image under one set of OCR settings"""
+    settings: str
+    shape: Tuple[int, int]
+    phash: int
+    blocks: np.ndarray
+
+def _write_atomic(path: str, data: bytes) -> int:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    pixels = np.asarray(image)
+    if pixels.ndim == 3:
+        pixels = cv2.cvtColor(pixels, cv2.COLOR_RGBA2GRAY if pixels.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    return pixels
+
+def perceptual_hash(gray: np.ndarray) -> int:
+    """Difference hash of a grayscale image, robust to recompression and small rendering changes"""
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def block_means(gray: np.ndarray) -> np.ndarray:
+    """Mean brightness of every MATCH_BLOCK_SIZE block, edges padded, as uint8"""
+    height, width = gray.shape[:2]
+    pad_bottom, pad_right = -height % MATCH_BLOCK_SIZE, -width % MATCH_BLOCK_SIZE
+    if pad_bottom or pad_right:
+        gray = np.pad(gray, ((0, pad_bottom), (0, pad_right)), mode="edge")
+    rows, cols = gray.shape[0] // MATCH_BLOCK_SIZE, gray.shape[1] // MATCH_BLOCK_SIZE
+    blocks = gray.reshape(rows, MATCH_BLOCK_SIZE, cols, MATCH_BLOCK_SIZE).mean(axis=(1, 3), dtype=np.float32)
+    return np.round(blocks).astype(np.uint8)
+
+class OCRResultCache:
+    """On-disk, size-bounded LRU cache of OCR results keyed by image content
+
+    Lookups shortlist entries stored under the same OCR settings (preprocessing
+    version, engine, language, configs) and image size by perceptual hash,
+    then confirm a candidate strictly: every 8x8 block of the new image must
+    match the cached one within a few brightness levels. Re-saved JPEGs and
+    re-exported PDFs of a page hit; two renders that differ in a single digit
+    do not. Access time is tracked through file mtimes, so recency survives
+    restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        entries = self._scan_entries()
+        self._total_bytes = sum(size for _, _, size in entries)
+        # (settings, shape) -> [(perceptual hash, path)], rebuilt from file names
+        self._index: Dict[Tuple[str, Tuple[int, int]], List[Tuple[int, str]]] = {}
+        for _, path, _ in entries:
+            self._add_to_index(path)
+
+    @staticmethod
+    def make_key(image: np.ndarray, *parts: Iterable[str]) -> CacheKey:
+        """Cache key for a decoded image under the given OCR settings"""
+        gray = _to_gray(image)
+        settings_digest = hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()[:32]
+        return CacheKey(settings_digest, tuple(gray.shape[:2]), perceptual_hash(gray), block_means(gray))
+
+    def _path(self, key: CacheKey) -> str:
+        height, width = key.shape
+        name = f"{key.settings}_{height}x{width}_{key.phash:0{HASH_SIZE * HASH_SIZE // 4}x}_{uuid.uuid4().hex[:12]}.json"
+        return os.path.join(self.directory, key.settings[:2], name)
+
+    def _add_to_index(self, path: str):
+        """Index a cache file by the settings, size and hash encoded in its name (caller holds the lock or is __init__)"""
+        try:
+            settings, size, phash, _ = os.path.basename(path)[:-len(".json")].split("_")
+            height, width = (int(value) for value in size.split("x"))
+            self._index.setdefault((settings, (height, width)), []).append((int(phash, 16), path))
+        except ValueError:
+            logger.debug(f"Ignoring unrecognised OCR cache file {path}")
+
+    def _candidates(self, key: CacheKey) -> List[str]:
+        with self._lock:
+            entries = self._index.get((key.settings, key.shape), [])
+            scored = [(bin(phash ^ key.phash).count("1"), path) for phash, path in entries]
+        return [path for distance, path in sorted(scored) if distance <= MAX_HASH_DISTANCE]
+
+    @staticmethod
+    def _matches(entry: Dict[str, Any], key: CacheKey) -> bool:
+        encoded = np.frombuffer(base64.b64decode(entry["blocks"]), dtype=np.uint8)
+        blocks = cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+        if blocks is None or blocks.shape != key.blocks.shape:
+            return False
+        return int(np.abs(blocks.astype(np.int16) - key.blocks).max()) <= MATCH_MAX_BLOCK_DIFF
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Cached result for this image (or a confirmed re-encoding of it) under these settings, or None"""
+        for path in self._candidates(key):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if not self._matches(entry, key):
+                    continue
+                # Touch the file so eviction sees this entry as recently used
+                now = time.time()
+                os.utime(path, (now, now))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable OCR cache entry {path}: {e}")
+                with self._lock:
+                    self.errors += 1
+                continue
+
+            with self._lock:
+                self.hits += 1
+            return entry["result"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: CacheKey, result: Dict[str, Any]):
+        """Store a result, evicting least recently used entries past the size limit"""
+        path = self._path(key)
+        try:
+            ok, png = cv2.imencode(".png", key.blocks)
+            if not ok:
+                raise ValueError("could not encode block signature")
+            payload = json.dumps({
+                "result": result,
+                "blocks": base64.b64encode(png.tobytes()).decode("ascii")
+            }).encode("utf-8")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            written = _write_atomic(path, payload)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Failed to store OCR cache entry: {e}")
+            with self._lock:
+                self.errors += 1
+            return
+
+        with self._lock:
+            self._add_to_index(path)
+            self.stores += 1
+            self._total_bytes += written
+            over_limit = self._total_bytes > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def _scan_entries(self) -> List[Tuple[float, str, int]]:
+        """(mtime, path, size) for every cache file"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def evict(self):
+        """Delete least recently used entries until the cache is back under 90% of its limit"""
+        with self._lock:
+            entries = sorted(self._scan_entries())
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * 0.9
+            removed = set()
+
+            for _, path, size in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                removed.add(path)
+                total -= size
+                self.evictions += 1
+                bucket = os.path.dirname(path)
+                try:
+                    os.rmdir(bucket)
+                except OSError:
+                    pass
+
+            for group, indexed in list(self._index.items()):
+                kept = [item for item in indexed if item[1] not in removed]
+                if kept:
+                    self._index[group] = kept
+                else:
+                    del self._index[group]
+
+            self._total_bytes = total
+            logger.info(f"OCR cache evicted down to {total / (1024 * 1024):.1f} MB")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,134 @@
+import io
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import List
+
+import PyPDF2
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional: faster text layer extraction
+    pdfium = None
+
+try:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LAParams, LTTextContainer
+except ImportError:  # Optional: layout-preserving text layer extraction
+    extract_pages = None
+
+logger = logging.getLogger(__name__)
+
+# PDFium is not thread-safe: every call into it, from any module, must hold this lock
+PDFIUM_LOCK = threading.RLock()
+
+class PDFTextBackend(ABC):
+    """Interface for extracting the embedded text layer of a PDF, page by page"""
+
+    name = "base"
+
+    @abstractmethod
+    def extract_pages(self, file_content: bytes) -> List[str]:
+        """Return one text string per page; unreadable pages come back empty"""
+
+class PyPDF2Backend(PDFTextBackend):
+    """Pure-Python extraction with PyPDF2"""
+
+    name = "pypdf2"
+
+    def extract_pages(self, file_content: bytes) -> List[str]:
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+
+        if len(pdf_reader.pages) == 0:
+            raise ValueError("PDF contains no pages")
+
+        pages = []
+        for i, page in enumerate(pdf_reader.pages):
+            try:
+                pages.append(page.extract_text() or "")
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {i+1}: {e}")
+                pages.append("")
+
+        return pages
+
+class PdfiumBackend(PDFTextBackend):
+    """Native extraction with PDFium, much faster on long table-heavy documents"""
+
+    name = "pdfium"
+
+    def __init__(self):
+        if pdfium is None:
+            raise RuntimeError("pypdfium2 is not installed")
+
+    def extract_pages(self, file_content: bytes) -> List[str]:
+        with PDFIUM_LOCK:
+            return self._extract_pages(file_content)
+
+    def _extract_pages(self, file_content: bytes) -> List[str]:
+        pdf = pdfium.PdfDocument(file_content)
+        try:
+            if len(pdf) == 0:
+                raise ValueError("PDF contains no pages")
+
+            pages = []
+            for i in range(len(pdf)):
+                page = pdf[i]
+                try:
+                    textpage = page.get_textpage()
+                    try:
+                        pages.append(textpage.get_text_range().replace("\r\n", "\n"))
+                    finally:
+                        textpage.close()
+                except Exception as e:
+                    logger.warning(f"Failed to extract text from page {i+1}: {e}")
+                    pages.append("")
+                finally:
+                    page.close()
+
+            return pages
+        finally:
+            pdf.close()
+
+class PdfminerBackend(PDFTextBackend):
+    """pdfminer.six extraction with layout analysis, keeping table columns in reading order"""
+
+    name = "pdfminer"
+
+    def __init__(self):
+        if extract_pages is None:
+            raise RuntimeError("pdfminer.six is not installed")
+
+    def extract_pages(self, file_content: bytes) -> List[str]:
+        pages = []
+        laparams = LAParams(line_margin=0.3, boxes_flow=0.5)
+
+        for page_layout in extract_pages(io.BytesIO(file_content), laparams=laparams):
+            pages.append("".join(
+                element.get_text() for element in page_layout if isinstance(element, LTTextContainer)
+            ))
+
+        if not pages:
+            raise ValueError("PDF contains no pages")
+
+        return pages
+
+PDF_TEXT_BACKENDS = {
+    PyPDF2Backend.name: PyPDF2Backend,
+    PdfiumBackend.name: PdfiumBackend,
+    PdfminerBackend.name: PdfminerBackend,
+}
+
+def create_pdf_backend(name: str) -> PDFTextBackend:
+    """Build the configured PDF text backend, falling back to PyPDF2 if unavailable"""
+    backend_class = PDF_TEXT_BACKENDS.get(name)
+
+    if backend_class is None:
+        logger.warning(f"Unknown PDF text backend '{name}', using PyPDF2")
+        return PyPDF2Backend()
+
+    try:
+        return backend_class()
+    except Exception as e:
+        logger.warning(f"PDF text backend '{name}' unavailable ({e}), falling back to PyPDF2")
+        return PyPDF2Backend()
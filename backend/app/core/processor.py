@@ -1,14 +1,21 @@
 from fastapi import HTTPException, UploadFile
-from typing import Dict, Any, Optional, List, Tuple, Union
+from typing import Dict, Any, Callable, Optional, List, Tuple, Union
 import logging
+import json
 import os
 import asyncio
 from datetime import datetime
 import traceback
 
+from app.core.config import settings
 from app.core.ocr import OCRProcessor
-from app.core.ai_analyzer import AIAnalyzer
+from app.core.ai_analyzer import AIAnalyzer, FieldCallback
+from app.core.prompt_compaction import PromptCompactor
+from app.core.rule_extractor import RuleBasedExtractor
 from app.core.validator import BusinessValidator
+from app.utils.deadline import Deadline
+from app.utils.json_stream import IncrementalJSONParser
+from app.utils.metrics import metrics
 from app.utils.websocket_manager import ConnectionManager
 
 logger = logging.getLogger(__name__)
@@ -29,28 +36,59 @@ class ProcessingStatus:
             "confidence_scoring",
             "finalization"
         ]
+        self.detail = None
     
     def update(self, step: str, progress: int = None):
         if step in self.steps:
+            if step != self.current_step:
+                self.detail = None
             self.current_step = step
             self.progress = self.steps.index(step) + 1
             if progress:
                 self.progress = progress
         logger.info(f"Processing step: {step} ({self.progress}/{self.total_steps})")
     
+    def update_pages(self, done: int, total: Optional[int] = None, unit: str = "page"):
+        """Record progress through the pages/frames of the current step"""
+        self.detail = {"unit": unit, "done": done, "total": total}
+        logger.info(f"Processing step: {self.current_step}, {unit} {done}/{total or '?'}")
+    
     def get_status(self) -> Dict:
-        return {
+        status = {
             "current_step": self.current_step,
             "progress": self.progress,
             "total_steps": self.total_steps,
             "percentage": round((self.progress / self.total_steps) * 100, 1)
         }
+        if self.detail:
+            status["detail"] = self.detail
+        return status
 
 class WebSocketProcessingStatus(ProcessingStatus):
     def __init__(self, client_id: str, connection_manager: ConnectionManager):
         super().__init__()
         self.client_id = client_id
         self.connection_manager = connection_manager
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+    
+    def update_pages(self, done: int, total: Optional[int] = None, unit: str = "page"):
+        """Record page progress and push it to the client when called from a worker thread"""
+        super().update_pages(done, total, unit)
+        
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not self._loop:
+            asyncio.run_coroutine_threadsafe(
+                self.connection_manager.send_progress_update(self.client_id, self.get_status()),
+                self._loop
+            )
     
     async def update_async(self, step: str, progress: int = None):
         """Async version of update that sends WebSocket updates"""
@@ -73,173 +111,369 @@ class InvoiceExtractor:
         self.ocr_processor = OCRProcessor()
         self.ai_analyzer = AIAnalyzer()
         self.validator = BusinessValidator()
+        self.prompt_compactor = PromptCompactor(
+            settings.ai_model,
+            token_budget=settings.ai_prompt_token_budget,
+            boilerplate_min_documents=settings.ai_boilerplate_min_documents
+        ) if settings.ai_prompt_compaction else None
+        self.rule_extractor = RuleBasedExtractor(
+            settings.rule_extraction_required_fields,
+            min_confidence=settings.rule_extraction_min_confidence
+        ) if settings.rule_extraction_enabled or settings.rule_extraction_fallback else None
         
         # Test components
         self.ocr_processor.test_tesseract()
 
     def extract_text_from_pdf(self, file_content: bytes) -> str:
-        """Extract text from PDF using PyPDF2 with enhanced error handling"""
+        """Extract the PDF text layer with the configured backend"""
         return self.ocr_processor.extract_text_from_pdf(file_content)
 
-    def extract_text_from_image(self, image_content: bytes, status: ProcessingStatus) -> Dict[str, Any]:
+    def process_pdf(self, file_content: bytes, status: ProcessingStatus,
+                    deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Extract PDF text, running OCR on rasterized pages for scanned documents"""
+        return self.ocr_processor.process_pdf(file_content, status, deadline)
+
+    def extract_text_from_image(self, image_content: bytes, status: ProcessingStatus,
+                                deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Extract text from image using enhanced Tesseract OCR with comprehensive error handling"""
-        return self.ocr_processor.extract_text_from_image(image_content, status)
+        return self.ocr_processor.extract_text_from_image(image_content, status, deadline)
 
-    def detect_language_and_locale(self, text: str) -> Tuple[str, str]:
+    def ocr_deadline(self, job_deadline: Optional[Deadline] = None) -> Deadline:
+        """OCR deadline for a new document: the OCR budget, capped by the overall processing timeout
+        
+        With `job_deadline`, OCR also never outlives the job it belongs to.
+        """
+        overall = job_deadline.within(settings.processing_timeout) if job_deadline else Deadline(settings.processing_timeout)
+        return overall.within(settings.ocr_document_timeout)
+
+    def compact_for_ai(self, text: str, words: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Text to send to the AI and a token report, or the text unchanged when compaction is off"""
+        if self.prompt_compactor is None:
+            return text, None
+        return self.prompt_compactor.compact(text, words)
+
+    def detect_language_and_locale(self, text: str, language_hint: Optional[str] = None) -> Tuple[str, str]:
         """Detect document language and likely date format with error handling"""
-        return self.ai_analyzer.detect_language_and_locale(text)
+        return self.ai_analyzer.detect_language_and_locale(text, language_hint)
 
     def analyze_with_ai(self, extracted_text: str, language: str, date_format: str, status: ProcessingStatus) -> Dict[str, Any]:
         """Enhanced AI analysis with locale-specific instructions"""
         return self.ai_analyzer.analyze_with_ai(extracted_text, language, date_format, status)
 
+    async def detect_language_and_locale_async(self, text: str, language_hint: Optional[str] = None) -> Tuple[str, str]:
+        """Awaitable language and date format detection over the pooled async client"""
+        return await self.ai_analyzer.detect_language_and_locale_async(text, language_hint)
+
+    async def analyze_with_ai_async(self, extracted_text: str, language: str, date_format: str, status: ProcessingStatus,
+                                    on_field: Optional[FieldCallback] = None) -> Dict[str, Any]:
+        """Awaitable AI analysis; does not block the event loop"""
+        return await self.ai_analyzer.analyze_with_ai_async(extracted_text, language, date_format, status, on_field)
+
+    async def extract_with_locale_async(self, extracted_text: str, status: ProcessingStatus,
+                                        language_hint: Optional[str] = None,
+                                        on_field: Optional[FieldCallback] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Language, date format and analysis from a single AI call"""
+        return await self.ai_analyzer.extract_with_locale_async(extracted_text, status, language_hint, on_field)
+
+    def extract_with_rules(self, document: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Rule-based extraction of a document (see RuleBasedExtractor.extract), or None when rules are off"""
+        if self.rule_extractor is None:
+            return None
+        try:
+            return self.rule_extractor.extract(document["text"], document["words"], document["ocr_confidence"])
+        except Exception as e:
+            logger.warning(f"Rule-based extraction failed: {e}")
+            return None
+
+    def remember_layout_vendor(self, processing_info: Dict[str, Any], analysis: Dict[str, Any]):
+        """Tag a saved invoice's OCR layout profile with its vendor"""
+        history = self.ocr_processor.config_history
+        fingerprint = (processing_info.get("ocr_details") or {}).get("layout_fingerprint")
+        vendor_name = (analysis.get("vendor_info") or {}).get("vendor_name")
+        if history is not None and fingerprint and vendor_name:
+            history.tag_vendor(fingerprint, vendor_name)
+
+    @staticmethod
+    def use_rules(rules: Optional[Dict[str, Any]]) -> bool:
+        """Whether a rule-based result is good enough to skip the AI"""
+        if rules is None or not settings.rule_extraction_enabled:
+            return False
+        metrics.increment("rule_extraction_hits" if rules["sufficient"] else "rule_extraction_misses")
+        return rules["sufficient"]
+
+    @staticmethod
+    def rules_fallback(rules: Optional[Dict[str, Any]], error: HTTPException) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """Rule-based result to serve when the AI service failed, or None to let the error through"""
+        if not settings.rule_extraction_fallback or rules is None:
+            return None
+        # Only outages and rate limits; client errors still reach the caller
+        if error.status_code != 429 and error.status_code < 500:
+            return None
+        if not any(confidence for confidence in rules["field_confidence"].values()):
+            return None
+        
+        metrics.increment("rule_extraction_fallbacks")
+        logger.warning(f"AI service failed ({error.detail}), serving rule-based extraction")
+        analysis = json.loads(json.dumps(rules["analysis"]))
+        analysis["document_analysis"]["extraction_method"] = "rules_fallback"
+        analysis.setdefault("validation_warnings", []).append(
+            f"AI analysis failed ({error.detail}); fields were extracted by local rules and may be incomplete"
+        )
+        return rules["language"], rules["date_format"], analysis
+
+    async def analyze_document(self, document: Dict[str, Any], ai_text: str, status: ProcessingStatus,
+                               on_field: Optional[FieldCallback] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Language, date format and analysis of a document from extract_document_text
+        
+        Rules answer alone when they find every required field confidently; otherwise
+        the AI is asked, and the rule-based result is served if the AI service is down.
+        """
+        rules = self.extract_with_rules(document)
+        if self.use_rules(rules):
+            logger.info("Rule-based extraction is sufficient, skipping AI analysis")
+            status.update("field_parsing", 5)
+            if on_field is not None:
+                for path, value in IncrementalJSONParser().feed(json.dumps(rules["analysis"])):
+                    await on_field(".".join(str(part) for part in path), value)
+            return rules["language"], rules["date_format"], rules["analysis"]
+        
+        language_hint = document["ocr_details"].get("language")
+        try:
+            if settings.ai_single_call:
+                logger.info("Starting single-call AI analysis...")
+                return await self.extract_with_locale_async(ai_text, status, language_hint, on_field)
+            
+            language, date_format = await self.detect_language_and_locale_async(ai_text, language_hint)
+            
+            # AI Analysis with locale-specific instructions
+            logger.info(f"Starting AI analysis with {language}/{date_format}...")
+            analysis = await self.analyze_with_ai_async(ai_text, language, date_format, status, on_field)
+            return language, date_format, analysis
+        except HTTPException as e:
+            fallback = self.rules_fallback(rules, e)
+            if fallback is None:
+                raise
+            return fallback
+
     def validate_extracted_data(self, analysis: Dict, extracted_text: str, language: str, date_format: str) -> Dict:
         """Enhanced validation with locale awareness and business rules"""
         return self.validator.validate_extracted_data(analysis, extracted_text, language, date_format)
 
-    async def process_document(self, file: UploadFile) -> Dict[str, Any]:
-        """Main processing pipeline with enhanced locale-aware accuracy and comprehensive error handling"""
-        status = ProcessingStatus()
-        
+    async def read_upload(self, file: UploadFile) -> bytes:
+        """Read an uploaded file, rejecting empty and oversized ones"""
+        # Read file content
         try:
-            status.update("file_validation", 1)
-            
-            # Read file content
+            file_content = await file.read()
+        except Exception as e:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Failed to read uploaded file: {str(e)}"
+            )
+        
+        logger.info(f"Processing file: {file.filename}, Type: {file.content_type}, Size: {len(file_content)} bytes")
+        
+        # Validate file size (max 10MB)
+        if len(file_content) > 10 * 1024 * 1024:
+            raise HTTPException(
+                status_code=413, 
+                detail="File too large. Maximum size is 10MB."
+            )
+        
+        # Validate file content is not empty
+        if len(file_content) == 0:
+            raise HTTPException(status_code=400, detail="Empty file uploaded.")
+        
+        return file_content
+
+    async def extract_document_text(self, file_content: bytes, content_type: Optional[str], filename: Optional[str],
+                                    status: ProcessingStatus, ocr_deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Text of a PDF or image with its OCR details, raising HTTPException when nothing readable is found"""
+        # Determine file type and extract text
+        extracted_text = ""
+        text_source = ""
+        ocr_confidence = 1.0
+        ocr_details = {}
+        ocr_words = None
+        warnings = []
+        
+        if content_type == "application/pdf":
             try:
-                file_content = await file.read()
+                pdf_result = await asyncio.to_thread(self.process_pdf, file_content, status, ocr_deadline)
+                extracted_text = pdf_result["text"]
+                text_source = pdf_result["text_source"]
+                ocr_confidence = pdf_result["ocr_confidence"]
+                warnings.extend(pdf_result.get("warnings", []))
+                ocr_details["pages"] = pdf_result.get("pages")
+                ocr_details["layout_fingerprint"] = pdf_result.get("layout_fingerprint")
+                ocr_details["language"] = pdf_result.get("language")
+            except HTTPException:
+                raise
             except Exception as e:
                 raise HTTPException(
-                    status_code=400, 
-                    detail=f"Failed to read uploaded file: {str(e)}"
+                    status_code=400,
+                    detail=f"PDF processing failed: {str(e)}"
                 )
-            
-            logger.info(f"Processing file: {file.filename}, Type: {file.content_type}, Size: {len(file_content)} bytes")
-            
-            # Validate file size (max 10MB)
-            if len(file_content) > 10 * 1024 * 1024:
+                
+        elif content_type and content_type.startswith("image/"):
+            try:
+                ocr_result = await asyncio.to_thread(self.extract_text_from_image, file_content, status, ocr_deadline)
+                extracted_text = ocr_result["text"]
+                text_source = "ocr"
+                ocr_confidence = ocr_result["ocr_confidence"]
+                warnings.extend(ocr_result.get("warnings", []))
+                ocr_details["preprocessing"] = ocr_result.get("preprocessing")
+                ocr_details["cache"] = ocr_result.get("cache")
+                ocr_details["layout_fingerprint"] = ocr_result.get("layout_fingerprint")
+                ocr_details["language"] = ocr_result.get("language")
+                ocr_details["pages"] = ocr_result.get("pages")
+                ocr_words = ocr_result.get("words")
+            except HTTPException:
+                raise
+            except Exception as e:
                 raise HTTPException(
-                    status_code=413, 
-                    detail="File too large. Maximum size is 10MB."
+                    status_code=500,
+                    detail=f"Image processing failed: {str(e)}"
                 )
-            
-            # Validate file content is not empty
-            if len(file_content) == 0:
-                raise HTTPException(status_code=400, detail="Empty file uploaded.")
-            
-            # Determine file type and extract text
-            extracted_text = ""
-            text_source = ""
-            ocr_confidence = 1.0
-            warnings = []
-            
-            if file.content_type == "application/pdf":
-                try:
-                    extracted_text = self.extract_text_from_pdf(file_content)
-                    text_source = "pdf_extraction"
-                    ocr_confidence = 1.0
-                except HTTPException:
-                    raise
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"PDF processing failed: {str(e)}"
-                    )
-                    
-            elif file.content_type and file.content_type.startswith("image/"):
+                
+        elif not content_type:
+            # Try to determine from filename
+            filename_lower = filename.lower() if filename else ""
+            if filename_lower.endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')):
                 try:
-                    ocr_result = self.extract_text_from_image(file_content, status)
+                    ocr_result = await asyncio.to_thread(self.extract_text_from_image, file_content, status, ocr_deadline)
                     extracted_text = ocr_result["text"]
                     text_source = "ocr"
                     ocr_confidence = ocr_result["ocr_confidence"]
                     warnings.extend(ocr_result.get("warnings", []))
+                    ocr_details["preprocessing"] = ocr_result.get("preprocessing")
+                    ocr_details["cache"] = ocr_result.get("cache")
+                    ocr_details["layout_fingerprint"] = ocr_result.get("layout_fingerprint")
+                    ocr_details["language"] = ocr_result.get("language")
+                    ocr_details["pages"] = ocr_result.get("pages")
+                    ocr_words = ocr_result.get("words")
+                except HTTPException:
+                    raise
+            elif filename_lower.endswith('.pdf'):
+                try:
+                    pdf_result = await asyncio.to_thread(self.process_pdf, file_content, status, ocr_deadline)
+                    extracted_text = pdf_result["text"]
+                    text_source = pdf_result["text_source"]
+                    ocr_confidence = pdf_result["ocr_confidence"]
+                    warnings.extend(pdf_result.get("warnings", []))
+                    ocr_details["pages"] = pdf_result.get("pages")
+                    ocr_details["layout_fingerprint"] = pdf_result.get("layout_fingerprint")
+                    ocr_details["language"] = pdf_result.get("language")
                 except HTTPException:
                     raise
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Image processing failed: {str(e)}"
-                    )
-                    
-            elif not file.content_type:
-                # Try to determine from filename
-                filename_lower = file.filename.lower() if file.filename else ""
-                if filename_lower.endswith(('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')):
-                    try:
-                        ocr_result = self.extract_text_from_image(file_content, status)
-                        extracted_text = ocr_result["text"]
-                        text_source = "ocr"
-                        ocr_confidence = ocr_result["ocr_confidence"]
-                        warnings.extend(ocr_result.get("warnings", []))
-                    except HTTPException:
-                        raise
-                elif filename_lower.endswith('.pdf'):
-                    try:
-                        extracted_text = self.extract_text_from_pdf(file_content)
-                        text_source = "pdf_extraction"
-                        ocr_confidence = 1.0
-                    except HTTPException:
-                        raise
-                else:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail="Unknown file type. Please upload PDF or image files."
-                    )
             else:
-                logger.error(f"Unsupported file type: {file.content_type}")
                 raise HTTPException(
                     status_code=400, 
-                    detail=f"Unsupported file type: {file.content_type}. Please upload PDF, JPG, PNG, or other image files."
+                    detail="Unknown file type. Please upload PDF or image files."
                 )
+        else:
+            logger.error(f"Unsupported file type: {content_type}")
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Unsupported file type: {content_type}. Please upload PDF, JPG, PNG, or other image files."
+            )
+        
+        # Check if we got meaningful text
+        if not extracted_text or len(extracted_text.strip()) < 10:
+            logger.warning(f"Insufficient text extracted: '{extracted_text[:50] if extracted_text else 'None'}...'")
+            raise HTTPException(
+                status_code=400, 
+                detail="No readable text found in document. Please ensure the image is clear and contains text, or try a different file."
+            )
+        
+        return {
+            "text": extracted_text,
+            "text_source": text_source,
+            "ocr_confidence": ocr_confidence,
+            "ocr_details": ocr_details,
+            "words": ocr_words,
+            "warnings": warnings
+        }
+
+    def build_response(self, filename: Optional[str], content_type: Optional[str], document: Dict[str, Any],
+                       language: str, date_format: str, analysis: Dict[str, Any],
+                       prompt_compaction: Optional[Dict[str, Any]], status: ProcessingStatus) -> Dict[str, Any]:
+        """API response for one processed document; `document` is what extract_document_text returned"""
+        extracted_text = document["text"]
+        ocr_confidence = document["ocr_confidence"]
+        text_source = document["text_source"]
+        ocr_details = document["ocr_details"]
+        warnings = document["warnings"]
+        
+        status.update("confidence_scoring", 7)
+        
+        # Calculate overall processing confidence
+        processing_confidence = min(
+            ocr_confidence,
+            analysis.get('document_analysis', {}).get('overall_confidence', 0.5)
+        )
+        
+        status.update("finalization", 8)
+        
+        # Combine results
+        response = {
+            "success": True,
+            "processing_info": {
+                "filename": filename,
+                "file_type": content_type or "unknown",
+                "text_source": text_source,
+                "ocr_confidence": ocr_confidence,
+                "text_length": len(extracted_text),
+                "detected_language": language,
+                "date_format": date_format,
+                "processing_confidence": processing_confidence,
+                "ocr_details": ocr_details,
+                "prompt_compaction": prompt_compaction,
+                "status": status.get_status()
+            },
+            "extracted_text": extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
+            "analysis": analysis,
+            "warnings": warnings + analysis.get('validation_warnings', []),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        return response
+
+    async def process_document(self, file: UploadFile, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Main processing pipeline with enhanced locale-aware accuracy and comprehensive error handling
+        
+        A `deadline` bounds the whole job: OCR stops at it inside its worker threads,
+        and the AI step is cancelled when it passes, raising a 504.
+        """
+        status = ProcessingStatus()
+        deadline = deadline or Deadline()
+        ocr_deadline = self.ocr_deadline(deadline)
+        
+        try:
+            status.update("file_validation", 1)
             
-            # Check if we got meaningful text
-            if not extracted_text or len(extracted_text.strip()) < 10:
-                logger.warning(f"Insufficient text extracted: '{extracted_text[:50] if extracted_text else 'None'}...'")
-                raise HTTPException(
-                    status_code=400, 
-                    detail="No readable text found in document. Please ensure the image is clear and contains text, or try a different file."
-                )
+            file_content = await self.read_upload(file)
             
-            # Detect language and date format
-            status.update("language_detection", 3)
-            language, date_format = self.detect_language_and_locale(extracted_text)
+            document = await self.extract_document_text(file_content, file.content_type, file.filename, status, ocr_deadline)
+            extracted_text = document["text"]
             
-            # AI Analysis with locale-specific instructions
-            logger.info(f"Starting AI analysis with {language}/{date_format}...")
-            analysis = self.analyze_with_ai(extracted_text, language, date_format, status)
-            logger.info("Locale-aware AI analysis completed")
+            # Whitespace, noise and boilerplate cost tokens without helping the AI
+            ai_text, prompt_compaction = self.compact_for_ai(extracted_text, document["words"])
             
-            status.update("confidence_scoring", 7)
+            # Detect language and date format, then extract fields
+            status.update("language_detection", 3)
+            try:
+                # The AI call is async I/O, so cancelling it really stops the request
+                language, date_format, analysis = await asyncio.wait_for(
+                    self.analyze_document(document, ai_text, status), timeout=deadline.remaining()
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="Processing deadline reached during AI analysis")
+            logger.info("Locale-aware analysis completed")
             
-            # Calculate overall processing confidence
-            processing_confidence = min(
-                ocr_confidence,
-                analysis.get('document_analysis', {}).get('overall_confidence', 0.5)
+            return self.build_response(
+                file.filename, file.content_type, document, language, date_format, analysis, prompt_compaction, status
             )
             
-            status.update("finalization", 8)
-            
-            # Combine results
-            response = {
-                "success": True,
-                "processing_info": {
-                    "filename": file.filename,
-                    "file_type": file.content_type or "unknown",
-                    "text_source": text_source,
-                    "ocr_confidence": ocr_confidence,
-                    "text_length": len(extracted_text),
-                    "detected_language": language,
-                    "date_format": date_format,
-                    "processing_confidence": processing_confidence,
-                    "status": status.get_status()
-                },
-                "extracted_text": extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
-                "analysis": analysis,
-                "warnings": warnings + analysis.get('validation_warnings', []),
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            return response
-            
         except HTTPException:
             raise
         except Exception as e:
@@ -250,6 +484,85 @@ class InvoiceExtractor:
                 detail=f"Processing failed: {str(e)}"
             )
 
+    async def process_documents_bulk(self, files: List[Tuple[Optional[str], Optional[str], bytes]],
+                                     on_result: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Process many documents, extracting several per AI request
+        
+        `files` are (filename, content_type, content) tuples. Returns one entry per
+        file, in order: the same response as process_document, or
+        {"success": False, ...} with the error for files that failed.
+        
+        Each document's OCR stops at its own deadline (`ocr_document_timeout`) and
+        the AI step gets `job_timeout` seconds per request batch, so a slow document
+        only fails itself and its batch. `on_result` is called with (index, entry) as soon
+        as each file is settled.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        statuses = [ProcessingStatus() for _ in files]
+        ocr_slots = asyncio.Semaphore(settings.ocr_engine_pool_size)
+        
+        def settle(index: int, result: Dict[str, Any]):
+            results[index] = result
+            if on_result is not None:
+                on_result(index, result)
+        
+        def failure(index: int, e: Exception) -> Dict[str, Any]:
+            return {
+                "success": False,
+                "filename": files[index][0],
+                "status_code": e.status_code if isinstance(e, HTTPException) else 500,
+                "error": e.detail if isinstance(e, HTTPException) else f"Processing failed: {str(e)}"
+            }
+        
+        async def extract(index: int) -> Optional[Dict[str, Any]]:
+            filename, content_type, content = files[index]
+            async with ocr_slots:
+                try:
+                    statuses[index].update("file_validation", 1)
+                    # The OCR deadline stops the worker thread itself, so the slot is only
+                    # released once the OCR work has really ended
+                    return await self.extract_document_text(
+                        content, content_type, filename, statuses[index], self.ocr_deadline()
+                    )
+                except Exception as e:
+                    logger.warning(f"Bulk text extraction failed for {filename}: {e}")
+                    settle(index, failure(index, e))
+                return None
+        
+        documents = await asyncio.gather(*(extract(index) for index in range(len(files))))
+        
+        def finish(index: int, outcome: Any):
+            if isinstance(outcome, HTTPException):
+                outcome = self.rules_fallback(rules[index], outcome) or outcome
+            if isinstance(outcome, Exception) or outcome is None:
+                settle(index, failure(index, outcome or HTTPException(status_code=500, detail="No AI result")))
+                return
+            language, date_format, analysis = outcome
+            filename, content_type, _ = files[index]
+            settle(index, self.build_response(
+                filename, content_type, documents[index], language, date_format, analysis, compaction[index], statuses[index]
+            ))
+        
+        batch, compaction, rules = [], {}, {}
+        for index, document in enumerate(documents):
+            if document is None:
+                continue
+            ai_text, compaction[index] = self.compact_for_ai(document["text"], document["words"])
+            statuses[index].update("language_detection", 3)
+            rules[index] = self.extract_with_rules(document)
+            if self.use_rules(rules[index]):
+                finish(index, (rules[index]["language"], rules[index]["date_format"], rules[index]["analysis"]))
+                continue
+            batch.append({"id": str(index), "text": ai_text, "language_hint": document["ocr_details"].get("language")})
+        
+        if batch:
+            await self.ai_analyzer.analyze_batch_async(
+                batch, timeout=settings.job_timeout,
+                on_result=lambda document_id, outcome: finish(int(document_id), outcome)
+            )
+        
+        return results
+
 # Initialize the extraction service
 try:
     extractor = InvoiceExtractor()
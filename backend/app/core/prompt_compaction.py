@@ -0,0 +1,243 @@
+import re
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Optional: without it token counts are estimated from characters
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Rough characters per token, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+# Lines shorter than this many words are labels ("Total", "Due date") and never count as boilerplate
+BOILERPLATE_MIN_WORDS = 6
+# Boilerplate lines remembered at most; the rarest are forgotten first
+BOILERPLATE_MAX_LINES = 20000
+# Documents whose boilerplate decision is remembered, so the same text always compacts the same way
+BOILERPLATE_MAX_DOCUMENTS = 5000
+# OCR words below this confidence (0-100) count as noise
+NOISE_WORD_CONFIDENCE = 30.0
+
+PAGE_MARKER_PATTERN = re.compile(r"^\s*(page|seite|pagina|página)\s*\d+\s*(/|of|de|von|di)\s*\d+\s*$", re.IGNORECASE)
+INLINE_SPACE_PATTERN = re.compile(r"[ \t ]+")
+AMOUNT_PATTERN = re.compile(r"\d[\d.,]*\d")
+CURRENCY_CODE_PATTERN = re.compile(r"\b(?:usd|eur|gbp|chf|cad|aud|jpy|cny|inr|sek|nok|dkk|pln|czk|huf|mad|tnd|dzd)\b", re.IGNORECASE)
+KEY_LINE_PATTERN = re.compile(
+    r"\d|total|amount|invoice|facture|rechnung|factura|fattura|factuur|fatura|tax|vat|tva|iva|mwst|btw|due|date",
+    re.IGNORECASE
+)
+COMPANY_SUFFIX = re.compile(
+    r"\b(?:inc|llc|ltd|limited|corp|corporation|company|plc|gmbh|ag|kg|sarl|sas|sa|srl|spa|bv|nv|lda|ltda|eurl"
+    r"|s\.a\.|s\.l\.|s\.r\.l\.|s\.p\.a\.|b\.v\.|n\.v\.)(?:\.|\b|$)",
+    re.IGNORECASE
+)
+# Lines naming the parties; recurring vendors and customers repeat them on every invoice
+PARTY_LINE_PATTERN = re.compile(
+    r"bill(?:ed)?\s+to|ship(?:ped)?\s+to|sold\s+to|\bfrom\b|vendor|supplier|customer|client|payment|terms"
+    r"|factur[ée]\s+[àa]|rechnungsempf[äa]nger|lieferant|kunde|proveedor|fornitore|leverancier",
+    re.IGNORECASE
+)
+
+class TokenCounter:
+    """Counts tokens with the model's tokenizer, or estimates them when it cannot be loaded"""
+
+    def __init__(self, model: str):
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"Could not load tokenizer for {model}, estimating token counts: {e}")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+def normalize_lines(text: str) -> List[str]:
+    """Lines with inner whitespace runs collapsed and blank lines dropped"""
+    lines = []
+    for line in text.splitlines():
+        line = INLINE_SPACE_PATTERN.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+    return lines
+
+def has_figure(line: str) -> bool:
+    """Whether a line holds a digit or a currency sign or code; such lines may be amounts"""
+    return (
+        any(char.isdigit() or unicodedata.category(char) == "Sc" for char in line)
+        or CURRENCY_CODE_PATTERN.search(line) is not None
+    )
+
+def is_noise_line(line: str, word_confidences: Optional[List[float]] = None) -> bool:
+    """OCR garbage: mostly punctuation, no real token, or mostly words OCR itself doubted
+
+    Lines holding a number or a currency are never noise, however short.
+    `word_confidences` are the OCR confidences of this line's own words.
+    """
+    if has_figure(line):
+        return False
+    alphanumeric = sum(char.isalnum() for char in line)
+    if alphanumeric < len(line) * 0.5:
+        return True
+    tokens = line.split()
+    if not any(sum(char.isalnum() for char in token) >= 2 for token in tokens):
+        return True
+    if word_confidences and len(word_confidences) >= 2:
+        doubtful = sum(0 <= conf < NOISE_WORD_CONFIDENCE for conf in word_confidences)
+        return doubtful > len(word_confidences) / 2
+    return False
+
+def line_confidences(words: List[Dict[str, Any]]) -> Dict[str, List[List[float]]]:
+    """Word confidences per OCR line, keyed by the line's normalized text
+
+    Lines that repeat keep one entry each, in reading order.
+    """
+    lines: Dict[str, List[List[float]]] = {}
+    texts: List[str] = []
+    confidences: List[float] = []
+    current = None
+    for word in words + [None]:
+        key = None if word is None else (word.get("page"), word.get("block"), word.get("par"), word.get("line"))
+        if texts and (word is None or key != current):
+            text = INLINE_SPACE_PATTERN.sub(" ", " ".join(texts)).strip()
+            lines.setdefault(text, []).append(confidences)
+            texts, confidences = [], []
+        if word is None:
+            break
+        current = key
+        texts.append(str(word["text"]))
+        confidences.append(float(word.get("conf", -1)))
+    return lines
+
+class PromptCompactor:
+    """Shrinks document text before it is sent to the AI
+
+    Collapses whitespace, drops OCR noise lines and page markers, removes
+    figure-free, sentence-long lines (terms and conditions, footers) already
+    seen in `boilerplate_min_documents` distinct earlier documents, and
+    finally trims lines without figures or invoice terms, then the tail,
+    until the text fits `token_budget`.
+    """
+
+    def __init__(self, model: str, token_budget: int, boilerplate_min_documents: int):
+        self.token_budget = token_budget
+        self.boilerplate_min_documents = boilerplate_min_documents
+        self.tokens = TokenCounter(model)
+        self._lock = threading.Lock()
+        self._line_documents: Counter = Counter()
+        self._documents: "OrderedDict[str, frozenset]" = OrderedDict()
+
+    @staticmethod
+    def _boilerplate_keys(lines: List[str]) -> List[Optional[str]]:
+        """Keys of the lines that may be dropped as boilerplate; None for lines that must always be kept
+        
+        Only figure-free prose qualifies: anything with digits or invoice terms
+        (KEY_LINE_PATTERN), company names or party and payment labels carries
+        data even when it repeats on every invoice from a vendor.
+        """
+        keys = []
+        for line in lines:
+            if (len(line.split()) < BOILERPLATE_MIN_WORDS or KEY_LINE_PATTERN.search(line)
+                    or COMPANY_SUFFIX.search(line) or PARTY_LINE_PATTERN.search(line)):
+                keys.append(None)
+            else:
+                keys.append(line.lower())
+        return keys
+
+    def _observe(self, lines: List[str], keys: List[Optional[str]]) -> frozenset:
+        """Boilerplate lines of this document, counting each distinct document once
+        
+        A document seen before gets the decision it got the first time, so
+        re-uploads compact (and hash into the AI response cache) identically.
+        """
+        digest = hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+        unique = {key for key in keys if key is not None}
+        with self._lock:
+            if digest in self._documents:
+                self._documents.move_to_end(digest)
+                return self._documents[digest]
+            boilerplate = frozenset(key for key in unique if self._line_documents[key] >= self.boilerplate_min_documents)
+            self._line_documents.update(unique)
+            if len(self._line_documents) > BOILERPLATE_MAX_LINES:
+                self._line_documents = Counter(dict(self._line_documents.most_common(BOILERPLATE_MAX_LINES // 2)))
+            self._documents[digest] = boilerplate
+            if len(self._documents) > BOILERPLATE_MAX_DOCUMENTS:
+                self._documents.popitem(last=False)
+        return boilerplate
+
+    def _fit(self, lines: List[str]) -> Tuple[List[str], int]:
+        """Drop lines until the joined text fits the budget; returns (lines, lines dropped)"""
+        counts = [self.tokens.count(line) + 1 for line in lines]
+        total = sum(counts)
+        if total <= self.token_budget:
+            return lines, 0
+
+        keep = [True] * len(lines)
+        # Lines without figures or invoice terms go first, from the end of the document
+        for index in reversed(range(len(lines))):
+            if total <= self.token_budget:
+                break
+            if not KEY_LINE_PATTERN.search(lines[index]):
+                keep[index] = False
+                total -= counts[index]
+        # Still too long: cut the tail
+        for index in reversed(range(len(lines))):
+            if total <= self.token_budget:
+                break
+            if keep[index]:
+                keep[index] = False
+                total -= counts[index]
+
+        kept = [line for line, keep_line in zip(lines, keep) if keep_line]
+        return kept, len(lines) - len(kept)
+
+    def compact(self, text: str, words: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, Dict[str, Any]]:
+        """Compacted text and a report with token counts before and after
+
+        `words` are OCR word boxes with confidences, when available; lines made
+        mostly of words OCR doubted on that very line are dropped as noise.
+        """
+        confidences = line_confidences(words) if words else {}
+
+        lines = normalize_lines(text)
+        keys = self._boilerplate_keys(lines)
+        boilerplate = self._observe(lines, keys)
+
+        kept, noise, markers, repeated = [], 0, 0, 0
+        for line, key in zip(lines, keys):
+            if PAGE_MARKER_PATTERN.match(line):
+                markers += 1
+            elif key is not None and key in boilerplate:
+                repeated += 1
+            elif is_noise_line(line, confidences[line].pop(0) if confidences.get(line) else None):
+                noise += 1
+            else:
+                kept.append(line)
+
+        kept, trimmed = self._fit(kept)
+        compacted = "\n".join(kept)
+
+        report = {
+            "tokens_before": self.tokens.count(text),
+            "tokens_after": self.tokens.count(compacted),
+            "token_budget": self.token_budget,
+            "lines_removed": {
+                "noise": noise,
+                "page_markers": markers,
+                "boilerplate": repeated,
+                "over_budget": trimmed,
+            },
+        }
+        logger.info(f"Prompt compaction: {report['tokens_before']} -> {report['tokens_after']} tokens")
+        return compacted, report
@@ -0,0 +1,567 @@
+import re
+import logging
+from datetime import date
+from statistics import median
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core.locale_detector import detect_locale
+from app.core.prompt_compaction import COMPANY_SUFFIX, normalize_lines
+from app.core.validator import BusinessValidator, DATE_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Numbers with optional thousands separators and up to two decimals; never part of a date, time, code or percentage
+NUMBER = r"\d{1,3}(?:[,.'  ]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d{1,2})?"
+AMOUNT_PATTERN = re.compile(rf"(?<![\w.,/:\-])-?(?:{NUMBER})(?![\w%/:]|[.,\-]\d)")
+
+CURRENCY_PATTERN = re.compile(r"R\$|US\$|\$|€|£|¥|\b(?:USD|EUR|GBP|CHF|BRL|CAD|AUD|JPY)\b")
+CURRENCY_CODES = {"R$": "BRL", "US$": "USD", "$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY"}
+
+# Money labels; a line counts for the first kind that matches, in this order
+STRONG_TOTAL_LABEL = re.compile(
+    r"grand\s+total|total\s+(?:amount\s+)?due|amount\s+due|balance\s+due|total\s+to\s+pay|amount\s+payable"
+    r"|total\s*\(?incl\.?(?:uding)?|total\s+ttc|montant\s+ttc|net\s+[àa]\s+payer|total\s+[àa]\s+payer"
+    r"|gesamtbetrag|rechnungsbetrag|endbetrag|zu\s+zahlen|inkl\.?\s*mwst|total\s+a\s+pagar|importe\s+total"
+    r"|totale\s+(?:da\s+pagare|fattura|documento)|te\s+betalen|totaal\s+bedrag|valor\s+total",
+    re.IGNORECASE
+)
+SUBTOTAL_LABEL = re.compile(
+    r"sub[\s-]?total|total\s+(?:ht|hors\s+taxes?|hors\s+tva|net|excl\.?(?:uding)?|before\s+tax)|montant\s+ht"
+    r"|net\s+amount|amount\s+before\s+tax|zwischensumme|nettobetrag|summe\s+netto|\bnetto\b|base\s+imponible"
+    r"|subtotale|imponibile|subtotaal|totaal\s+excl|valor\s+l[ií]quido",
+    re.IGNORECASE
+)
+TAX_LABEL = re.compile(
+    r"sales\s+tax|\bvat\b|\btax(?:es)?\b|\btva\b|\bmwst\b|\bust\b|umsatzsteuer|\biva\b|\bbtw\b|\bgst\b|\bhst\b"
+    r"|\bimpuestos?\b|\bimposta\b",
+    re.IGNORECASE
+)
+# Tax registration numbers look like tax lines but carry no amount
+TAX_ID_LABEL = re.compile(
+    r"(?:vat|tax|tva|btw|iva|ust|gst)[\s-]*(?:id\b|no\b|number|reg|nr\b|n°|intra)|steuernummer|siret|siren|\bein\b",
+    re.IGNORECASE
+)
+TOTAL_LABEL = re.compile(r"(?<!sub )(?<!sub-)\btotal\b|\btotaal\b|\btotale\b|\bsumme\b|\bgesamt\b|\bmontant\b", re.IGNORECASE)
+
+INVOICE_NUMBER_LABEL = re.compile(
+    r"(?:invoice|inv|receipt|bill)\.?\s*(?:no\b\.?|number|num\b\.?|nr\b\.?|#|id\b)\s*:?|(?:invoice|receipt)\s*:"
+    r"|facture\s*(?:n\s?[°o.º]|num[ée]ro)\s*:?|n[°º]\s*de\s*facture|rechnungs?\s*-?\s*(?:nr\b\.?|nummer|no\b\.?)\s*:?"
+    r"|factura\s*(?:n\s?[°º.o]|n[uú]mero)\s*:?|n[uú]mero\s+de\s+factura|fattura\s*(?:n\s?[°.º]?|numero)\s*:?"
+    r"|numero\s+fattura|factuur\s*(?:nr\b\.?|nummer)\s*:?|factuurnummer|fatura\s*(?:n\s?[°º.o]|n[uú]mero)\s*:?",
+    re.IGNORECASE
+)
+INVOICE_NUMBER_VALUE = re.compile(r"[#:\s]*([A-Z0-9][A-Z0-9\-/_.]*[A-Z0-9])", re.IGNORECASE)
+
+DUE_DATE_LABEL = re.compile(
+    r"due\s+(?:date|on|by)|payment\s+due|pay\s+by|[ée]ch[ée]ance|f[äa]llig|zahlbar\s+bis|vencimiento"
+    r"|scadenza|vervaldatum|uiterste\s+betaaldatum|vencimento",
+    re.IGNORECASE
+)
+INVOICE_DATE_LABEL = re.compile(
+    r"invoice\s+date|date\s+of\s+issue|issue\s+date|issued(?:\s+on)?|date\s+de\s+(?:la\s+)?facture"
+    r"|date\s+d['’][ée]mission|rechnungsdatum|ausstellungsdatum|fecha\s+(?:de\s+)?(?:la\s+)?factura"
+    r"|fecha\s+de\s+emisi[oó]n|data\s+(?:della\s+)?fattura|data\s+di\s+emissione|factuurdatum"
+    r"|data\s+(?:da\s+)?(?:fatura|emiss[ãa]o)",
+    re.IGNORECASE
+)
+GENERIC_DATE_LABEL = re.compile(r"\bdate\b|\bdatum\b|\bfecha\b|\bdata\b", re.IGNORECASE)
+
+VENDOR_LABEL = re.compile(
+    r"^(?:from|vendor|supplier|seller|sold\s+by|issued\s+by|fournisseur|vendeur|lieferant|verk[äa]ufer"
+    r"|proveedor|fornitore|leverancier|fornecedor)\s*:\s*(.+)$",
+    re.IGNORECASE
+)
+CUSTOMER_LABEL = re.compile(
+    r"bill(?:ed)?\s+to|ship(?:ped)?\s+to|sold\s+to|invoiced?\s+to|^to\s*:|\battn\b|\bcustomer\b|\bclient\b"
+    r"|factur[ée]\s+[àa]|rechnungsempf[äa]nger|\bkunde\b|\bcliente\b|\bklant\b",
+    re.IGNORECASE
+)
+TITLE_WORDS = re.compile(
+    r"^(?:tax\s+)?(?:invoice|receipt|bill|facture|rechnung|factura|fattura|factuur|fatura|quittung|recibo|ricevuta)\b",
+    re.IGNORECASE
+)
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_LABEL = re.compile(r"\b(?:t[ée]l(?:[ée]?f[oe]no?)?|phone|ph|fon|telefon|telefoon|telefone|mobile?)\b\.?\s*:?\s*(\+?\d[\d\s().-]{6,}\d)", re.IGNORECASE)
+PHONE_PATTERN = re.compile(r"(?:\+\d{1,3}[\s.-]?)?\(?\d{2,4}\)?[\s.-]?\d{3}[\s.-]?\d{3,4}\b")
+
+MONTHS = {
+    1: "january jan janvier janv januar jänner enero gennaio januari janeiro",
+    2: "february feb février fevrier févr fevr februar febrero febbraio februari fevereiro",
+    3: "march mar mars märz maerz marzo maart março marco",
+    4: "april apr avril avr abril aprile",
+    5: "may mai mayo maggio mei maio",
+    6: "june jun juin juni junio giugno junho",
+    7: "july jul juillet juil juli julio luglio julho",
+    8: "august aug août aout agosto augustus",
+    9: "september sep sept septembre septiembre setiembre settembre setembro",
+    10: "october oct octobre oktober okt octubre ottobre outubro",
+    11: "november nov novembre noviembre novembro",
+    12: "december dec décembre decembre déc dezember dez diciembre dicembre dezembro",
+}
+MONTH_NUMBERS = {name: number for number, names in MONTHS.items() for name in names.split()}
+MONTH_NAME = "|".join(sorted((re.escape(name) for name in MONTH_NUMBERS), key=len, reverse=True))
+DAY_MONTH_YEAR = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th|er|º)?\.?\s+(?:de\s+)?({MONTH_NAME})\.?,?\s+(?:de\s+)?(\d{{4}})\b", re.IGNORECASE)
+MONTH_DAY_YEAR = re.compile(rf"\b({MONTH_NAME})\.?\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})\b", re.IGNORECASE)
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+
+IMMEDIATE_PAYMENT = re.compile(
+    r"due\s+(?:up)?on\s+receipt|payable\s+immediately|[àa]\s+r[ée]ception|sofort\s+f[äa]llig|ohne\s+abzug\s+sofort",
+    re.IGNORECASE
+)
+RECEIPT_WORDS = re.compile(r"\breceipt\b|\bquittung\b|\bkassenbon\b|\brecibo\b|\bricevuta\b|\bre[çc]u\b|\bkassabon\b", re.IGNORECASE)
+INVOICE_WORDS = re.compile(r"\binvoice\b|\bfacture\b|\brechnung\b|\bfactura\b|\bfattura\b|\bfactuur\b|\bfatura\b", re.IGNORECASE)
+BILL_WORDS = re.compile(r"\bbill\b|\bstatement\b", re.IGNORECASE)
+
+SPENDING_CATEGORIES = [
+    ("software", re.compile(r"licen[cs]e|subscription|saas|software|hosting|cloud|abonnement|lizenz", re.IGNORECASE)),
+    ("utilities", re.compile(r"electricity|water|\bgas\b|internet|broadband|telecom|mobile\s+plan|strom|[ée]lectricit[ée]|energ", re.IGNORECASE)),
+    ("supplies", re.compile(r"supplies|toner|paper|stationery|fournitures|b[üu]robedarf|material", re.IGNORECASE)),
+    ("services", re.compile(r"consult|services?\b|hours|labou?r|maintenance|conseil|beratung|dienstleistung|prestation", re.IGNORECASE)),
+]
+
+# Base confidence by where a value was found
+CONFIDENCE_LABEL_SAME_LINE = 0.95
+CONFIDENCE_LABEL_NEXT_LINE = 0.85
+# The only company name in the header, outside any customer block
+CONFIDENCE_COMPANY_NAME = 0.85
+CONFIDENCE_UNLABELED = 0.5
+
+date_parser = BusinessValidator()
+
+def parse_amount(number: str) -> Optional[float]:
+    """Float value of "1,234.56", "1.234,56", "1 234,56" or "1234"; the last separator followed by 1-2 digits is the decimal point"""
+    number = re.sub(r"[\s' ]", "", number)
+    negative = number.startswith("-")
+    number = number.lstrip("-")
+    separators = [i for i, char in enumerate(number) if char in ",."]
+    if separators:
+        last = separators[-1]
+        decimals = number[last + 1:]
+        if len(decimals) in (1, 2) and (len(separators) == 1 or number[last] != number[separators[-2]]):
+            number = re.sub(r"[,.]", "", number[:last]) + "." + decimals
+        else:
+            number = re.sub(r"[,.]", "", number)
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+def find_amounts(line: str, start: int = 0) -> List[Tuple[float, bool]]:
+    """(value, has decimals) for each amount in the line from `start`"""
+    amounts = []
+    for match in AMOUNT_PATTERN.finditer(line, start):
+        value = parse_amount(match.group())
+        if value is not None:
+            amounts.append((value, bool(re.search(r"[.,]\d{1,2}$", match.group()))))
+    return amounts
+
+def find_currency(line: str) -> Optional[str]:
+    match = CURRENCY_PATTERN.search(line)
+    if not match:
+        return None
+    return CURRENCY_CODES.get(match.group(), match.group().upper())
+
+def find_dates(line: str, date_format: str, language: str, start: int = 0) -> List[Tuple[str, float]]:
+    """(YYYY-MM-DD, confidence) for each date in the line from `start`, in order"""
+    found = []
+    for pattern, order in ((ISO_DATE, "ymd"), (DAY_MONTH_YEAR, "dmy"), (MONTH_DAY_YEAR, "mdy")):
+        for match in pattern.finditer(line, start):
+            parts = match.groups()
+            try:
+                if order == "ymd":
+                    year, month, day = int(parts[0]), int(parts[1]), int(parts[2])
+                elif order == "dmy":
+                    year, month, day = int(parts[2]), MONTH_NUMBERS[parts[1].lower()], int(parts[0])
+                else:
+                    year, month, day = int(parts[2]), MONTH_NUMBERS[parts[0].lower()], int(parts[1])
+                found.append((match.start(), date(year, month, day).isoformat(), 1.0))
+            except (KeyError, ValueError):
+                continue
+
+    taken = [position for position, _, _ in found]
+    for match in DATE_PATTERN.finditer(line, start):
+        if match.start() in taken or ISO_DATE.match(match.group()):
+            continue
+        parts = [int(part) for part in re.split(r"[/\-\.]", match.group())]
+        parsed = date_parser.parse_date_intelligently(match.group(), date_format, language)
+        if parsed:
+            # Day and month can only be told apart by the locale unless one of them is over 12
+            unambiguous = len(str(parts[0])) == 4 or parts[0] > 12 or parts[1] > 12 or parts[0] == parts[1]
+            found.append((match.start(), parsed, 1.0 if unambiguous else 0.85))
+
+    return [(value, confidence) for _, value, confidence in sorted(found)]
+
+def layout_rows(words: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+    """Text and mean OCR confidence (0-1) of each visual row of OCR words
+
+    Rows join words at the same height even across layout blocks, so a label
+    in the left column and its amount in the right one end up on one line.
+    """
+    words = [word for word in words if word.get("text", "").strip()]
+    if not words:
+        return []
+    height = median(word["height"] for word in words) or 1
+
+    rows: List[List[Dict[str, Any]]] = []
+    for word in sorted(words, key=lambda w: w["top"] + w["height"] / 2):
+        center = word["top"] + word["height"] / 2
+        if rows:
+            row = rows[-1]
+            row_center = sum(w["top"] + w["height"] / 2 for w in row) / len(row)
+            if abs(center - row_center) <= height / 2:
+                row.append(word)
+                continue
+        rows.append([word])
+
+    result = []
+    for row in rows:
+        row.sort(key=lambda w: w["left"])
+        confidences = [w["conf"] for w in row if w.get("conf", -1) >= 0]
+        confidence = sum(confidences) / len(confidences) / 100 if confidences else 1.0
+        result.append((" ".join(w["text"] for w in row), confidence))
+    return result
+
+class RuleBasedExtractor:
+    """Extracts invoice fields with regexes and layout heuristics, without any AI call
+
+    Produces the same analysis layout as the AI with a 0-1 confidence per field.
+    Values found next to a label score highest, values on the line below a
+    label less, guesses without a label least. Subtotal + tax matching the
+    total, and line items adding up to it, raise the confidence of those
+    fields. A result is sufficient when every required field was found with at
+    least `min_confidence`; otherwise the AI should be asked.
+    """
+
+    def __init__(self, required_fields: List[str], min_confidence: float):
+        self.required_fields = required_fields
+        self.min_confidence = min_confidence
+
+    @staticmethod
+    def _classify_money_line(line: str) -> Optional[Tuple[str, float, int]]:
+        """(field, label strength, end of label) for a line labelling a total, subtotal or tax amount"""
+        for field, pattern, strength in (
+            ("total_amount", STRONG_TOTAL_LABEL, 1.0),
+            ("subtotal", SUBTOTAL_LABEL, 1.0),
+            ("tax_amount", TAX_LABEL, 0.95),
+            ("total_amount", TOTAL_LABEL, 0.9),
+        ):
+            match = pattern.search(line)
+            if match:
+                if field == "tax_amount" and TAX_ID_LABEL.search(line):
+                    return None
+                return field, strength, match.end()
+        return None
+
+    def _money_fields(self, lines: List[Tuple[str, float]]) -> Tuple[Dict[str, Tuple[float, float]], Optional[Tuple[str, float]], int]:
+        """Best (value, confidence) per money field, the currency and the index of the first summary line"""
+        best: Dict[str, Tuple[float, float, int]] = {}
+        currency = None
+        first_summary = len(lines)
+        for index, (line, ocr_factor) in enumerate(lines):
+            classified = self._classify_money_line(line)
+            if classified is None:
+                continue
+            field, strength, label_end = classified
+            amounts = find_amounts(line, label_end)
+            confidence = CONFIDENCE_LABEL_SAME_LINE
+            if not amounts and index + 1 < len(lines):
+                # Label on its own line, value alone on the next
+                following = lines[index + 1][0]
+                amounts = find_amounts(following)
+                if len(amounts) != 1 or AMOUNT_PATTERN.sub("", CURRENCY_PATTERN.sub("", following)).strip(" :"):
+                    amounts = []
+                confidence = CONFIDENCE_LABEL_NEXT_LINE
+            if not amounts:
+                continue
+            first_summary = min(first_summary, index)
+            # Rates and quantities come before the amount ("VAT 20%: 40.00"); the amount is last
+            value, has_decimals = amounts[-1]
+            confidence *= strength * min(1.0, 0.5 + ocr_factor / 2) * (1.0 if has_decimals else 0.9)
+            # Later lines win ties: the grand total follows any intermediate totals
+            if field not in best or confidence >= best[field][1]:
+                best[field] = (value, confidence, index)
+            if field == "total_amount" and find_currency(line):
+                currency = (find_currency(line), 0.95)
+        return {field: (value, confidence) for field, (value, confidence, _) in best.items()}, currency, first_summary
+
+    @staticmethod
+    def _invoice_number(lines: List[Tuple[str, float]]) -> Optional[Tuple[str, float]]:
+        for index, (line, ocr_factor) in enumerate(lines):
+            match = INVOICE_NUMBER_LABEL.search(line)
+            if not match:
+                continue
+            for candidate, confidence in ((line[match.end():], CONFIDENCE_LABEL_SAME_LINE),
+                                          (lines[index + 1][0] if index + 1 < len(lines) else "", CONFIDENCE_LABEL_NEXT_LINE)):
+                value = INVOICE_NUMBER_VALUE.match(candidate)
+                if value and any(char.isdigit() for char in value.group(1)) and not DATE_PATTERN.fullmatch(value.group(1)):
+                    return value.group(1), confidence * min(1.0, 0.5 + ocr_factor / 2)
+        return None
+
+    @staticmethod
+    def _dates(lines: List[Tuple[str, float]], date_format: str, language: str,
+               locale_confidence: float) -> Dict[str, Tuple[str, float]]:
+        found: Dict[str, Tuple[str, float]] = {}
+        unlabeled: List[Tuple[str, float]] = []
+        for index, (line, ocr_factor) in enumerate(lines):
+            for field, pattern, strength in (("due_date", DUE_DATE_LABEL, 1.0),
+                                             ("invoice_date", INVOICE_DATE_LABEL, 1.0),
+                                             ("invoice_date", GENERIC_DATE_LABEL, 0.9)):
+                match = pattern.search(line)
+                if not match:
+                    continue
+                dates = find_dates(line, date_format, language, match.end())
+                confidence = CONFIDENCE_LABEL_SAME_LINE
+                if not dates and index + 1 < len(lines):
+                    dates = find_dates(lines[index + 1][0], date_format, language)
+                    confidence = CONFIDENCE_LABEL_NEXT_LINE
+                if dates:
+                    value, certainty = dates[0]
+                    if certainty < 1.0:
+                        # Ambiguous day/month order rests on the detected locale
+                        certainty = max(certainty * locale_confidence, 0.5)
+                    confidence *= strength * certainty * min(1.0, 0.5 + ocr_factor / 2)
+                    if field not in found or confidence > found[field][1]:
+                        found[field] = (value, confidence)
+                break
+            else:
+                unlabeled.extend(find_dates(line, date_format, language))
+
+        if "invoice_date" not in found and unlabeled:
+            # The first date on an invoice is usually its issue date
+            found["invoice_date"] = (unlabeled[0][0], CONFIDENCE_UNLABELED)
+        if "invoice_date" in found and "due_date" in found and found["due_date"][0] < found["invoice_date"][0]:
+            found["due_date"] = (found["due_date"][0], found["due_date"][1] * 0.5)
+        return found
+
+    @staticmethod
+    def _vendor(lines: List[str]) -> Optional[Tuple[str, float]]:
+        header = lines[:15]
+        for line in header:
+            labelled = VENDOR_LABEL.match(line)
+            if labelled:
+                return labelled.group(1).strip(), CONFIDENCE_LABEL_SAME_LINE
+        customer_until = -1
+        candidates = []
+        for index, line in enumerate(header):
+            if CUSTOMER_LABEL.search(line):
+                # The few lines after "Bill to" name the customer
+                customer_until = index + 3
+                continue
+            if index > customer_until:
+                candidates.append((index, line))
+        companies = []
+        for _, line in candidates:
+            if COMPANY_SUFFIX.search(line) and len(line.split()) <= 8 and not any(char.isdigit() for char in line):
+                companies.append(line.strip(" :"))
+        if companies:
+            # With a second company named (an unlabelled customer, a parent company) the first is only a guess
+            distinct = {re.sub(r"\W", "", company.lower()) for company in companies}
+            return companies[0], CONFIDENCE_COMPANY_NAME if len(distinct) == 1 else CONFIDENCE_UNLABELED
+        for index, line in candidates:
+            if index >= 5:
+                break
+            if (TITLE_WORDS.match(line) or EMAIL_PATTERN.search(line)
+                    or sum(char.isalpha() for char in line) < len(line) * 0.6):
+                continue
+            return line, CONFIDENCE_UNLABELED
+        return None
+
+    @staticmethod
+    def _contact(text: str, lines: List[str]) -> Optional[Tuple[str, float]]:
+        email = EMAIL_PATTERN.search(text)
+        if email:
+            return email.group(), 0.9
+        for line in lines:
+            phone = PHONE_LABEL.search(line)
+            if phone:
+                return phone.group(1).strip(), 0.85
+        for line in lines:
+            phone = PHONE_PATTERN.search(line)
+            if phone and not TAX_ID_LABEL.search(line):
+                return phone.group().strip(), 0.6
+        return None
+
+    @staticmethod
+    def _line_items(lines: List[str], first_summary: int) -> List[Dict[str, Any]]:
+        """Items from lines above the totals that start with a description and end with an amount"""
+        items = []
+        for line in lines[:first_summary]:
+            if not line[:1].isalpha() or not re.search(r"[.,]\d{2}\s*\S{0,3}$", line):
+                continue
+            if (INVOICE_NUMBER_LABEL.search(line) or DUE_DATE_LABEL.search(line) or INVOICE_DATE_LABEL.search(line)
+                    or TAX_ID_LABEL.search(line) or CUSTOMER_LABEL.search(line) or DATE_PATTERN.search(line)):
+                continue
+            numbers = list(AMOUNT_PATTERN.finditer(line))
+            if not numbers:
+                continue
+            # Trailing run of numbers: [quantity] [unit price] amount
+            trailing = [numbers[-1]]
+            for match in reversed(numbers[:-1]):
+                between = line[match.end():trailing[0].start()]
+                if CURRENCY_PATTERN.sub("", between).strip(" x×@"):
+                    break
+                trailing.insert(0, match)
+            description = CURRENCY_PATTERN.sub("", line[:trailing[0].start()]).strip(" :-")
+            if sum(char.isalpha() for char in description) < 2:
+                continue
+            values = [parse_amount(match.group()) for match in trailing]
+            item = {"description": description, "amount": values[-1], "quantity": None}
+            if len(values) >= 3 and abs(values[-3] * values[-2] - values[-1]) <= 0.02:
+                item["quantity"] = values[-3]
+            elif len(values) == 2 and not re.search(r"[.,]\d{1,2}$", trailing[0].group()):
+                item["quantity"] = values[0]
+            items.append(item)
+        return items
+
+    @staticmethod
+    def _document_type(text: str) -> str:
+        if RECEIPT_WORDS.search(text):
+            return "receipt"
+        if INVOICE_WORDS.search(text):
+            return "invoice"
+        if BILL_WORDS.search(text):
+            return "bill"
+        return "other"
+
+    @staticmethod
+    def _text_quality(ocr_confidence: float) -> str:
+        if ocr_confidence >= 0.9:
+            return "excellent"
+        if ocr_confidence >= 0.75:
+            return "good"
+        if ocr_confidence >= 0.5:
+            return "fair"
+        return "poor"
+
+    def extract(self, text: str, words: Optional[List[Dict[str, Any]]] = None,
+                ocr_confidence: float = 1.0) -> Dict[str, Any]:
+        """Rule-based analysis of a document
+
+        Returns {"language", "date_format", "analysis", "field_confidence",
+        "missing", "uncertain", "sufficient"}; `words` are OCR word boxes, when
+        available, used to pair labels with values in other layout columns.
+        """
+        language, date_format, locale_confidence = detect_locale(text)
+        text_lines = normalize_lines(text)
+        # Text lines first; rows rebuilt from word boxes catch labels whose values sit in another column
+        lines = [(line, ocr_confidence) for line in text_lines] + layout_rows(words or [])
+
+        money, currency, first_summary = self._money_fields(lines)
+        # Items are read from the text lines above the first total, subtotal or tax line
+        first_summary = min(first_summary, len(text_lines))
+        invoice_number = self._invoice_number(lines)
+        dates = self._dates(lines, date_format, language, locale_confidence)
+        vendor = self._vendor(text_lines)
+        contact = self._contact(text, text_lines)
+        line_items = self._line_items(text_lines, first_summary)
+
+        if currency is None:
+            codes = [find_currency(line) for line in text_lines]
+            codes = [code for code in codes if code]
+            if codes:
+                currency = (max(set(codes), key=codes.count), 0.8)
+
+        # Cross-checks between amounts
+        subtotal, tax, total = money.get("subtotal"), money.get("tax_amount"), money.get("total_amount")
+        if subtotal and tax and total:
+            if abs(subtotal[0] + tax[0] - total[0]) <= 0.02:
+                money = {field: (value, max(confidence, 0.97)) for field, (value, confidence) in money.items()}
+            else:
+                # Discounts or shipping may explain it, but one of the three may be misread
+                money["total_amount"] = (total[0], total[1] * 0.8)
+        elif subtotal and tax and not total:
+            money["total_amount"] = (round(subtotal[0] + tax[0], 2), 0.6)
+        elif subtotal and total and not tax and total[0] >= subtotal[0]:
+            money["tax_amount"] = (round(total[0] - subtotal[0], 2), 0.6)
+
+        item_confidence = 0.6 if line_items else 0.0
+        items_total = round(sum(item["amount"] or 0 for item in line_items), 2)
+        target = money.get("subtotal") or money.get("total_amount")
+        if line_items and target and abs(items_total - target[0]) <= 0.02:
+            item_confidence = 0.9
+
+        field_values: Dict[str, Tuple[Any, float]] = {
+            "vendor_name": vendor,
+            "contact_info": contact,
+            "total_amount": money.get("total_amount"),
+            "currency": currency,
+            "tax_amount": money.get("tax_amount"),
+            "subtotal": money.get("subtotal"),
+            "invoice_number": invoice_number,
+            "invoice_date": dates.get("invoice_date"),
+            "due_date": dates.get("due_date"),
+        }
+        value = {field: found[0] if found else None for field, found in field_values.items()}
+        field_confidence = {field: round(found[1], 3) if found else 0.0 for field, found in field_values.items()}
+        field_confidence["line_items"] = item_confidence
+
+        required = [field_confidence.get(field, 0.0) for field in self.required_fields]
+        overall_confidence = round(sum(required) / len(required), 3) if required else 0.0
+        found_required = sum(confidence > 0 for confidence in required)
+
+        payment_urgency = "standard"
+        if IMMEDIATE_PAYMENT.search(text):
+            payment_urgency = "immediate"
+        elif value["invoice_date"] and value["due_date"]:
+            days = (date.fromisoformat(value["due_date"]) - date.fromisoformat(value["invoice_date"])).days
+            payment_urgency = "immediate" if days <= 7 else "flexible" if days > 45 else "standard"
+
+        category_text = " ".join(item["description"] for item in line_items) or text
+        spending_category = next(
+            (category for category, pattern in SPENDING_CATEGORIES if pattern.search(category_text)), "other"
+        )
+
+        analysis = {
+            "vendor_info": {
+                "vendor_name": value["vendor_name"],
+                "contact_info": value["contact_info"],
+            },
+            "financial_data": {
+                "total_amount": value["total_amount"],
+                "currency": value["currency"],
+                "tax_amount": value["tax_amount"],
+                "subtotal": value["subtotal"],
+            },
+            "document_details": {
+                "invoice_number": value["invoice_number"],
+                "invoice_date": value["invoice_date"],
+                "due_date": value["due_date"],
+            },
+            "line_items": line_items,
+            "document_analysis": {
+                "document_type": self._document_type(text),
+                "detected_language": language,
+                "text_quality": self._text_quality(ocr_confidence),
+                "overall_confidence": overall_confidence,
+                "extraction_method": "rules",
+            },
+            "business_insights": {
+                "spending_category": spending_category,
+                "payment_urgency": payment_urgency,
+                "data_completeness": (
+                    "complete" if found_required == len(required)
+                    else "partial" if found_required * 2 >= len(required) else "minimal"
+                ),
+            },
+            "field_confidence": field_confidence,
+        }
+
+        missing = [field for field in self.required_fields if not field_confidence.get(field)]
+        uncertain = [
+            field for field in self.required_fields
+            if field not in missing and field_confidence[field] < self.min_confidence
+        ]
+        logger.info(
+            f"Rule extraction: confidence {overall_confidence:.2f}, missing {missing or 'none'}, "
+            f"uncertain {uncertain or 'none'}"
+        )
+        return {
+            "language": language,
+            "date_format": date_format,
+            "analysis": analysis,
+            "field_confidence": field_confidence,
+            "missing": missing,
+            "uncertain": uncertain,
+            "sufficient": not missing and not uncertain,
+        }
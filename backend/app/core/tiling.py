@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+import logging
+from typing import Dict, Any, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Gutter search and blank-tile detection run on a copy no larger than this on its longest side
+TILING_MAX_SIDE = 2000
+# How far (as a fraction of the tile size) a cut may move to land on a whitespace gutter
+GUTTER_SEARCH_FRACTION = 0.25
+# Tiles with less ink than this fraction are blank and never reach Tesseract
+MIN_TILE_INK = 0.001
+
+class Tile(NamedTuple):
+    # Region that is cropped and OCR'd, including the overlap
+    left: int
+    top: int
+    right: int
+    bottom: int
+    # Region whose words this tile owns; cores partition the page exactly
+    core_left: int
+    core_top: int
+    core_right: int
+    core_bottom: int
+
+def _cut_positions(profile: np.ndarray, length: int, tile_size: int, scale: float) -> List[int]:
+    """Cut positions along one axis, each moved to the emptiest row/column near its nominal spot"""
+    cuts = [0]
+    count = max(1, int(round(length / tile_size)))
+    step = length / count
+    window = int(tile_size * GUTTER_SEARCH_FRACTION)
+
+    for i in range(1, count):
+        nominal = int(i * step)
+        low = max(cuts[-1] + tile_size // 2, nominal - window)
+        high = min(length - tile_size // 2, nominal + window)
+        if high <= low:
+            cuts.append(nominal)
+            continue
+        # Profile is measured on the downsampled copy; prefer the centre of the widest empty stretch
+        segment = profile[int(low * scale):max(int(low * scale) + 1, int(high * scale))]
+        quiet = np.flatnonzero(segment == segment.min())
+        best = quiet[len(quiet) // 2]
+        cuts.append(int(low + best / scale))
+
+    cuts.append(length)
+    return cuts
+
+def plan_tiles(gray: np.ndarray, tile_size: int, overlap: int) -> List[Tile]:
+    """Split a page into roughly tile_size tiles whose cuts follow whitespace gutters
+
+    Each tile is extended by `overlap` pixels on every side, so a word crossing
+    a cut is still seen whole by the tile that owns its centre. Tiles without
+    ink are left out.
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, TILING_MAX_SIDE / max(height, width))
+    small = gray
+    if scale < 1.0:
+        small = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    rows = _cut_positions(ink.sum(axis=1), height, tile_size, scale)
+    columns = _cut_positions(ink.sum(axis=0), width, tile_size, scale)
+
+    tiles = []
+    for top, bottom in zip(rows, rows[1:]):
+        for left, right in zip(columns, columns[1:]):
+            region = ink[int(top * scale):max(int(top * scale) + 1, int(bottom * scale)),
+                         int(left * scale):max(int(left * scale) + 1, int(right * scale))]
+            if region.mean() < MIN_TILE_INK:
+                continue
+            tiles.append(Tile(
+                max(0, left - overlap), max(0, top - overlap),
+                min(width, right + overlap), min(height, bottom + overlap),
+                left, top, right, bottom
+            ))
+
+    return tiles
+
+def owned_words(tile: Tile, words: List[Dict[str, Any]], scale: float) -> List[Dict[str, Any]]:
+    """Map a tile's word boxes into page coordinates, keeping only words centred in its core
+
+    `scale` is the resampling preprocessing applied to the tile crop. Words in
+    the overlap belong to the neighbouring tile, which drops them symmetrically,
+    so every word on the page is reported exactly once.
+    """
+    kept = []
+    for word in words:
+        left = tile.left + word["left"] / scale
+        top = tile.top + word["top"] / scale
+        width = word["width"] / scale
+        height = word["height"] / scale
+        centre_x, centre_y = left + width / 2, top + height / 2
+
+        if tile.core_left <= centre_x < tile.core_right and tile.core_top <= centre_y < tile.core_bottom:
+            kept.append({
+                **word,
+                "left": int(round(left)),
+                "top": int(round(top)),
+                "width": int(round(width)),
+                "height": int(round(height)),
+            })
+    return kept
+
+def words_to_text(words: List[Dict[str, Any]]) -> str:
+    """Rebuild page text from word boxes alone, for results stitched from several OCR runs
+
+    Words are grouped into lines by vertical centre and read left to right;
+    line centres more than two and a half glyph heights apart start a new paragraph.
+    """
+    if not words:
+        return ""
+
+    median_height = float(np.median([word["height"] for word in words])) or 1.0
+    lines = []
+    for word in sorted(words, key=lambda w: w["top"] + w["height"] / 2):
+        centre = word["top"] + word["height"] / 2
+        if lines and abs(centre - lines[-1]["centre"]) <= median_height * 0.6:
+            line = lines[-1]
+            line["words"].append(word)
+            line["centre"] += (centre - line["centre"]) / len(line["words"])
+        else:
+            lines.append({"centre": centre, "words": [word]})
+
+    text_lines = []
+    previous = None
+    for line in lines:
+        if previous is not None and line["centre"] - previous > median_height * 2.5:
+            text_lines.append("")
+        text_lines.append(" ".join(w["text"] for w in sorted(line["words"], key=lambda w: w["left"])))
+        previous = line["centre"]
+
+    return "\n".join(text_lines)
@@ -7,6 +7,9 @@ from app.utils.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
+# Numeric dates such as 11/02/2019, 2019-02-11 or 11.02.19
+DATE_PATTERN = re.compile(r'\d{1,4}[/\-\.]\d{1,2}[/\-\.]\d{2,4}')
+
 class BusinessValidator:
     """Business logic validation rules"""
     
@@ -215,7 +218,7 @@ class BusinessValidator:
             validation_warnings = []
             
             # Re-parse dates with proper locale context
-            date_patterns = re.findall(r'\d{1,4}[/\-\.]\d{1,2}[/\-\.]\d{2,4}', extracted_text)
+            date_patterns = DATE_PATTERN.findall(extracted_text)
             
             if date_patterns:
                 logger.info(f"Found date patterns: {date_patterns}")
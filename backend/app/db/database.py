@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -35,10 +35,39 @@ class DatabaseManager:
         """Create database tables"""
         try:
             # Import models to ensure they're registered
-            from app.db.models import ProcessedInvoice, FieldCorrection, ProcessingSession, PerformanceMetrics
+            from app.db.models import ProcessedInvoice, FieldCorrection, ProcessingSession, PerformanceMetrics, OCRLayoutProfile, LLMResponseCacheEntry
             Base.metadata.create_all(bind=self.engine)
         except Exception as e:
             print(f"Warning: Could not create tables: {e}")
+            return
+        
+        self._add_layout_profile_index()
+    
+    def _add_layout_profile_index(self):
+        """Databases created before the (fingerprint, config) unique index: merge duplicate rows, then add it"""
+        from app.db.models import OCRLayoutProfile
+        
+        index = next(index for index in OCRLayoutProfile.__table__.indexes if index.unique)
+        try:
+            existing = inspect(self.engine).get_indexes(OCRLayoutProfile.__tablename__)
+            if index.name in {entry["name"] for entry in existing}:
+                return
+            with self.engine.begin() as connection:
+                connection.execute(text(
+                    "UPDATE ocr_layout_profiles SET wins = ("
+                    " SELECT SUM(duplicate.wins) FROM ocr_layout_profiles duplicate"
+                    " WHERE duplicate.fingerprint = ocr_layout_profiles.fingerprint"
+                    " AND duplicate.config = ocr_layout_profiles.config"
+                    ") WHERE id IN (SELECT MIN(id) FROM ocr_layout_profiles GROUP BY fingerprint, config HAVING COUNT(*) > 1)"
+                ))
+                connection.execute(text(
+                    "DELETE FROM ocr_layout_profiles WHERE id NOT IN ("
+                    " SELECT MIN(id) FROM ocr_layout_profiles GROUP BY fingerprint, config"
+                    ")"
+                ))
+                index.create(bind=connection, checkfirst=True)
+        except Exception as e:
+            print(f"Warning: Could not add the OCR layout profile index: {e}")
     
     def get_session(self):
         """Get a database session"""
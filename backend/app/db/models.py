@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from typing import Dict, Any
@@ -169,6 +169,63 @@ class FieldCorrection(Base):
             "correction_timestamp": self.correction_timestamp.isoformat() if self.correction_timestamp else None
         }
 
+class OCRLayoutProfile(Base):
+    """How often each OCR config won for a page layout, so repeat layouts try the winner first"""
+    __tablename__ = "ocr_layout_profiles"
+    __table_args__ = (
+        Index("uq_ocr_layout_profiles_fingerprint_config", "fingerprint", "config", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(128), nullable=False, index=True)  # see app.core.layout.layout_fingerprint
+    config = Column(String(255), nullable=False)  # Tesseract config string, or "layout"
+    wins = Column(Integer, default=0)
+    vendor_name = Column(String(255))  # set once an invoice with this layout is saved; pools wins across the vendor's layouts
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "fingerprint": self.fingerprint,
+            "config": self.config,
+            "wins": self.wins,
+            "vendor_name": self.vendor_name,
+            "last_used": self.last_used.isoformat() if self.last_used else None
+        }
+
+class LLMResponseCacheEntry(Base):
+    """Raw AI response for a normalized document text, prompt version, model and locale"""
+    __tablename__ = "llm_response_cache"
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # see app.core.llm_cache
+    prompt_kind = Column(String(50), nullable=False)  # analysis, combined or detection
+    prompt_version = Column(String(20), nullable=False)
+    model = Column(String(100), nullable=False)
+    language = Column(String(10))
+    date_format = Column(String(20))
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "cache_key": self.cache_key,
+            "prompt_kind": self.prompt_kind,
+            "prompt_version": self.prompt_version,
+            "model": self.model,
+            "language": self.language,
+            "date_format": self.date_format,
+            "hits": self.hits,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "last_used": self.last_used.isoformat() if self.last_used else None
+        }
+
 class ProcessingSession(Base):
     """Track batch processing sessions"""
     __tablename__ = "processing_sessions"
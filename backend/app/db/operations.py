@@ -1,7 +1,8 @@
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.db.models import ProcessedInvoice, FieldCorrection, ProcessingSession, PerformanceMetrics
+from app.db.models import ProcessedInvoice, FieldCorrection, ProcessingSession, PerformanceMetrics, OCRLayoutProfile, LLMResponseCacheEntry
 from app.db.database import db_manager
 
 class DatabaseOperations:
@@ -56,6 +57,7 @@ class DatabaseOperations:
             )
             
             db.add(invoice)
+            
             db.commit()
             db.refresh(invoice)
             return invoice
@@ -129,6 +131,126 @@ class DatabaseOperations:
         finally:
             db.close()
     
+    def get_layout_profiles(self) -> List[OCRLayoutProfile]:
+        """All recorded OCR config wins per layout fingerprint"""
+        db = self.db_manager.get_session()
+        try:
+            return db.query(OCRLayoutProfile).all()
+        finally:
+            db.close()
+    
+    def record_layout_config_wins(self, wins: Dict[Tuple[str, str], int], vendors: Optional[Dict[str, str]] = None):
+        """Add win counts per (fingerprint, config) and set vendor names per fingerprint in one transaction
+        
+        Missing profiles are created first, so a vendor tag never misses a profile whose wins it arrives with.
+        """
+        for attempt in range(2):
+            db = self.db_manager.get_session()
+            try:
+                now = datetime.utcnow()
+                for (fingerprint, config), count in wins.items():
+                    updated = db.query(OCRLayoutProfile).filter(
+                        OCRLayoutProfile.fingerprint == fingerprint,
+                        OCRLayoutProfile.config == config
+                    ).update(
+                        {OCRLayoutProfile.wins: OCRLayoutProfile.wins + count, OCRLayoutProfile.last_used: now},
+                        synchronize_session=False
+                    )
+                    if not updated:
+                        db.add(OCRLayoutProfile(fingerprint=fingerprint, config=config, wins=count, last_used=now))
+                db.flush()
+                for fingerprint, vendor_name in (vendors or {}).items():
+                    db.query(OCRLayoutProfile).filter(
+                        OCRLayoutProfile.fingerprint == fingerprint
+                    ).update({OCRLayoutProfile.vendor_name: vendor_name}, synchronize_session=False)
+                db.commit()
+                return
+            except IntegrityError:
+                # Another process created one of the profiles first; the retry updates it instead
+                db.rollback()
+                if attempt:
+                    raise
+            finally:
+                db.close()
+    
+    def get_llm_cache_response(self, cache_key: str, max_age_seconds: float) -> Optional[str]:
+        """Cached AI response younger than max_age_seconds, counting the hit; expired entries are deleted"""
+        db = self.db_manager.get_session()
+        try:
+            entry = db.query(LLMResponseCacheEntry).filter(LLMResponseCacheEntry.cache_key == cache_key).first()
+            if entry is None:
+                return None
+            
+            now = datetime.utcnow()
+            if entry.created_at < now - timedelta(seconds=max_age_seconds):
+                db.delete(entry)
+                db.commit()
+                return None
+            
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used = now
+            db.commit()
+            return entry.response
+        finally:
+            db.close()
+    
+    def save_llm_cache_response(self, cache_key: str, response: str, prompt_kind: str, prompt_version: str,
+                                model: str, language: Optional[str] = None, date_format: Optional[str] = None) -> bool:
+        """Store an AI response; returns False when the key was already cached (and refreshes it)"""
+        db = self.db_manager.get_session()
+        try:
+            entry = db.query(LLMResponseCacheEntry).filter(LLMResponseCacheEntry.cache_key == cache_key).first()
+            created = entry is None
+            if created:
+                entry = LLMResponseCacheEntry(cache_key=cache_key, hits=0)
+                db.add(entry)
+            
+            now = datetime.utcnow()
+            entry.response = response
+            entry.prompt_kind = prompt_kind
+            entry.prompt_version = prompt_version
+            entry.model = model
+            entry.language = language
+            entry.date_format = date_format
+            entry.created_at = now
+            entry.last_used = now
+            db.commit()
+            return created
+        finally:
+            db.close()
+    
+    def count_llm_cache_entries(self) -> int:
+        db = self.db_manager.get_session()
+        try:
+            return db.query(LLMResponseCacheEntry).count()
+        finally:
+            db.close()
+    
+    def evict_llm_cache(self, max_entries: int, max_age_seconds: float) -> int:
+        """Delete expired AI responses, then the least recently used ones past max_entries; returns how many went"""
+        db = self.db_manager.get_session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+            removed = db.query(LLMResponseCacheEntry).filter(
+                LLMResponseCacheEntry.created_at < cutoff
+            ).delete(synchronize_session=False)
+            
+            excess = db.query(LLMResponseCacheEntry).count() - max_entries
+            if excess > 0:
+                stale_ids = [
+                    entry_id for (entry_id,) in db.query(LLMResponseCacheEntry.id)
+                    .order_by(LLMResponseCacheEntry.last_used.asc())
+                    .limit(excess)
+                ]
+                removed += db.query(LLMResponseCacheEntry).filter(
+                    LLMResponseCacheEntry.id.in_(stale_ids)
+                ).delete(synchronize_session=False)
+            
+            db.commit()
+            return removed
+        finally:
+            db.close()
+    
     def get_field_corrections_stats(self) -> Dict[str, Any]:
         """Get statistics about field corrections for learning insights"""
         db = self.db_manager.get_session()
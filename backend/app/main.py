@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi import HTTPException
 from datetime import datetime
+import asyncio
 import logging
 import time
 import json
@@ -90,6 +91,15 @@ async def general_exception_handler(request, exc):
         }
     )
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker pools and HTTP connection pools held by the extraction service"""
+    from app.core.processor import extractor
+    
+    if extractor:
+        extractor.ocr_processor.shutdown()
+        await extractor.ai_analyzer.aclose()
+
 @app.get("/")
 async def root():
     """API root endpoint with basic info"""
@@ -129,6 +139,7 @@ async def health_check():
         from app.db.database import db_manager
         from app.db.models import ProcessedInvoice
         from app.utils.websocket_manager import manager
+        from app.utils.metrics import metrics
         import os
         
         if not extractor:
@@ -159,10 +170,20 @@ async def health_check():
             },
             "stats": {
                 "processed_invoices": invoice_count,
-                "active_connections": len(manager.active_connections)
+                "active_connections": len(manager.active_connections),
+                "counters": metrics.snapshot()
             }
         }
         
+        if extractor.ocr_processor.cache is not None:
+            status["stats"]["ocr_cache"] = extractor.ocr_processor.cache.stats()
+        
+        status["stats"]["ai_scheduler"] = extractor.ai_analyzer.scheduler.stats()
+        
+        if extractor.ai_analyzer.response_cache is not None:
+            # stats() may count the table; keep that query off the event loop
+            status["stats"]["llm_cache"] = await asyncio.to_thread(extractor.ai_analyzer.response_cache.stats)
+        
         if missing_env:
             status["warnings"] = f"Missing environment variables: {', '.join(missing_env)}"
         
@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Optional
+
+# Guards Deadline.reported; module-level so Deadline itself stays picklable
+_REPORT_LOCK = threading.Lock()
+
+class Deadline:
+    """A point in time by which work must finish, shared by every stage of one document
+
+    Based on time.monotonic(), which is system-wide on the platforms we run on,
+    so a Deadline can be pickled into OCR worker processes. `None` seconds means
+    no limit.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self.reported = False
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None when unlimited"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def within(self, seconds: Optional[float]) -> "Deadline":
+        """A deadline at most `seconds` from now that never outlives this one"""
+        child = Deadline(seconds)
+        if child.expires_at is None or (self.expires_at is not None and self.expires_at < child.expires_at):
+            child.expires_at = self.expires_at
+        return child
+
+    def timeout_for(self, limit: Optional[float]) -> Optional[float]:
+        """Timeout for one step: its own limit, cut short by the time left overall"""
+        remaining = self.remaining()
+        if remaining is None:
+            return limit
+        return remaining if not limit else min(limit, remaining)
+
+    def report(self) -> bool:
+        """True the first time it is called, so a document that ran out of time is counted once"""
+        with _REPORT_LOCK:
+            first, self.reported = not self.reported, True
+        return first
@@ -4,4 +4,14 @@ class ValidationError(Exception):
         self.field = field
         self.message = message
         self.value = value
-        super().__init__(f"Validation error in {field}: {message}")
\ No newline at end of file
+        super().__init__(f"Validation error in {field}: {message}")
+
+class OCRTimeoutError(Exception):
+    """Raised when an OCR engine run exceeds its time limit and is stopped"""
+    pass
+
+class LLMRateLimitError(Exception):
+    """Raised when the AI provider rejects a request for rate limiting; retry_after is in seconds, if it said"""
+    def __init__(self, message: str, retry_after: float = None):
+        self.retry_after = retry_after
+        super().__init__(message)
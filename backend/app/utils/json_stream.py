@@ -0,0 +1,110 @@
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+PathItem = Union[str, int]
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind          # "object" or "array"
+        self.start = start        # buffer offset of the opening bracket
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "object"
+
+class IncrementalJSONParser:
+    """Parses one JSON document as it streams in and reports values the moment they are complete
+
+    feed() returns (path, value) pairs for every scalar outside arrays, such as
+    ("vendor_info", "vendor_name"), and for every whole element of an array,
+    such as ("line_items", 0). Anything before the first bracket (a Markdown
+    fence, a preamble) is skipped, as is anything after the document closes.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._token_start: Optional[int] = None
+        self._in_string = False
+        self._escape = False
+        self.done = False
+
+    def _path(self) -> Tuple[PathItem, ...]:
+        return tuple(frame.key if frame.kind == "object" else frame.index for frame in self._stack)
+
+    def _complete(self, start: int, end: int, events: List[Tuple[Tuple[PathItem, ...], Any]], container: bool):
+        arrays = [i for i, frame in enumerate(self._stack) if frame.kind == "array"]
+        if arrays and arrays[0] != len(self._stack) - 1:
+            # Inside an array element; reported with the element as a whole
+            return
+        if container and not arrays:
+            # Objects outside arrays were already reported field by field
+            return
+        try:
+            value = json.loads(self._buffer[start:end])
+        except json.JSONDecodeError:
+            return
+        events.append((self._path(), value))
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[PathItem, ...], Any]]:
+        """Add streamed text; returns the values completed by it, in document order"""
+        self._buffer += chunk
+        events: List[Tuple[Tuple[PathItem, ...], Any]] = []
+        buffer = self._buffer
+
+        while self._pos < len(buffer) and not self.done:
+            i = self._pos
+            char = buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    top = self._stack[-1]
+                    if top.kind == "object" and top.expect_key:
+                        top.key = json.loads(buffer[self._token_start:i + 1])
+                        top.expect_key = False
+                    else:
+                        self._complete(self._token_start, i + 1, events, container=False)
+                    self._token_start = None
+                continue
+
+            if self._token_start is not None:
+                # Numbers and literals end at the next delimiter
+                if char not in ",}] \t\r\n":
+                    continue
+                self._complete(self._token_start, i, events, container=False)
+                self._token_start = None
+
+            if not self._stack:
+                if char in "{[":
+                    self._stack.append(_Frame("object" if char == "{" else "array", i))
+                continue
+
+            if char in "{[":
+                self._stack.append(_Frame("object" if char == "{" else "array", i))
+            elif char in "}]":
+                frame = self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                else:
+                    self._complete(frame.start, i + 1, events, container=True)
+            elif char == '"':
+                self._in_string = True
+                self._token_start = i
+            elif char == ",":
+                top = self._stack[-1]
+                if top.kind == "object":
+                    top.expect_key = True
+                else:
+                    top.index += 1
+            elif char not in ": \t\r\n":
+                self._token_start = i
+
+        return events
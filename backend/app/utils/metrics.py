@@ -0,0 +1,21 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+class Metrics:
+    """Process-wide counters for operational events (timeouts, fallbacks, ...)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+# Global instance
+metrics = Metrics()
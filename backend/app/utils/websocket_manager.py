@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import Dict
+from typing import Any, Dict
 from fastapi import WebSocket
 
 logger = logging.getLogger(__name__)
@@ -30,6 +30,18 @@ class ConnectionManager:
                 logger.error(f"Error sending progress update to {client_id}: {e}")
                 self.disconnect(client_id)
 
+    async def send_partial_result(self, client_id: str, field: str, value: Any):
+        """Send one extracted field (e.g. "financial_data.total_amount") before processing completes"""
+        if client_id in self.active_connections:
+            try:
+                await self.active_connections[client_id].send_text(json.dumps({
+                    "type": "partial_result",
+                    "data": {"field": field, "value": value}
+                }))
+            except Exception as e:
+                logger.error(f"Error sending partial result to {client_id}: {e}")
+                self.disconnect(client_id)
+
     async def send_completion(self, client_id: str, result: Dict):
         if client_id in self.active_connections:
             try:
@@ -0,0 +1,218 @@
+"""Benchmark OCR throughput and accuracy on synthetic invoices.
+
+Usage (from the backend directory):
+    python -m benchmarks.ocr_pipeline --dpi 200 300 --rotation 0 3 --blur 0 1 --noise 0 12 --samples 2
+    python -m benchmarks.ocr_pipeline --json before.json   # save results to compare against a later run
+
+Every combination of resolution, rotation, blur and noise is rendered offline
+from known ground truth and run through OCRProcessor.ocr_image with the result
+cache disabled. Reports images/second, mean latency of each preprocessing
+stage and of each Tesseract config, and character accuracy per invoice field
+(1 - edit distance of the best-matching span in the OCR text / field length).
+Needs a working Tesseract installation for the configured OCR backend.
+"""
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.ocr import OCR_CONFIGS, OCRProcessor, run_ocr_config
+from benchmarks.synthetic import degrade, make_invoice_image, rotate
+
+FIELDS = ["vendor_name", "invoice_number", "invoice_date", "due_date", "subtotal", "tax_amount", "total_amount"]
+
+def substring_distance(pattern: str, text: str) -> int:
+    """Edit distance between `pattern` and its best-matching span anywhere in `text`"""
+    previous = [0] * (len(text) + 1)
+    for i, pattern_char in enumerate(pattern, start=1):
+        current = [i] + [0] * len(text)
+        for j, text_char in enumerate(text, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (pattern_char != text_char),
+            )
+        previous = current
+    return min(previous)
+
+def field_accuracy(fields: Dict[str, Any], text: str) -> Dict[str, float]:
+    """Character accuracy (0-1) of each ground-truth field found in the OCR text"""
+    expected = {name: str(fields[name]) for name in FIELDS}
+    expected["line_item_amounts"] = " ".join(f"{item['amount']:,.2f}" for item in fields["line_items"])
+
+    accuracy = {}
+    for name, value in expected.items():
+        if name == "line_item_amounts":
+            # Amounts sit in different rows; score each one on its own and average
+            scores = [
+                1 - substring_distance(amount, text) / len(amount)
+                for amount in value.split()
+            ]
+            accuracy[name] = max(0.0, statistics.mean(scores))
+        else:
+            accuracy[name] = max(0.0, 1 - substring_distance(value, text) / len(value))
+    return accuracy
+
+def make_samples(dpis: List[int], rotations: List[float], blurs: List[float], noises: List[float],
+                 samples: int) -> List[Tuple[Dict[str, Any], np.ndarray, Dict[str, Any]]]:
+    """(scenario, grayscale image, ground truth) for every combination and seed"""
+    cases = []
+    for dpi, rotation, blur, noise in itertools.product(dpis, rotations, blurs, noises):
+        scenario = {"dpi": dpi, "rotation": rotation, "blur": blur, "noise": noise}
+        for seed in range(samples):
+            image, fields = make_invoice_image(seed, dpi=dpi)
+            if rotation:
+                image = rotate(image, rotation)
+            image = degrade(image, blur=blur, noise=noise, seed=seed)
+            cases.append((scenario, np.array(image), fields))
+    return cases
+
+def time_configs(processor: OCRProcessor, gray: np.ndarray) -> Dict[str, float]:
+    """Milliseconds each full-page config takes on the preprocessed image"""
+    enhanced = processor.enhance_image_quality(gray.copy())
+    timings = {}
+    for config in OCR_CONFIGS:
+        start = time.perf_counter()
+        try:
+            run_ocr_config(processor.backend, enhanced, config)
+        except Exception as e:
+            print(f"config {config!r} failed: {e}", file=sys.stderr)
+            continue
+        timings[config] = (time.perf_counter() - start) * 1000
+    return timings
+
+def run_case(processor: OCRProcessor, case: Tuple[Dict[str, Any], np.ndarray, Dict[str, Any]]) -> Dict[str, Any]:
+    scenario, gray, fields = case
+    start = time.perf_counter()
+    result = processor.ocr_image(gray.copy(), in_place=True)
+    elapsed = time.perf_counter() - start
+
+    preprocessing = result.get("preprocessing", {})
+    stages = dict(preprocessing.get("timings", {}))
+    layout = preprocessing.get("layout", {})
+    if "segmentation_ms" in layout:
+        stages["layout_segmentation"] = layout["segmentation_ms"]
+    if "ms" in layout:
+        stages["layout_ocr"] = layout["ms"]
+
+    return {
+        **scenario,
+        "seconds": elapsed,
+        "tier": preprocessing.get("tier"),
+        "config": result.get("config"),
+        "ocr_confidence": result["ocr_confidence"],
+        "stages": stages,
+        "accuracy": field_accuracy(fields, result["text"]),
+    }
+
+def summarize(runs: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregate per scenario plus overall stage latencies and field accuracy"""
+    scenarios = []
+    key = lambda run: (run["dpi"], run["rotation"], run["blur"], run["noise"])
+    for (dpi, rotation, blur, noise), group in itertools.groupby(sorted(runs, key=key), key=key):
+        group = list(group)
+        scenarios.append({
+            "dpi": dpi,
+            "rotation": rotation,
+            "blur": blur,
+            "noise": noise,
+            "images": len(group),
+            "mean_ms": statistics.mean(run["seconds"] for run in group) * 1000,
+            "accuracy": statistics.mean(statistics.mean(run["accuracy"].values()) for run in group),
+            "tiers": sorted({str(run["tier"]) for run in group}),
+        })
+
+    stage_names = sorted({name for run in runs for name in run["stages"]})
+    return {
+        "images": len(runs),
+        "images_per_second": len(runs) / wall_seconds if wall_seconds else 0.0,
+        "scenarios": scenarios,
+        "stages_ms": {
+            name: statistics.mean(run["stages"][name] for run in runs if name in run["stages"])
+            for name in stage_names
+        },
+        "field_accuracy": {
+            name: statistics.mean(run["accuracy"][name] for run in runs)
+            for name in runs[0]["accuracy"]
+        },
+    }
+
+def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    settings.ocr_cache_enabled = False
+    processor = OCRProcessor()
+    processor.test_tesseract()
+
+    cases = make_samples(args.dpi, args.rotation, args.blur, args.noise, args.samples)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+            runs = list(executor.map(lambda case: run_case(processor, case), cases))
+        wall_seconds = time.perf_counter() - start
+
+        summary = summarize(runs, wall_seconds)
+        summary["concurrency"] = args.concurrency
+        if not args.skip_configs:
+            # One representative image per resolution keeps this pass short
+            per_config: Dict[str, List[float]] = {}
+            for dpi in args.dpi:
+                gray = next(gray for scenario, gray, _ in cases if scenario["dpi"] == dpi)
+                for config, ms in time_configs(processor, gray).items():
+                    per_config.setdefault(config, []).append(ms)
+            summary["configs_ms"] = {config: statistics.mean(values) for config, values in per_config.items()}
+    finally:
+        processor.shutdown()
+
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dpi", type=int, nargs="+", default=[200, 300], help="Render resolutions")
+    parser.add_argument("--rotation", type=float, nargs="+", default=[0.0, 3.0], help="Rotations in degrees")
+    parser.add_argument("--blur", type=float, nargs="+", default=[0.0, 1.0], help="Gaussian blur radii in pixels")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.0, 12.0], help="Noise std devs in gray levels")
+    parser.add_argument("--samples", type=int, default=2, help="Invoices per combination")
+    parser.add_argument("--concurrency", type=int, default=1, help="Images OCR'd at the same time")
+    parser.add_argument("--skip-configs", action="store_true", help="Skip timing each Tesseract config")
+    parser.add_argument("--json", help="Also write the full results to this file")
+    args = parser.parse_args()
+
+    summary = benchmark(args)
+
+    print(f"{summary['images']} images, {summary['images_per_second']:.2f} images/s at concurrency {summary['concurrency']}")
+    print()
+    print(f"{'dpi':>4} {'rot':>5} {'blur':>5} {'noise':>6} {'ms/image':>9} {'accuracy':>9}  tiers")
+    for scenario in summary["scenarios"]:
+        print(
+            f"{scenario['dpi']:>4} {scenario['rotation']:>5.1f} {scenario['blur']:>5.1f} {scenario['noise']:>6.1f} "
+            f"{scenario['mean_ms']:>9.1f} {scenario['accuracy']:>9.3f}  {', '.join(scenario['tiers'])}"
+        )
+
+    print()
+    print(f"{'stage':<22} {'mean ms':>9}")
+    for name, ms in summary["stages_ms"].items():
+        print(f"{name:<22} {ms:>9.1f}")
+
+    if "configs_ms" in summary:
+        print()
+        print(f"{'config':<40} {'mean ms':>9}")
+        for config, ms in summary["configs_ms"].items():
+            print(f"{config[:40]:<40} {ms:>9.1f}")
+
+    print()
+    print(f"{'field':<18} {'accuracy':>9}")
+    for name, accuracy in summary["field_accuracy"].items():
+        print(f"{name:<18} {accuracy:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Compare PDF text-layer backends on generated statement-style invoices.
+
+Usage (from the backend directory):
+    python -m benchmarks.pdf_text_backends --pages 30 80 --runs 3
+
+Each backend runs in a fresh process so peak memory numbers do not leak
+between backends. Python-heap peak comes from tracemalloc; peak RSS also
+covers native allocations (PDFium) where the platform reports it.
+"""
+import argparse
+import io
+import multiprocessing
+import random
+import time
+import tracemalloc
+from queue import Empty
+from typing import Dict, Any, List
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.core.pdf_backends import PDF_TEXT_BACKENDS, create_pdf_backend
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def generate_invoice_pdf(pages: int, rows_per_page: int = 45, seed: int = 42) -> bytes:
+    """Render a multi-page, table-heavy invoice statement with a real text layer"""
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    columns = [40, 110, 330, 400, 470]
+
+    for page in range(1, pages + 1):
+        pdf.setFont("Helvetica-Bold", 14)
+        pdf.drawString(40, height - 50, "ACME Utilities Ltd - Account Statement")
+        pdf.setFont("Helvetica", 9)
+        pdf.drawString(40, height - 66, f"Invoice #INV-{100000 + page}   Page {page} of {pages}")
+
+        y = height - 100
+        for header, x in zip(["Date", "Description", "Qty", "Unit", "Amount"], columns):
+            pdf.drawString(x, y, header)
+        pdf.line(40, y - 4, width - 40, y - 4)
+
+        for row in range(rows_per_page):
+            y -= 15
+            quantity = rng.randint(1, 20)
+            unit_price = rng.uniform(1, 500)
+            values = [
+                f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                f"Service line {page}.{row} metered usage",
+                str(quantity),
+                f"{unit_price:,.2f}",
+                f"{quantity * unit_price:,.2f}",
+            ]
+            for value, x in zip(values, columns):
+                pdf.drawString(x, y, value)
+
+        pdf.drawString(40, 40, "Payment terms: 30 days net. Late payments incur a 1.5% monthly fee.")
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _run_backend(name: str, pdf_bytes: bytes, runs: int, queue: "multiprocessing.Queue"):
+    backend = create_pdf_backend(name)
+    if backend.name != name:
+        queue.put({"backend": name, "error": "unavailable"})
+        return
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pages = backend.extract_pages(pdf_bytes)
+        timings.append(time.perf_counter() - start)
+
+    # Separate traced run: tracemalloc slows Python-heavy backends down too much to time them
+    tracemalloc.start()
+    backend.extract_pages(pdf_bytes)
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    queue.put({
+        "backend": name,
+        "pages": len(pages),
+        "chars": sum(len(page) for page in pages),
+        "best_seconds": best,
+        "pages_per_second": len(pages) / best if best else 0.0,
+        "heap_peak_mb": heap_peak / (1024 * 1024),
+        "peak_rss_mb": _peak_rss_mb(),
+    })
+
+def _collect_result(name: str, process: "multiprocessing.Process", queue: "multiprocessing.Queue",
+                    timeout: float) -> Dict[str, Any]:
+    """Wait for a backend's result, reporting a crashed or hung child instead of blocking forever"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1.0)
+        except Empty:
+            pass
+        if process.exitcode is not None:
+            # The child may have put its result just before exiting
+            try:
+                return queue.get(timeout=1.0)
+            except Empty:
+                return {"backend": name, "error": f"crashed (exit code {process.exitcode})"}
+        if time.monotonic() >= deadline:
+            process.terminate()
+            return {"backend": name, "error": f"timed out after {timeout:.0f}s"}
+
+def benchmark(page_counts: List[int], runs: int, timeout: float = 600.0) -> List[Dict[str, Any]]:
+    results = []
+    context = multiprocessing.get_context("spawn")
+
+    for page_count in page_counts:
+        pdf_bytes = generate_invoice_pdf(page_count)
+        for name in PDF_TEXT_BACKENDS:
+            queue = context.Queue()
+            process = context.Process(target=_run_backend, args=(name, pdf_bytes, runs, queue))
+            process.start()
+            result = _collect_result(name, process, queue, timeout)
+            process.join()
+            result["document_pages"] = page_count
+            results.append(result)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[30, 80], help="Page counts to generate")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per backend; the best time is reported")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for each backend process")
+    args = parser.parse_args()
+
+    print(f"{'pages':>5} {'backend':<10} {'pages/s':>9} {'best s':>8} {'heap MB':>8} {'RSS MB':>8} {'chars':>8}")
+    for result in benchmark(args.pages, args.runs, args.timeout):
+        if "error" in result:
+            print(f"{result['document_pages']:>5} {result['backend']:<10} {result['error']}")
+            continue
+        print(
+            f"{result['document_pages']:>5} {result['backend']:<10} {result['pages_per_second']:>9.1f} "
+            f"{result['best_seconds']:>8.3f} {result['heap_peak_mb']:>8.1f} {result['peak_rss_mb']:>8.1f} "
+            f"{result['chars']:>8}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Offline synthetic invoice images for OCR benchmarks (no network, PIL and numpy only)."""
+import random
+from typing import Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+VENDORS = [
+    "ACME Office Supplies", "Northwind Traders", "Globex Consulting",
+    "Initech Software", "Umbrella Logistics", "Stark Industrial Parts",
+]
+ITEMS = [
+    "Printer paper A4", "Consulting services", "Software license",
+    "Freight charges", "Toner cartridge", "Maintenance contract", "Cloud hosting",
+]
+
+def load_font(size: int) -> ImageFont.ImageFont:
+    """Scalable default font; falls back to the bitmap font on old Pillow versions"""
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+def generate_invoice_fields(rng: random.Random) -> Dict[str, Any]:
+    """Known ground-truth fields for one invoice"""
+    line_items = []
+    for _ in range(rng.randint(3, 8)):
+        quantity = rng.randint(1, 10)
+        unit_price = round(rng.uniform(5, 400), 2)
+        line_items.append({
+            "description": rng.choice(ITEMS),
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "amount": round(quantity * unit_price, 2),
+        })
+
+    subtotal = round(sum(item["amount"] for item in line_items), 2)
+    tax = round(subtotal * 0.2, 2)
+
+    return {
+        "vendor_name": rng.choice(VENDORS),
+        "invoice_number": f"INV-{rng.randint(10000, 99999)}",
+        "invoice_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "due_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "line_items": line_items,
+        "subtotal": f"{subtotal:,.2f}",
+        "tax_amount": f"{tax:,.2f}",
+        "total_amount": f"{subtotal + tax:,.2f}",
+    }
+
+def render_invoice(fields: Dict[str, Any], dpi: int = 300) -> Image.Image:
+    """Render an A4 invoice at the given DPI as a grayscale image"""
+    scale = dpi / 72
+    width, height = int(595 * scale), int(842 * scale)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+
+    title = load_font(int(18 * scale))
+    body = load_font(int(10 * scale))
+    line = int(16 * scale)
+    left = int(50 * scale)
+    y = int(50 * scale)
+
+    draw.text((left, y), fields["vendor_name"], font=title, fill=0)
+    y += line * 2
+    draw.text((left, y), f"Invoice Number: {fields['invoice_number']}", font=body, fill=0)
+    y += line
+    draw.text((left, y), f"Invoice Date: {fields['invoice_date']}", font=body, fill=0)
+    y += line
+    draw.text((left, y), f"Due Date: {fields['due_date']}", font=body, fill=0)
+    y += line * 2
+
+    columns = [left, int(300 * scale), int(380 * scale), int(470 * scale)]
+    for header, x in zip(["Description", "Qty", "Unit Price", "Amount"], columns):
+        draw.text((x, y), header, font=body, fill=0)
+    y += line
+    draw.line((left, y, width - left, y), fill=0, width=max(1, int(scale)))
+    y += line // 2
+
+    for item in fields["line_items"]:
+        values = [item["description"], str(item["quantity"]), f"{item['unit_price']:,.2f}", f"{item['amount']:,.2f}"]
+        for value, x in zip(values, columns):
+            draw.text((x, y), value, font=body, fill=0)
+        y += line
+
+    y += line
+    for label, key in [("Subtotal", "subtotal"), ("Tax", "tax_amount"), ("Total", "total_amount")]:
+        draw.text((columns[2], y), f"{label}:", font=body, fill=0)
+        draw.text((columns[3], y), fields[key], font=body, fill=0)
+        y += line
+
+    return image
+
+def rotate(image: Image.Image, degrees: float) -> Image.Image:
+    """Rotate counter-clockwise by `degrees`, keeping the page size and a white background"""
+    return image.rotate(degrees, resample=Image.BICUBIC, fillcolor=255)
+
+def degrade(image: Image.Image, blur: float = 0.0, noise: float = 0.0, seed: int = 0) -> Image.Image:
+    """Simulate a poor scan: Gaussian blur (radius in pixels), then additive Gaussian noise (std dev in gray levels)"""
+    if blur > 0:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    if noise > 0:
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels = pixels + np.random.default_rng(seed).normal(0.0, noise, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+def make_invoice_image(seed: int, dpi: int = 300) -> Tuple[Image.Image, Dict[str, Any]]:
+    """Generate one invoice image and its ground truth"""
+    fields = generate_invoice_fields(random.Random(seed))
+    return render_invoice(fields, dpi=dpi), fields
@@ -0,0 +1,87 @@
+import json
+
+from app.utils.json_stream import IncrementalJSONParser
+
+DOCUMENT = (
+    '```json\n{"vendor_info": {"vendor_name": "Caf\\u00e9 \\"Le Coin\\"", "tax_id": null}, '
+    '"invoice_details": {"total_amount": 1234.5, "paid": false}, '
+    '"line_items": [{"description": "Pens, blue", "qty": 10}, {"description": "A4 [80g]", "qty": 2}], '
+    '"notes": ["a}b", 7]}\n```'
+)
+
+EXPECTED = [
+    (("vendor_info", "vendor_name"), 'Café "Le Coin"'),
+    (("vendor_info", "tax_id"), None),
+    (("invoice_details", "total_amount"), 1234.5),
+    (("invoice_details", "paid"), False),
+    (("line_items", 0), {"description": "Pens, blue", "qty": 10}),
+    (("line_items", 1), {"description": "A4 [80g]", "qty": 2}),
+    (("notes", 0), "a}b"),
+    (("notes", 1), 7),
+]
+
+def feed_in_chunks(text: str, size: int):
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+def test_whole_document_in_one_chunk():
+    parser, events = feed_in_chunks(DOCUMENT, len(DOCUMENT))
+
+    assert events == EXPECTED
+    assert parser.done
+
+def test_every_chunk_size_gives_the_same_events():
+    # Size 1 splits every key, string, escape sequence, number and literal across chunks
+    for size in range(1, 40):
+        parser, events = feed_in_chunks(DOCUMENT, size)
+        assert events == EXPECTED, size
+        assert parser.done
+
+def test_number_is_reported_only_once_its_delimiter_arrives():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"total": 12') == []
+    assert parser.feed('34') == []
+    assert parser.feed('.5}') == [(("total",), 1234.5)]
+    assert parser.done
+
+def test_escape_split_across_chunks():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"name": "A\\') == []
+    assert parser.feed('"B') == []
+    assert parser.feed('"') == [(("name",), 'A"B')]
+    assert parser.feed(', "x": 1}') == [(("x",), 1)]
+
+def test_array_element_reported_when_it_closes():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"line_items": [{"qty": 1, "unit": "box"') == []
+    assert parser.feed('}, {"qty": 2') == [(("line_items", 0), {"qty": 1, "unit": "box"})]
+    assert parser.feed('}]}') == [(("line_items", 1), {"qty": 2})]
+
+def test_text_after_the_document_is_ignored():
+    parser = IncrementalJSONParser()
+    events = parser.feed('{"a": 1}\n{"b": 2}')
+
+    assert events == [(("a",), 1)]
+    assert parser.done
+    assert parser.feed('{"c": 3}') == []
+
+def test_events_rebuild_the_document():
+    _, events = feed_in_chunks(DOCUMENT, 7)
+    rebuilt = {}
+    for path, value in events:
+        target = rebuilt
+        for key, following in zip(path, path[1:]):
+            target = target.setdefault(key, [] if isinstance(following, int) else {})
+        if isinstance(path[-1], int):
+            target.append(value)
+        else:
+            target[path[-1]] = value
+
+    expected = json.loads(DOCUMENT.split("\n")[1])
+    assert rebuilt == expected
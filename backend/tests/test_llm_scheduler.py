@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+from app.core.llm_scheduler import (
+    LLMScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE, backoff_delay, llm_priority, parse_retry_after
+)
+
+def wait_until(condition, timeout: float = 2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.005)
+
+def test_interactive_requests_overtake_queued_batch_requests():
+    scheduler = LLMScheduler(requests_per_minute=60000, burst=100, max_in_flight=1)
+    order = []
+
+    def worker(name: str, priority: int):
+        with scheduler.slot(priority):
+            order.append(name)
+
+    scheduler.acquire()
+    threads = []
+    for name, priority in [("batch-1", PRIORITY_BATCH), ("batch-2", PRIORITY_BATCH),
+                           ("upload-1", PRIORITY_INTERACTIVE), ("upload-2", PRIORITY_INTERACTIVE)]:
+        thread = threading.Thread(target=worker, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.stats()["queued"] == len(threads))
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    # Priority first, then arrival order within a priority
+    assert order == ["upload-1", "upload-2", "batch-1", "batch-2"]
+    assert scheduler.stats()["in_flight"] == 0
+
+def test_priority_defaults_to_the_context_variable():
+    scheduler = LLMScheduler(requests_per_minute=60000, burst=100, max_in_flight=1)
+    order = []
+
+    async def call(name: str, priority: int):
+        llm_priority.set(priority)
+        async with scheduler.slot_async():
+            order.append(name)
+
+    async def main():
+        await scheduler.acquire_async()
+        batch = asyncio.create_task(call("batch", PRIORITY_BATCH))
+        await asyncio.sleep(0.02)
+        upload = asyncio.create_task(call("upload", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.02)
+        assert scheduler.stats()["queued"] == 2
+        scheduler.release()
+        await asyncio.gather(batch, upload)
+
+    asyncio.run(main())
+    assert order == ["upload", "batch"]
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = LLMScheduler(requests_per_minute=60000, burst=100, max_in_flight=1)
+
+    async def main():
+        await scheduler.acquire_async()
+        waiting = asyncio.create_task(scheduler.acquire_async())
+        await asyncio.sleep(0.02)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.stats()["queued"] == 0
+        scheduler.release()
+
+    asyncio.run(main())
+    assert scheduler.stats()["in_flight"] == 0
+
+def test_token_bucket_limits_requests_after_the_burst():
+    # 600 per minute is one token every 0.1s
+    scheduler = LLMScheduler(requests_per_minute=600, burst=2, max_in_flight=10)
+
+    start = time.monotonic()
+    for _ in range(3):
+        with scheduler.slot():
+            pass
+    elapsed = time.monotonic() - start
+
+    assert 0.07 <= elapsed < 0.5
+    assert scheduler.stats()["admitted"] == 3
+
+def test_processes_split_rate_and_in_flight_cap():
+    scheduler = LLMScheduler(requests_per_minute=120, burst=8, max_in_flight=8, processes=4)
+
+    assert scheduler.rate == pytest.approx(0.5)
+    assert scheduler.capacity == 2
+    assert scheduler.max_in_flight == 2
+
+def test_pause_holds_back_every_request():
+    scheduler = LLMScheduler(requests_per_minute=60000, burst=100, max_in_flight=10)
+    scheduler.pause(0.2)
+    # A shorter pause does not cut the running cooldown short
+    scheduler.pause(0.05)
+
+    start = time.monotonic()
+    with scheduler.slot():
+        pass
+
+    assert time.monotonic() - start >= 0.18
+    assert scheduler.stats()["pauses"] == 1
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("1.5") == 1.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+def test_backoff_grows_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr("app.core.llm_scheduler.random.uniform", lambda low, high: high)
+
+    assert [backoff_delay(attempt, base=1.0, cap=10.0) for attempt in range(6)] == [1, 2, 4, 8, 10, 10]
+
+def test_backoff_jitter_stays_within_the_window():
+    for attempt in range(6):
+        for _ in range(50):
+            assert 0 <= backoff_delay(attempt, base=0.5, cap=4.0) <= min(4.0, 0.5 * 2 ** attempt)
+
+def test_backoff_follows_retry_after():
+    for _ in range(50):
+        assert 3.0 <= backoff_delay(0, base=0.5, cap=30.0, retry_after=3.0) <= 3.5
+        # The cap still bounds a very long Retry-After
+        assert 30.0 <= backoff_delay(0, base=0.5, cap=30.0, retry_after=600.0) <= 30.5
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+
+from app.core.ocr_cache import OCRResultCache
+
+def render(text: str, scale: float = 1.6, thickness: int = 3) -> np.ndarray:
+    image = np.full((400, 1200), 255, dtype=np.uint8)
+    cv2.putText(image, text, (40, 200), cv2.FONT_HERSHEY_SIMPLEX, scale, 0, thickness)
+    return image
+
+def resave_jpeg(image: np.ndarray, quality: int) -> np.ndarray:
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE)
+
+def test_single_changed_glyph_misses(tmp_path):
+    cache = OCRResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    original = render("TOTAL 6,564.17 INV-71638")
+    edited = render("TOTAL 6,664.17 INV-71639")
+
+    cache.put(cache.make_key(original, "v1"), {"text": "TOTAL 6,564.17 INV-71638"})
+
+    assert cache.get(cache.make_key(edited, "v1")) is None
+    assert cache.get(cache.make_key(original, "v1")) == {"text": "TOTAL 6,564.17 INV-71638"}
+
+def test_single_changed_glyph_in_small_text_misses(tmp_path):
+    cache = OCRResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    original = render("TOTAL 6,564.17 INV-71638", scale=0.6, thickness=1)
+    edited = render("TOTAL 6,564.17 INV-71639", scale=0.6, thickness=1)
+
+    cache.put(cache.make_key(original, "v1"), {"text": "TOTAL 6,564.17 INV-71638"})
+
+    assert cache.get(cache.make_key(edited, "v1")) is None
+
+def test_resaved_jpeg_hits(tmp_path):
+    cache = OCRResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    original = render("TOTAL 6,564.17 INV-71638")
+
+    cache.put(cache.make_key(original, "v1"), {"text": "TOTAL 6,564.17 INV-71638"})
+
+    for quality in (90, 50):
+        assert cache.get(cache.make_key(resave_jpeg(original, quality), "v1")) == {"text": "TOTAL 6,564.17 INV-71638"}
+
+def test_index_survives_restart(tmp_path):
+    image = render("TOTAL 6,564.17")
+    OCRResultCache(str(tmp_path), max_bytes=1024 * 1024).put(OCRResultCache.make_key(image, "v1"), {"text": "TOTAL"})
+
+    reopened = OCRResultCache(str(tmp_path), max_bytes=1024 * 1024)
+
+    assert reopened.get(reopened.make_key(image, "v1")) == {"text": "TOTAL"}
+
+def test_settings_are_part_of_the_key(tmp_path):
+    cache = OCRResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    image = render("TOTAL 6,564.17")
+
+    cache.put(cache.make_key(image, "eng"), {"text": "TOTAL 6,564.17"})
+
+    assert cache.get(cache.make_key(image, "deu")) is None
@@ -0,0 +1,207 @@
+import pytest
+
+from app.core.rule_extractor import RuleBasedExtractor, find_dates, layout_rows, parse_amount
+
+REQUIRED = ["vendor_name", "total_amount", "invoice_number", "invoice_date"]
+
+US_INVOICE = """ACME Supplies Inc.
+123 Main Street, Springfield, IL 62701
+billing@acme.com  (555) 123-4567
+INVOICE
+Invoice #: INV-2024-0042
+Invoice Date: 03/15/2024
+Due Date: April 14, 2024
+Bill To:
+Globex Corp
+Description Qty Price Amount
+Printer paper 10 5.00 50.00
+Toner cartridge 2 75.00 150.00
+Subtotal: $200.00
+Sales Tax (8%): $16.00
+Total Due: $216.00
+Tax ID: 12-3456789
+"""
+
+FR_INVOICE = """Boulangerie Dupont SARL
+12 rue de la Paix, 75002 Paris
+Tél. +33 1 23 45 67 89
+FACTURE
+Facture N° F-2024-118
+Date de facture : 15/03/2024
+Date d'échéance : 14/04/2024
+Prestation de conseil 1 200,00 €
+Total HT 1 200,00 €
+TVA 20 % 240,00 €
+Total TTC 1 440,00 €
+N° TVA intracommunautaire FR12345678901
+"""
+
+def extractor() -> RuleBasedExtractor:
+    return RuleBasedExtractor(REQUIRED, min_confidence=0.8)
+
+@pytest.mark.parametrize("number, expected", [
+    ("1,234.56", 1234.56),
+    ("1.234,56", 1234.56),
+    ("1 234,56", 1234.56),
+    ("1'234.56", 1234.56),
+    ("1234", 1234.0),
+    ("12.5", 12.5),
+    ("1.234", 1234.0),
+    ("1,234,567", 1234567.0),
+    ("-5,00", -5.0),
+])
+def test_parse_amount(number, expected):
+    assert parse_amount(number) == expected
+
+def test_find_dates_flags_ambiguous_day_month_order():
+    assert find_dates("Date: 2024-03-15", "DD/MM/YYYY", "fr") == [("2024-03-15", 1.0)]
+    assert find_dates("Date: 15/03/2024", "DD/MM/YYYY", "fr") == [("2024-03-15", 1.0)]
+    assert find_dates("Date: 04/03/2024", "DD/MM/YYYY", "fr") == [("2024-03-04", 0.85)]
+    assert find_dates("le 3 mars 2024", "DD/MM/YYYY", "fr") == [("2024-03-03", 1.0)]
+
+def test_us_invoice():
+    result = extractor().extract(US_INVOICE, ocr_confidence=0.92)
+    analysis = result["analysis"]
+
+    assert analysis["vendor_info"] == {"vendor_name": "ACME Supplies Inc.", "contact_info": "billing@acme.com"}
+    assert analysis["financial_data"] == {
+        "total_amount": 216.0, "currency": "USD", "tax_amount": 16.0, "subtotal": 200.0
+    }
+    assert analysis["document_details"] == {
+        "invoice_number": "INV-2024-0042", "invoice_date": "2024-03-15", "due_date": "2024-04-14"
+    }
+    assert analysis["line_items"] == [
+        {"description": "Printer paper", "amount": 50.0, "quantity": 10.0},
+        {"description": "Toner cartridge", "amount": 150.0, "quantity": 2.0},
+    ]
+    assert analysis["document_analysis"]["document_type"] == "invoice"
+    assert analysis["business_insights"]["spending_category"] == "supplies"
+    # Subtotal + tax = total and the items add up to the subtotal
+    assert result["field_confidence"]["total_amount"] >= 0.97
+    assert result["field_confidence"]["line_items"] == 0.9
+    assert result["sufficient"]
+
+def test_french_invoice():
+    result = extractor().extract(FR_INVOICE, ocr_confidence=0.92)
+    analysis = result["analysis"]
+
+    assert result["language"] == "fr"
+    assert analysis["vendor_info"]["vendor_name"] == "Boulangerie Dupont SARL"
+    assert analysis["financial_data"] == {
+        "total_amount": 1440.0, "currency": "EUR", "tax_amount": 240.0, "subtotal": 1200.0
+    }
+    assert analysis["document_details"] == {
+        "invoice_number": "F-2024-118", "invoice_date": "2024-03-15", "due_date": "2024-04-14"
+    }
+    # The VAT registration number is not a tax amount
+    assert result["field_confidence"]["tax_amount"] >= 0.97
+    assert result["sufficient"]
+
+def test_customer_under_its_label_is_not_the_vendor():
+    text = """Invoice To:
+Globex Corporation
+742 Evergreen Terrace
+Invoice #: 5521
+Invoice Date: 2024-03-15
+Total Due: $80.00
+"""
+    result = extractor().extract(text)
+
+    assert result["analysis"]["vendor_info"]["vendor_name"] != "Globex Corporation"
+    assert not result["sufficient"]
+
+def test_second_company_in_header_sends_vendor_to_the_ai():
+    # No "Bill to" label: the customer's name could be read as the vendor
+    text = """Globex Corporation
+Acme Supplies Inc
+Invoice #: 5521
+Invoice Date: 2024-03-15
+Total Due: $80.00
+"""
+    result = extractor().extract(text)
+
+    assert result["analysis"]["vendor_info"]["vendor_name"] == "Globex Corporation"
+    assert result["field_confidence"]["vendor_name"] < 0.8
+    assert "vendor_name" in result["uncertain"]
+    assert not result["sufficient"]
+
+def test_vendor_name_repeated_in_the_header_stays_confident():
+    text = """ACME Supplies Inc.
+ACME SUPPLIES INC
+Invoice #: 5521
+Invoice Date: 2024-03-15
+Total Due: $80.00
+"""
+    result = extractor().extract(text)
+
+    assert result["field_confidence"]["vendor_name"] == 0.85
+    assert result["sufficient"]
+
+def test_labelled_vendor_wins_over_company_names():
+    text = """Globex Corporation
+Supplier: Acme Supplies Inc
+Invoice #: 5521
+Invoice Date: 2024-03-15
+Total Due: $80.00
+"""
+    result = extractor().extract(text)
+
+    assert result["analysis"]["vendor_info"]["vendor_name"] == "Acme Supplies Inc"
+    assert result["sufficient"]
+
+def test_missing_total_is_not_sufficient():
+    text = """ACME Supplies Inc.
+Invoice #: INV-7
+Invoice Date: 2024-03-15
+Thank you for your business
+"""
+    result = extractor().extract(text)
+
+    assert result["missing"] == ["total_amount"]
+    assert not result["sufficient"]
+
+def test_ambiguous_date_without_locale_evidence_is_uncertain():
+    text = """ACME Supplies Inc.
+Invoice #: INV-7
+Invoice Date: 04/03/2024
+Total: 12.00
+"""
+    result = extractor().extract(text)
+
+    assert result["field_confidence"]["invoice_date"] < 0.8
+    assert not result["sufficient"]
+
+def test_low_ocr_confidence_lowers_field_confidence():
+    confident = extractor().extract(US_INVOICE, ocr_confidence=0.95)
+    blurry = extractor().extract(US_INVOICE, ocr_confidence=0.3)
+
+    assert blurry["field_confidence"]["invoice_number"] < confident["field_confidence"]["invoice_number"]
+    assert blurry["analysis"]["document_analysis"]["text_quality"] == "poor"
+    assert not blurry["sufficient"]
+
+def word(text: str, left: int, top: int, conf: float = 95) -> dict:
+    return {"text": text, "left": left, "top": top, "width": 10 * len(text), "height": 20, "conf": conf}
+
+def test_layout_rows_join_columns_at_the_same_height():
+    words = [word("Total", 50, 500), word("Due:", 110, 502), word("$216.00", 900, 498),
+             word("Thank", 50, 540, conf=80), word("you", 120, 541, conf=60)]
+
+    assert layout_rows(words) == [("Total Due: $216.00", 0.95), ("Thank you", 0.7)]
+
+def test_amount_in_another_column_is_found_through_word_boxes():
+    # OCR text output put the right-hand column after the left one
+    text = """ACME Supplies Inc.
+Invoice #: INV-9
+Invoice Date: 2024-03-15
+Total Due:
+Payment by bank transfer
+$216.00
+"""
+    words = [word("Total", 50, 500), word("Due:", 110, 500), word("$216.00", 900, 500)]
+
+    without_words = extractor().extract(text)
+    with_words = extractor().extract(text, words=words)
+
+    assert without_words["analysis"]["financial_data"]["total_amount"] is None
+    assert with_words["analysis"]["financial_data"]["total_amount"] == 216.0
+    assert with_words["sufficient"]